@@ -0,0 +1,149 @@
+# adaptation.py
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (ADAPT_MODE, ADAPT_MIN_SIM, ADAPT_INTERVAL_SEC, ADAPT_EMA_ALPHA, ADAPT_RESERVOIR,
+                    ADAPT_FLUSH_SEC, SIM_THRESHOLD)
+from metrics import METRICS
+
+MODES = ("ema", "reservoir")
+_MAX_PENDING = 32  # per person between flushes
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    return (v / (np.linalg.norm(v) + 1e-8)).astype(np.float32)
+
+
+def ema_update(vecs: np.ndarray, extras: dict, embs: List[np.ndarray], alpha: float = ADAPT_EMA_ALPHA) -> dict:
+    """Moving centroid, started from the enrolled mean; one 512-d vector per person."""
+    ema = extras.get("ema")
+    ema = _unit(vecs.mean(axis=0)) if ema is None else ema.astype(np.float32)
+    for e in embs:
+        ema = _unit((1.0 - alpha) * ema + alpha * e)
+    extras["ema"] = ema
+    return extras
+
+
+def reservoir_update(vecs: np.ndarray, extras: dict, embs: List[np.ndarray], size: int = ADAPT_RESERVOIR,
+                     rng: Optional[np.random.Generator] = None) -> dict:
+    """Uniform reservoir (algorithm R) of at most ``size`` recognized samples,
+    averaged with the enrolled vecs into the centroid."""
+    rng = rng or np.random.default_rng()
+    adapt = list(extras.get("adapt", np.zeros((0, vecs.shape[1]), dtype=np.float32)))
+    seen = int(extras.get("adapt_seen", 0))
+    for e in embs:
+        seen += 1
+        if len(adapt) < size:
+            adapt.append(e)
+        else:
+            j = int(rng.integers(seen))
+            if j < size:
+                adapt[j] = e
+    extras["adapt"] = np.asarray(adapt, dtype=np.float32).reshape(-1, vecs.shape[1])
+    extras["adapt_seen"] = np.int64(seen)
+    return extras
+
+
+class TemplateAdapter:
+    """Feeds confident recognitions back into people's templates.
+
+    ``observe()`` (scanner thread) keeps at most one embedding per person per
+    ``interval`` when the similarity is at least ``min_sim``; a background
+    thread applies them every ``flush_sec`` with one registry write per person
+    (``Registry.update_extras``). Per-person state stays constant-size: one
+    moving centroid ("ema") or a fixed reservoir of samples ("reservoir").
+    Samples that drifted below SIM_THRESHOLD from the enrolled mean are
+    skipped, so the template cannot wander off to another person. In
+    reservoir mode a moving centroid left from ema mode is dropped, since it
+    would keep overriding the centroid.
+    """
+
+    def __init__(self, registry, mode: str = ADAPT_MODE, min_sim: float = ADAPT_MIN_SIM,
+                 interval: float = ADAPT_INTERVAL_SEC, flush_sec: float = ADAPT_FLUSH_SEC):
+        if mode not in MODES:
+            raise ValueError(f"ADAPT_MODE must be one of {MODES}, got {mode!r}")
+        self.reg = registry
+        self.mode = mode
+        self.min_sim = min_sim
+        self.interval = interval
+        self.flush_sec = flush_sec
+        self._pending: Dict[str, List[np.ndarray]] = {}
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def observe(self, name: str, emb: np.ndarray, sim: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if sim < self.min_sim or now - self._last.get(name, -np.inf) < self.interval:
+            return False
+        with self._lock:
+            pending = self._pending.setdefault(name, [])
+            if len(pending) >= _MAX_PENDING:
+                return False
+            pending.append(np.asarray(emb, dtype=np.float32).copy())
+            self._last[name] = now
+        METRICS.inc("adapt_samples_queued")
+        return True
+
+    def flush(self) -> int:
+        """Apply pending samples; return the number of people updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        update = ema_update if self.mode == "ema" else reservoir_update
+        updated = 0
+        for name, embs in pending.items():
+            def apply(vecs, extras, embs=embs):
+                anchor = _unit(vecs.mean(axis=0))
+                kept = [e for e in embs if float(e @ anchor) >= SIM_THRESHOLD]
+                METRICS.inc("adapt_samples_rejected", len(embs) - len(kept))
+                stale = self._drop_stale(extras)
+                if not kept:
+                    return extras if stale else None  # nothing to write
+                return update(vecs, extras, kept)
+            try:
+                if self.reg.update_extras(name, apply):
+                    updated += 1
+            except Exception as e:
+                print(f"WARN: template adaptation failed for {name}: {e}")
+        if updated:
+            METRICS.inc("adapt_people_updated", updated)
+            print(f"ADAPT: updated {updated} template(s) ({self.mode})")
+        return updated
+
+    def _drop_stale(self, extras: dict) -> bool:
+        """Remove state of the other mode that still affects the centroid; True if any."""
+        return self.mode != "ema" and extras.pop("ema", None) is not None
+
+    def prune(self) -> int:
+        """Drop stale other-mode state from every template (after ADAPT_MODE changed)."""
+        n = 0
+        for name in self.reg.list_people():
+            if self.reg.update_extras(name, lambda vecs, extras: extras if self._drop_stale(extras) else None):
+                n += 1
+        if n:
+            print(f"ADAPT: removed stale moving centroid from {n} template(s)")
+        return n
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="template-adapter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the flush thread and write what is still pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        self.flush()
+
+    def _loop(self):
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"WARN: template adaptation prune failed: {e}")
+        while not self._stop.wait(self.flush_sec):
+            self.flush()
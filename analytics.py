@@ -0,0 +1,140 @@
+# analytics.py
+import argparse
+from datetime import date, datetime, time as dtime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+
+from attendance import day_summary, day_summaries, report_days
+from config import WORK_START, LATE_GRACE_MIN
+
+SUMMARY_COLUMNS = ["name", "records", "ins", "outs", "sessions", "seconds", "first_in", "last_out"]
+
+
+def _parse_day(value) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d"):
+        try:
+            return datetime.strptime(str(value), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value!r}")
+
+
+def days_in_range(start=None, end=None) -> List[date]:
+    """Report days within [start, end], oldest first."""
+    start, end = _parse_day(start), _parse_day(end)
+    return [d for d in report_days() if not ((start and d < start) or (end and d > end))]
+
+
+def day_frame(day: date) -> pd.DataFrame:
+    """Per-person summary of one day as a DataFrame.
+
+    Backed by the attendance module's materialized summaries, so closed days
+    cost one small file read instead of re-parsing the raw CSV.
+    """
+    return _summary_frame(day_summary(day))
+
+
+def _summary_frame(users) -> pd.DataFrame:
+    if not users:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    df = pd.DataFrame.from_dict(users, orient="index")
+    df.index.name = "name"
+    df = df.reset_index().rename(columns={"in": "ins", "out": "outs", "total": "records"})
+    for col in ("first_in", "last_out"):
+        df[col] = pd.to_datetime(df[col].replace("", None), format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    return df[SUMMARY_COLUMNS]
+
+
+def _late_cutoff() -> dtime:
+    start = datetime.strptime(WORK_START, "%H:%M")
+    return (start + timedelta(minutes=LATE_GRACE_MIN)).time()
+
+
+def daily_breakdown(start=None, end=None, names: Optional[List[str]] = None) -> pd.DataFrame:
+    """One row per (day, person) in the range, with a ``late`` flag."""
+    frames = []
+    for day, users in sorted(day_summaries(days_in_range(start, end)).items()):
+        s = _summary_frame(users)
+        if s.empty:
+            continue
+        s.insert(0, "date", pd.Timestamp(day))
+        frames.append(s)
+    if not frames:
+        return pd.DataFrame(columns=["date"] + SUMMARY_COLUMNS + ["late"])
+    df = pd.concat(frames, ignore_index=True)
+    if names:
+        wanted = {n.lower() for n in names}
+        df = df[df["name"].str.lower().isin(wanted)]
+    cutoff = _late_cutoff()
+    df["late"] = df["first_in"].notna() & (df["first_in"].dt.time > cutoff)
+    return df.reset_index(drop=True)
+
+
+def range_summary(start=None, end=None, names: Optional[List[str]] = None) -> pd.DataFrame:
+    """Per-person totals over [start, end]: days present, sessions, hours,
+    first check-in, last check-out and number of late arrivals."""
+    daily = daily_breakdown(start, end, names)
+    columns = ["name", "days", "sessions", "hours", "first_in", "last_out", "late"]
+    if daily.empty:
+        return pd.DataFrame(columns=columns)
+    out = daily.groupby("name").agg(
+        days=("date", "nunique"),
+        sessions=("sessions", "sum"),
+        seconds=("seconds", "sum"),
+        first_in=("first_in", "min"),
+        last_out=("last_out", "max"),
+        late=("late", "sum"),
+    ).reset_index()
+    out["hours"] = (out["seconds"] / 3600.0).round(2)
+    out["late"] = out["late"].astype("int64")
+    return out[columns].sort_values(["hours", "name"], ascending=[False, True]).reset_index(drop=True)
+
+
+def _fmt_ts(value) -> str:
+    return "" if pd.isna(value) else value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def summary_rows(df: pd.DataFrame) -> List[tuple]:
+    """Format a ``range_summary`` frame as display tuples for tables."""
+    return [
+        (r.name, int(r.days), int(r.sessions), f"{r.hours:.2f}",
+         _fmt_ts(r.first_in), _fmt_ts(r.last_out), int(r.late))
+        for r in df.itertuples(index=False)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance analytics over a date range")
+    parser.add_argument("--from", dest="start", help="start date (YYYY-MM-DD or DD/MM/YYYY)")
+    parser.add_argument("--to", dest="end", help="end date (inclusive)")
+    parser.add_argument("--user", action="append", help="restrict to user (repeatable)")
+    parser.add_argument("--daily", action="store_true", help="print per-day rows instead of totals")
+    parser.add_argument("--csv", help="also write the result to this CSV file")
+    args = parser.parse_args(argv)
+
+    if args.daily:
+        df = daily_breakdown(args.start, args.end, args.user)
+        df = df.assign(hours=(df["seconds"] / 3600.0).round(2)).drop(columns=["seconds"])
+    else:
+        df = range_summary(args.start, args.end, args.user)
+
+    if df.empty:
+        print("No attendance records in range.")
+        return 0
+    with pd.option_context("display.max_rows", None, "display.width", 160):
+        print(df.to_string(index=False))
+    if args.csv:
+        df.to_csv(args.csv, index=False, encoding="utf-8")
+        print(f"EXPORT: analytics written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,27 @@
 # app.py
-import threading
 import time
+LAUNCHED = time.perf_counter()  # startup timings are measured from here
+
+import queue
 import shutil
-from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
-import cv2
 import numpy as np
 from PIL import Image, ImageTk
 
-from config import CAM_INDEX, FPS_LIMIT, WINDOW_TITLE, ATTEND_COOLDOWN_SEC
-from face_engine import FaceEngine
+from config import (CAM_INDEX, WINDOW_TITLE, ATTEND_COOLDOWN_SEC, REPORT_FILTER_DEBOUNCE_MS, UI_REFRESH_MS, BURST_KEEP,
+                    METRICS_PORT, PROFILE_DIR, PROFILE_SECONDS, CROWD_MODE, UNKNOWN_CLUSTERING, ADAPT_MODE)
+from face_engine import EngineLoader
 from registry import Registry
-from attendance import log_event, daily_stats, user_attendance_stats, can_attend_today, get_next_attendance_status, get_detailed_attendance_data
+from attendance import daily_stats, user_attendance_stats
+from camera import open_camera
+from adaptation import TemplateAdapter
+from scanner import FrameGrabber, Scanner
+from unknowns import UnknownClusters
+from registration import RegistrationSession
+from metrics import METRICS, MetricsReporter, MetricsServer
+from profiling import PROFILER, install_signal_handlers
 from utils import CooldownKeeper
 
 class AttendanceApp:
@@ -97,6 +105,7 @@ class AttendanceApp:
                               fg=self.colors['text_secondary'], 
                               bg=self.colors['surface'])
         self.status.pack(side="left")
+        self.load_progress = ttk.Progressbar(status_frame, length=160, mode="determinate", maximum=1.0)
         
         # Main content area with cards
         main_content = tk.Frame(content_frame, bg=self.colors['background'])
@@ -385,12 +394,24 @@ class AttendanceApp:
         self.auto_stop_check.pack(anchor="w")
         
         self.cap = None
+        self.grabber = None   # FrameGrabber reading self.cap in the background
         self.running = False
         self.engine = None
+        self.engine_loader = None  # EngineLoader building the model in the background
+        self._on_engine_ready = None  # action to resume once the model is loaded
+        self._first_match_reported = False
         self.reg = Registry()
+        gallery_warning = self.reg.check_gallery()
+        if gallery_warning:
+            print(f"WARN: {gallery_warning}")
+            root.after(500, lambda: messagebox.showwarning("Gallery", gallery_warning))
         self.cooldown = CooldownKeeper(ATTEND_COOLDOWN_SEC)
-        self._last_state = {}  # name -> last status (IN/OUT)
-        self._last_seen = {}  # name -> timestamp when last seen
+        self.scanner = None   # background Scanner while attendance is running
+        self.crowd = None     # CrowdDetector (CROWD_MODE), created on the first scan
+        self.unknowns = UnknownClusters() if UNKNOWN_CLUSTERING else None  # unrecognized faces, for enrollment
+        self.adapter = TemplateAdapter(self.reg).start() if ADAPT_MODE else None  # online template updates
+        self.reg_session = None  # RegistrationSession while the register window is open
+        self._frame_seq = 0   # last frame sequence shown from the scanner
         
         # Auto-stop variables
         self.auto_stop_enabled = True
@@ -406,6 +427,9 @@ class AttendanceApp:
         print(f"Cooldown between scans: {ATTEND_COOLDOWN_SEC} seconds")
         print("Auto-stop after 5 seconds of inactivity")
         
+        self._build_tools_menu()
+        self._start_engine_load()
+
         # Initialize attendance display
         self._update_attendance_display()
 
@@ -485,30 +509,198 @@ class AttendanceApp:
             line = f"{display_name:<15} {stats['in']:>2}  {stats['out']:>2}  {stats['total']:>3}"
             self.attendance_listbox.insert(tk.END, line)
 
-    def ensure_engine(self):
-        if self.engine is None:
-            self.status["text"] = "Initializing model..."
+    _LOAD_STAGES = {
+        "import": "Đang nạp thư viện AI...",
+        "model": "Đang tải mô hình...",
+        "warmup": "Đang khởi động mô hình...",
+        "gallery": "Đang tải dữ liệu khuôn mặt...",
+    }
+
+    def _start_engine_load(self):
+        """Load + warm up FaceEngine and the gallery off the Tk thread."""
+        print("Initializing AI model in the background... (first time may take a while)")
+        self.engine_loader = EngineLoader(self.reg).start()
+        self.load_progress["value"] = 0.0
+        self.load_progress.pack(side="left", padx=(12, 0))
+        self._poll_engine_load()
+
+    def _poll_engine_load(self):
+        loader = self.engine_loader
+        if not loader.done:
+            self.status["text"] = self._LOAD_STAGES.get(loader.stage, "Đang tải mô hình...")
             self.status["fg"] = self.colors['warning']
-            print("Initializing AI model... (first time may take a while)")
-            self.root.update_idletasks()
-            self.engine = FaceEngine()
+            self.load_progress["value"] = loader.progress
+            self.root.after(100, self._poll_engine_load)
+            return
+        self.load_progress.pack_forget()
+        if loader.error is not None:
+            self.status["text"] = "Lỗi tải mô hình"
+            self.status["fg"] = self.colors['danger']
+            print(f"ERROR: model load failed: {loader.error}")
+            self._on_engine_ready = None
+            return
+        self.engine = loader.engine
+        total = time.perf_counter() - LAUNCHED
+        METRICS.set_gauge("startup_engine_seconds", round(total, 3))
+        print(f"STARTUP: model ready {total:.2f}s after launch (load + warm-up {loader.seconds:.2f}s)")
+        if not self.running:
             self.status["text"] = "Ready"
             self.status["fg"] = self.colors['success']
-            print("AI model ready!")
+        callback, self._on_engine_ready = self._on_engine_ready, None
+        if callback is not None:
+            callback()
+
+    def ensure_engine(self, then=None) -> bool:
+        """True if the model is loaded. Otherwise (still loading) run ``then``
+        once it is, or tell the user to retry; a failed load is raised."""
+        if self.engine is not None:
+            return True
+        loader = self.engine_loader
+        if loader is not None and loader.done and loader.error is not None:
+            error = loader.error
+            self._start_engine_load()  # try again next time
+            raise RuntimeError(f"Không tải được mô hình: {error}")
+        if then is not None:
+            self._on_engine_ready = then
+            self.status["text"] = "Đang tải mô hình, sẽ tự bắt đầu khi sẵn sàng..."
+        else:
+            messagebox.showinfo("Thông báo", "Mô hình đang được tải, vui lòng thử lại sau giây lát.")
+        return False
+
+    def _build_tools_menu(self):
+        """Profiling controls for diagnosing a slow kiosk; output goes to PROFILE_DIR."""
+        menubar = tk.Menu(self.root)
+        tools = tk.Menu(menubar, tearoff=0)
+        tools.add_command(label=f"Profile CPU luồng quét ({PROFILE_SECONDS}s)",
+                          command=lambda: self._profiling_started(PROFILER.profile_window()))
+        tools.add_command(label=f"Lấy mẫu stack luồng quét ({PROFILE_SECONDS}s)",
+                          command=lambda: self._profiling_started(PROFILER.sample_thread()))
+        tools.add_separator()
+        tools.add_command(label="Bật tracemalloc / chụp snapshot bộ nhớ", command=PROFILER.tracemalloc_snapshot)
+        tools.add_command(label="Tắt tracemalloc", command=PROFILER.tracemalloc_stop)
+        tools.add_separator()
+        tools.add_command(label="Người lạ chưa đăng ký...", command=self.show_unknowns)
+        menubar.add_cascade(label="Công cụ", menu=tools)
+        self.root.config(menu=menubar)
+
+    def show_unknowns(self):
+        """Clusters of faces seen while scanning but not recognized: preview the
+        kept crops, then enroll a cluster under a name or discard it."""
+        if self.unknowns is None:
+            messagebox.showinfo("Người lạ", "Tính năng gom nhóm người lạ đang tắt (UNKNOWN_CLUSTERING).")
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Người lạ chưa đăng ký")
+        win.geometry("760x420")
+        win.configure(bg=self.colors['background'])
+        win.transient(self.root)
+
+        left = tk.Frame(win, bg=self.colors['background'])
+        left.pack(side='left', fill='y', padx=12, pady=12)
+        listbox = tk.Listbox(left, width=36, font=("Segoe UI", 10), bg=self.colors['surface_light'],
+                             fg=self.colors['text_primary'], selectbackground=self.colors['primary'],
+                             selectforeground='#ffffff', relief='flat', bd=0, exportselection=False)
+        listbox.pack(fill='y', expand=True)
+        right = tk.Frame(win, bg=self.colors['background'])
+        right.pack(side='left', fill='both', expand=True, padx=(0, 12), pady=12)
+        thumbs = tk.Frame(right, bg=self.colors['background'], height=116)
+        thumbs.pack(anchor='w', fill='x')
+        info = tk.Label(right, font=("Segoe UI", 10), fg=self.colors['text_secondary'],
+                        bg=self.colors['background'], justify='left')
+        info.pack(anchor='w', pady=8)
+        tk.Label(right, text="Tên người dùng:", font=("Segoe UI", 10, "bold"), fg=self.colors['text_primary'],
+                 bg=self.colors['background']).pack(anchor='w')
+        name_var = tk.StringVar()
+        tk.Entry(right, textvariable=name_var, font=("Segoe UI", 11)).pack(fill='x')
+        buttons = tk.Frame(right, bg=self.colors['background'])
+        buttons.pack(fill='x', pady=12)
+        clusters = []
+
+        def selected():
+            sel = listbox.curselection()
+            return clusters[sel[0]] if sel and sel[0] < len(clusters) else None
+
+        def show(_e=None):
+            for w in thumbs.winfo_children():
+                w.destroy()
+            c = selected()
+            if c is None:
+                info["text"] = f"{len(clusters)} nhóm người lạ. Chọn một nhóm để xem ảnh."
+                return
+            self.unknowns.flush()
+            for path in c.crops:
+                try:
+                    imgtk = ImageTk.PhotoImage(Image.open(path))
+                except Exception:
+                    continue
+                lbl = tk.Label(thumbs, image=imgtk, bg=self.colors['background'])
+                lbl.image = imgtk
+                lbl.pack(side='left', padx=2)
+            seen = lambda t: time.strftime('%H:%M:%S', time.localtime(t))
+            info["text"] = (f"Thấy {c.count} lần, từ {seen(c.first_seen)} đến {seen(c.last_seen)}\n"
+                            f"{len(c.embs)} ảnh mẫu sẽ được dùng khi đăng ký")
+
+        def refresh():
+            clusters[:] = self.unknowns.clusters()
+            listbox.delete(0, tk.END)
+            for c in clusters:
+                listbox.insert(tk.END, f"{time.strftime('%H:%M:%S', time.localtime(c.last_seen))}  ·  "
+                                       f"{c.count} lần  ·  {len(c.embs)} ảnh")
+            show()
+
+        def enroll():
+            c = selected()
+            name = name_var.get().strip()
+            if c is None or not name:
+                messagebox.showwarning("Người lạ", "Hãy chọn một nhóm và nhập tên.", parent=win)
+                return
+            if name.replace(" ", "_") in self.reg.list_people() and not messagebox.askyesno(
+                    "Người lạ", f"{name} đã tồn tại. Thêm các ảnh này vào người dùng đó?", parent=win):
+                return
+            n = self.unknowns.enroll(c.uid, name, self.reg)
+            messagebox.showinfo("Người lạ", f"Đã đăng ký {name} với {n} ảnh mẫu.", parent=win)
+            name_var.set("")
+            refresh()
+
+        def discard():
+            c = selected()
+            if c is not None:
+                self.unknowns.discard(c.uid)
+                refresh()
+
+        for text, cmd, color in (("Đăng ký nhóm này", enroll, 'success'), ("Bỏ qua nhóm", discard, 'danger'),
+                                 ("Làm mới", refresh, 'primary')):
+            tk.Button(buttons, text=text, command=cmd, bg=self.colors[color], fg='#ffffff', relief='flat',
+                      font=("Segoe UI", 10, "bold"), padx=10, pady=4).pack(side='left', padx=(0, 6))
+        tk.Button(buttons, text="Đóng", command=win.destroy, relief='flat', font=("Segoe UI", 10),
+                  padx=10, pady=4).pack(side='right')
+        listbox.bind('<<ListboxSelect>>', show)
+        refresh()
+
+    def _profiling_started(self, started: bool):
+        if started:
+            messagebox.showinfo("Profiling", f"Đang thu thập trong {PROFILE_SECONDS}s.\nKết quả lưu tại:\n{PROFILE_DIR}")
+        else:
+            messagebox.showinfo("Profiling", "Một phiên profiling đang chạy.")
 
     def open_cam(self):
         if self.cap is None:
             print("Connecting to camera...")
-            self.cap = cv2.VideoCapture(CAM_INDEX)
+            self.cap = open_camera(CAM_INDEX)
             if not self.cap.isOpened():
                 self.cap.release()
                 self.cap = None
                 print("ERROR: Cannot connect to camera!")
                 raise RuntimeError("Không mở được webcam.")
+            # Frames are read on a background thread, never on the Tk thread
+            self.grabber = FrameGrabber(self.cap).start()
             print("Camera connected successfully!")
 
     def close_cam(self):
         if self.cap is not None:
+            if self.grabber is not None:
+                self.grabber.stop()
+                self.grabber = None
             self.cap.release()
             self.cap = None
             print("CAM: Camera turned off")
@@ -531,7 +723,8 @@ class AttendanceApp:
         print(f"Starting registration for: {name}")
         
         try:
-            self.ensure_engine()
+            if not self.ensure_engine():
+                return
             self.open_cam()
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
@@ -614,6 +807,11 @@ class AttendanceApp:
                                      width=20)
         self.capture_btn.pack(fill="x", pady=5)
         
+        self.burst_btn = ttk.Button(button_frame, text=f"🎞️ Chụp loạt ({BURST_KEEP} mẫu)", 
+                                   command=lambda: self._start_burst_capture(name),
+                                   width=20)
+        self.burst_btn.pack(fill="x", pady=5)
+        
         close_btn = ttk.Button(button_frame, text="❌ Đóng", 
                               command=lambda: self._close_registration(reg_window),
                               width=20)
@@ -627,31 +825,34 @@ class AttendanceApp:
         # Auto capture variables
         self.auto_capturing = False
         self.capture_countdown = 0
+        reg_window.protocol("WM_DELETE_WINDOW", lambda: self._close_registration(reg_window))
         
-        # Start video preview
+        # Preview and captures run on background threads; this window only polls
+        self.reg_session = RegistrationSession(self.engine, self.reg, self.grabber).start()
+        self._reg_frame_seq = 0
         self._register_preview_loop(reg_window, video_label)
 
     def _register_preview_loop(self, reg_window, video_label):
-        """Preview video in registration window"""
-        if not reg_window.winfo_exists():
+        """Show the newest preview frame and handle finished captures"""
+        if not reg_window.winfo_exists() or self.reg_session is None:
             return
-            
-        ok, frame = self.cap.read()
-        if ok:
-            # Resize frame to fixed display size
-            display_width = 640
-            display_height = 480
-            frame = cv2.resize(frame, (display_width, display_height))
-            
-            # Convert to RGB and display
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb)
-            imgtk = ImageTk.PhotoImage(image=img)
+
+        while True:
+            try:
+                result = self.reg_session.results.get_nowait()
+            except queue.Empty:
+                break
+            self._on_capture_result(result, reg_window)
+
+        seq, rgb = self.reg_session.preview.get(self._reg_frame_seq)
+        if rgb is not None:
+            self._reg_frame_seq = seq
+            imgtk = ImageTk.PhotoImage(image=Image.fromarray(rgb))
             video_label.imgtk = imgtk
             video_label.configure(image=imgtk)
         
         # Schedule next frame
-        reg_window.after(30, lambda: self._register_preview_loop(reg_window, video_label))
+        reg_window.after(UI_REFRESH_MS, lambda: self._register_preview_loop(reg_window, video_label))
 
     def _start_auto_capture(self, name, reg_window):
         """Start automatic capture with countdown"""
@@ -661,6 +862,7 @@ class AttendanceApp:
         self.auto_capturing = True
         self.capture_countdown = 5
         self.capture_btn["state"] = tk.DISABLED
+        self.burst_btn["state"] = tk.DISABLED
         self.reg_status["text"] = "Chuẩn bị chụp ảnh..."
         self.reg_status["foreground"] = "orange"
         
@@ -681,35 +883,53 @@ class AttendanceApp:
             self.countdown_label["text"] = "CHỤP!"
             self._auto_capture_face(name, reg_window)
 
+    def _start_burst_capture(self, name):
+        """Grab a burst of frames and enroll the best, most varied ones"""
+        if self.auto_capturing:
+            return
+        self.auto_capturing = True
+        self.capture_btn["state"] = tk.DISABLED
+        self.burst_btn["state"] = tk.DISABLED
+        self.countdown_label["text"] = ""
+        self.reg_status["text"] = "Đang chụp loạt... xoay nhẹ đầu sang hai bên"
+        self.reg_status["foreground"] = "orange"
+        self.reg_session.burst(name)
+
     def _auto_capture_face(self, name, reg_window):
         """Automatically capture face"""
         self.reg_status["text"] = "Đang chụp ảnh..."
         self.reg_status["foreground"] = "orange"
-        reg_window.update()
-        
-        ok, frame = self.cap.read()
-        if not ok:
-            self.reg_status["text"] = "Lỗi camera"
-            self.reg_status["foreground"] = "red"
-            self.countdown_label["text"] = "LỖI"
-            self._reset_capture_ui(reg_window)
-            return
-            
-        emb, bbox = self.engine.embed_crop(frame)
-        if emb is None:
-            self.reg_status["text"] = "Không thấy khuôn mặt"
+        self.reg_session.capture(name, "auto")
+
+    def _on_capture_result(self, result, reg_window):
+        """Update the registration window with a finished capture"""
+        manual = result.tag == "manual"
+        if not result.ok:
+            if result.error == "camera":
+                text, popup = "Lỗi camera", "Không thể đọc từ camera"
+            elif result.error == "no_face":
+                text, popup = "Không thấy khuôn mặt", "Không thấy khuôn mặt đủ lớn. Thử lại."
+            else:
+                text, popup = "Lỗi", result.error
+            self.reg_status["text"] = text
             self.reg_status["foreground"] = "red"
-            self.countdown_label["text"] = "KHÔNG THẤY KHUÔN MẶT"
-            self._reset_capture_ui(reg_window)
+            if manual:
+                messagebox.showwarning("Cảnh báo", popup, parent=reg_window)
+            else:
+                self.countdown_label["text"] = text.upper() if result.error == "no_face" else "LỖI"
+                self._reset_capture_ui(reg_window)
             return
-            
-        # Success
-        self.reg.add_sample(name, emb, frame)
-        self.reg_status["text"] = "Saved successfully!"
+
+        self.reg_status["text"] = "Saved successfully!" if result.count == 1 else f"Saved {result.count} samples!"
         self.reg_status["foreground"] = "green"
+        if manual:
+            print(f"Saved face sample for {result.name}")
+            messagebox.showinfo("Thành công", f"Đã lưu mẫu cho {result.name}!\nCó thể chụp thêm để tăng độ chính xác.",
+                                parent=reg_window)
+            return
         self.countdown_label["text"] = "SUCCESS!"
         self.countdown_label["foreground"] = "green"
-        print(f"Auto-saved face sample for {name}")
+        print(f"Auto-saved {result.count} face sample(s) for {result.name}")
         
         # Reset after 2 seconds
         reg_window.after(2000, lambda: self._reset_capture_ui(reg_window))
@@ -722,6 +942,7 @@ class AttendanceApp:
         self.auto_capturing = False
         self.capture_countdown = 0
         self.capture_btn["state"] = tk.NORMAL
+        self.burst_btn["state"] = tk.NORMAL
         self.countdown_label["text"] = ""
         self.countdown_label["foreground"] = "red"
         self.reg_status["text"] = "Ready to register"
@@ -731,36 +952,20 @@ class AttendanceApp:
         """Capture face for registration"""
         self.reg_status["text"] = "Processing..."
         self.reg_status["foreground"] = "orange"
-        reg_window.update()
-        
-        ok, frame = self.cap.read()
-        if not ok:
-            self.reg_status["text"] = "Lỗi camera"
-            self.reg_status["foreground"] = "red"
-            messagebox.showerror("Lỗi", "Không thể đọc từ camera")
-            return
-            
-        emb, bbox = self.engine.embed_crop(frame)
-        if emb is None:
-            self.reg_status["text"] = "Không thấy khuôn mặt"
-            self.reg_status["foreground"] = "red"
-            messagebox.showwarning("Cảnh báo", "Không thấy khuôn mặt đủ lớn. Thử lại.")
-            return
-            
-        self.reg.add_sample(name, emb, frame)
-        self.reg_status["text"] = "Saved successfully!"
-        self.reg_status["foreground"] = "green"
-        print(f"Saved face sample for {name}")
-        messagebox.showinfo("Thành công", f"Đã lưu mẫu cho {name}!\nCó thể chụp thêm để tăng độ chính xác.")
+        self.reg_session.capture(name, "manual")
 
     def _close_registration(self, reg_window):
         """Close registration window and release camera"""
+        if self.reg_session is not None:
+            self.reg_session.stop()
+            self.reg_session = None
         reg_window.destroy()
         self.close_cam()
 
     def start_scan(self):
         try:
-            self.ensure_engine()
+            if not self.ensure_engine(then=self.start_scan):
+                return
             self.open_cam()
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
@@ -776,10 +981,6 @@ class AttendanceApp:
         self.status["fg"] = self.colors['primary']
         self.last_activity_time = time.time()
         
-        # Reset attendance state for new scan session
-        self._last_state = {}
-        self._last_seen = {}
-        
         print("SCAN: Starting automatic face scanning...")
         print("System will automatically recognize and mark attendance")
         
@@ -790,10 +991,29 @@ class AttendanceApp:
         if self.auto_stop_enabled:
             self._start_auto_stop_timer()
             
-        threading.Thread(target=self._scan_loop, daemon=True).start()
+        if CROWD_MODE and self.crowd is None:
+            from crowd import CrowdDetector
+            self.crowd = CrowdDetector(self.engine)  # tile workers load their model in the background
+
+        # Inference runs on the scanner thread; the Tk thread only consumes its results
+        self.scanner = Scanner(self.engine, self.reg, self.grabber, self.cooldown, crowd=self.crowd,
+                               unknowns=self.unknowns, adapter=self.adapter).start()
+        self._frame_seq = 0
+        self._pump_scan()
+
+    def on_close(self):
+        """Stop scanning and background workers, write pending adapted templates, close the window."""
+        self.stop_scan()
+        if self.crowd is not None:
+            self.crowd.close()
+        if self.adapter is not None:
+            self.adapter.stop()
+        self.root.destroy()
 
     def stop_scan(self):
         self.running = False
+        if self.scanner is not None:
+            self.scanner.stop()
         self.btn_start["state"] = tk.NORMAL
         self.btn_start.config(bg=self.colors['success'], fg='#ffffff')
         self.btn_stop["state"] = tk.DISABLED
@@ -836,6 +1056,8 @@ class AttendanceApp:
         """Automatically stop attendance"""
         if self.running:
             self.running = False
+            if self.scanner is not None:
+                self.scanner.stop()
             self.btn_start["state"] = tk.NORMAL
             self.btn_start.config(bg=self.colors['success'])
             self.btn_stop["state"] = tk.DISABLED
@@ -849,109 +1071,68 @@ class AttendanceApp:
                 
             print("AUTO: System auto-stopped and turned off camera")
 
-    def _scan_loop(self):
-        last = 0.0
-        while self.running:
-            ok, frame = self.cap.read()
-            if not ok:
+    def _pump_scan(self):
+        """Consume scanner output on the Tk thread at display rate"""
+        scanner = self.scanner
+        if scanner is None:
+            return
+
+        # Drain events first; coalesce UI refreshes to once per tick
+        attendance_changed = False
+        while True:
+            try:
+                ev = scanner.events.get_nowait()
+            except queue.Empty:
+                break
+            if ev.kind == "attendance":
+                attendance_changed = True
+                # Reset auto-stop timer on activity
+                self.last_activity_time = time.time()
+                if self.auto_stop_enabled and self.auto_stop_timer:
+                    self._start_auto_stop_timer()
+            elif ev.kind == "notice":
+                messagebox.showinfo("Thông báo", ev.message)
+            elif ev.kind == "camera_lost":
                 self.status["text"] = "Mất tín hiệu camera"
                 self.status["fg"] = self.colors['danger']
-                print("Camera signal lost!")
-                break
-            now = time.time()
-            if now - last < 1.0 / max(1, FPS_LIMIT):
-                time.sleep(0.001)
-                continue
-            last = now
-
-            # Resize frame to fixed display size
-            display_width = 640
-            display_height = 480
-            frame = cv2.resize(frame, (display_width, display_height))
-
-            dets = self.engine.detect_and_embed(frame)
-            display = frame.copy()
-            info = ""
-            current_time = time.time()
-            
-            # Track who is currently seen
-            currently_seen = set()
-            
-            for bbox, kps, score, emb in dets:
-                name, sim = self.reg.match(emb)
-                if name:
-                    # Track that this person is currently seen
-                    currently_seen.add(name)
-                    self._last_seen[name] = current_time
-                    
-                    # Check if person can attend today
-                    can_attend, limit_message = can_attend_today(name)
-                    
-                    if not can_attend:
-                        # Show popup notification for daily limit
-                        messagebox.showinfo("Thông báo", f"{name}: {limit_message}")
-                        info = f"{name} - Đã đủ điểm danh hôm nay"
-                        print(f"WARN: {name} has already attended today")
-                    elif self.cooldown.ready(name):
-                        # Alternating logic based on actual attendance history: IN → OUT → IN → OUT → ...
-                        last_attendance = self._get_last_attendance_status(name)
-                        if last_attendance == "IN":
-                            new_state = "OUT"  # Last was IN, next should be OUT
-                        else:
-                            new_state = "IN"   # Last was OUT or no history, next should be IN
-                        
-                        # Only log ONCE per scan session (per button press)
-                        if name not in self._last_state:
-                            log_event(name, new_state)
-                            self._last_state[name] = new_state
-                            info = f"{name} -> {new_state} (sim={sim:.2f})"
-                            
-                            # Reset auto-stop timer on activity
-                            self.last_activity_time = time.time()
-                            if self.auto_stop_enabled and self.auto_stop_timer:
-                                self._start_auto_stop_timer()
-                            
-                            # Enhanced notification
-                            if new_state == "IN":
-                                print(f"IN: {name} checked in (confidence: {sim:.2f})")
-                            else:
-                                print(f"OUT: {name} checked out (confidence: {sim:.2f})")
-                            
-                            # Update attendance display
-                            self._update_attendance_display()
-                            
-                            # Refresh attendance report if it's open
-                            self._refresh_attendance_report()
-                        else:
-                            info = f"{name} - {self._last_state[name]} (sim={sim:.2f})"
-                    else:
-                        info = f"{name} (sim={sim:.2f}) - Chờ cooldown"
-                        
-                    # Draw bounding box with status
-                    self.engine.draw_bbox(display, bbox, name, sim)
-                else:
-                    self.engine.draw_bbox(display, bbox, "Unknown", None)
-            
-            # Clear state for people not seen for more than 3 seconds
-            for name in list(self._last_seen.keys()):
-                if name not in currently_seen and current_time - self._last_seen[name] > 3:
-                    # Clear their state so they can be recognized again
-                    if name in self._last_state:
-                        del self._last_state[name]
-                    del self._last_seen[name]
-
-            # Show to Tk only if still running
-            if self.running:
-                rgb = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(rgb)
-                imgtk = ImageTk.PhotoImage(image=img)
+        if attendance_changed:
+            self._update_attendance_display()
+            # Refresh attendance report if it's open
+            self._refresh_attendance_report()
+
+        if not self._first_match_reported and scanner.first_match_at is not None:
+            self._first_match_reported = True
+            t = scanner.first_match_at - LAUNCHED
+            METRICS.set_gauge("startup_first_recognition_seconds", round(t, 3))
+            print(f"STARTUP: first recognition {t:.2f}s after launch")
+
+        # Show only the newest frame, and only while still running
+        seq, item = scanner.frames.get(self._frame_seq)
+        if item is not None and self.running:
+            self._frame_seq = seq
+            rgb, info = item
+            with METRICS.timer("render"):
+                imgtk = ImageTk.PhotoImage(image=Image.fromarray(rgb))
                 self.video_label.imgtk = imgtk
                 self.video_label.configure(image=imgtk)
-                if not info:
-                    self.status["text"] = "Scanning..."
-                    self.status["fg"] = self.colors['primary']
-        
-        # Clear video display when loop ends
+            if not info:
+                self.status["text"] = "Scanning..."
+                self.status["fg"] = self.colors['primary']
+
+        if scanner.is_alive():
+            self.root.after(UI_REFRESH_MS, self._pump_scan)
+            return
+
+        # Worker has exited: clear video display and release the camera here
+        if self.running:
+            # Loop ended on its own (camera lost); re-enable Start
+            self.running = False
+            self.btn_start["state"] = tk.NORMAL
+            self.btn_start.config(bg=self.colors['success'], fg='#ffffff')
+            self.btn_stop["state"] = tk.DISABLED
+            self.btn_stop.config(bg='#6c757d', fg='#ffffff')
+        self.scanner = None
+        self.video_label.imgtk = None
         self.video_label.configure(image="", text="Camera stopped")
         self.close_cam()
 
@@ -1098,11 +1279,7 @@ class AttendanceApp:
             num_samples = 0
         
         # Count face images
-        person_dir = Path("faces") / user
-        if person_dir.exists():
-            num_images = len(list(person_dir.glob("*.jpg")))
-        else:
-            num_images = 0
+        num_images = len(self.reg.sample_images(user))
         
         # Show details
         details = f"Tên: {display_name}\n"
@@ -1143,7 +1320,7 @@ class AttendanceApp:
                     embed_file.unlink()
                 
                 # Delete face images directory
-                person_dir = Path("faces") / user
+                person_dir = self.reg.faces_dir / user
                 if person_dir.exists():
                     shutil.rmtree(person_dir)
                 
@@ -1201,8 +1378,9 @@ class AttendanceApp:
         self.report_user_var = tk.StringVar(value="")
         self.report_user_entry = ttk.Entry(controls, textvariable=self.report_user_var, width=18)
         self.report_user_entry.pack(side='left', padx=(0,12))
-        # Comment: Update table on typing username
-        self.report_user_entry.bind('<KeyRelease>', lambda _e: self._on_report_date_change())
+        # Comment: Update table on typing username (debounced)
+        self._report_filter_job = None
+        self.report_user_entry.bind('<KeyRelease>', lambda _e: self._schedule_report_filter())
 
         # Local rounded button creator
         app_self = self
@@ -1254,6 +1432,7 @@ class AttendanceApp:
 
         create_modal_button(actions, 'Refresh', lambda: self._refresh_attendance_report(), side='left')
         create_modal_button(actions, 'Export to Excel', lambda: self._export_to_excel(report_window), side='right')
+        create_modal_button(actions, 'Range Analytics', lambda: self.show_range_analytics(report_window), side='right')
 
         # Table with styled Treeview
         table_frame = tk.Frame(report_window, bg=self.colors['background'])
@@ -1292,127 +1471,134 @@ class AttendanceApp:
         v_scrollbar.pack(side="right", fill="y")
         h_scrollbar.pack(side="bottom", fill="x")
 
-        # Initialize date options and load data + zebra striping
-        self._refresh_report_date_options()
-        self._load_attendance_report_data()
-        for i, iid in enumerate(self.report_tree.get_children()):
-            self.report_tree.item(iid, tags=('odd',) if i % 2 else ('even',))
         self.report_tree.tag_configure('odd', background=self.colors['surface_light'])
+        self.report_tree.tag_configure('empty', foreground=self.colors['danger'])
 
-        # Footer status
+        # Footer: pager + status. Only one page of rows ever lives in the Treeview.
         status = tk.Frame(report_window, bg=self.colors['surface'])
         status.pack(fill='x', padx=16, pady=(0,16))
-        data_count = len(self.report_tree.get_children())
-        tk.Label(status, text=f"Total records: {data_count}", font=("Segoe UI", 10),
-                 fg=self.colors['text_secondary'], bg=self.colors['surface']).pack(anchor='e')
+        ttk.Button(status, text="◀ Prev", command=lambda: self._report_go_page(-1)).pack(side='left', padx=(8,4), pady=6)
+        self.report_page_label = tk.Label(status, text="", font=("Segoe UI", 10),
+                                          fg=self.colors['text_secondary'], bg=self.colors['surface'])
+        self.report_page_label.pack(side='left', padx=4)
+        ttk.Button(status, text="Next ▶", command=lambda: self._report_go_page(1)).pack(side='left', padx=4, pady=6)
+        self.report_total_label = tk.Label(status, text="", font=("Segoe UI", 10),
+                                           fg=self.colors['text_secondary'], bg=self.colors['surface'])
+        self.report_total_label.pack(side='right', padx=8)
+
+        # Initialize date options and load data
+        from report_model import ReportModel
+        self.report_model = ReportModel()
+        self._refresh_report_date_options()
+        self._load_attendance_report_data()
 
-    def _load_attendance_report_data(self):
-        """Load attendance data into the report table"""
-        # Clear existing data
-        for item in self.report_tree.get_children():
-            self.report_tree.delete(item)
-        
-        # Get detailed data
-        data = get_detailed_attendance_data()
-        # Filter by selected date (format dd/mm/YYYY)
-        selected_date = ''
-        try:
-            if getattr(self, 'report_date_picker', None) is not None:
-                # tkcalendar DateEntry returns date object
-                d = self.report_date_picker.get_date()
-                selected_date = d.strftime('%d/%m/%Y')
-            elif getattr(self, 'report_date_combo', None) is not None:
-                selected_date = getattr(self, 'report_date_var', None).get()
-        except Exception:
-            selected_date = ''
-        if selected_date:
-            data = [r for r in data if r.get('date') == selected_date]
-        # Filter by username contains (case-insensitive)
-        username_kw = ''
-        if hasattr(self, 'report_user_var'):
-            username_kw = (self.report_user_var.get() or '').strip().lower()
-        if username_kw:
-            data = [r for r in data if username_kw in (r.get('name','') or '').lower()]
-        
-        # Insert data or empty state
-        if data:
-            # Comment: Restore default column alignment for data rows
+    def show_range_analytics(self, parent_window):
+        """Show per-person totals (days, sessions, hours, late arrivals) over a date range"""
+        from datetime import date as _date
+
+        win = tk.Toplevel(parent_window)
+        win.title("Range Analytics")
+        win.geometry("860x520")
+        win.configure(bg=self.colors['background'])
+
+        header = tk.Frame(win, bg=self.colors['surface'])
+        header.pack(fill='x', padx=16, pady=(16, 8))
+        tk.Label(header, text="Range Analytics", font=("Segoe UI", 16, "bold"),
+                 fg=self.colors['text_primary'], bg=self.colors['surface']).pack(anchor='w')
+
+        controls = tk.Frame(win, bg=self.colors['background'])
+        controls.pack(fill='x', padx=16, pady=(0, 8))
+        today = _date.today()
+        from_var = tk.StringVar(value=today.replace(day=1).strftime('%d/%m/%Y'))
+        to_var = tk.StringVar(value=today.strftime('%d/%m/%Y'))
+        for label, var in (("From:", from_var), ("To:", to_var)):
+            tk.Label(controls, text=label, font=("Segoe UI", 10), fg=self.colors['text_secondary'],
+                     bg=self.colors['background']).pack(side='left', padx=(0, 6))
+            ttk.Entry(controls, textvariable=var, width=12).pack(side='left', padx=(0, 12))
+
+        table_frame = tk.Frame(win, bg=self.colors['background'])
+        table_frame.pack(fill='both', expand=True, padx=16, pady=(0, 8))
+        columns = ("User Name", "Days", "Sessions", "Hours", "First In", "Last Out", "Late")
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=16, style='Card.Treeview')
+        for col, width in zip(columns, (180, 60, 80, 80, 160, 160, 60)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor="w" if col == "User Name" else "center")
+        v_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=v_scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        v_scrollbar.pack(side="right", fill="y")
+        tree.tag_configure('odd', background=self.colors['surface_light'])
+
+        footer = tk.Label(win, text="", font=("Segoe UI", 10),
+                          fg=self.colors['text_secondary'], bg=self.colors['background'])
+        footer.pack(anchor='e', padx=16, pady=(0, 16))
+
+        def load():
+            from analytics import range_summary, summary_rows
             try:
-                self.report_tree.column("Tên", anchor="w")
-                self.report_tree.column("Ngày", anchor="center")
-                self.report_tree.column("Giờ vào", anchor="center")
-                self.report_tree.column("Giờ ra", anchor="center")
-            except Exception:
-                pass
-            for record in data:
-                self.report_tree.insert("", "end", values=(
-                    record["name"],
-                    record["date"],
-                    record["time_in"],
-                    record["time_out"]
-                ))
+                df = range_summary(from_var.get().strip(), to_var.get().strip())
+            except ValueError as e:
+                messagebox.showerror("Lỗi", str(e), parent=win)
+                return
+            tree.delete(*tree.get_children())
+            rows = summary_rows(df)
+            for i, row in enumerate(rows):
+                tree.insert("", "end", values=row, tags=('odd',) if i % 2 else ('even',))
+            footer.configure(text=f"Users: {len(rows)}")
+
+        ttk.Button(controls, text="Apply", command=load).pack(side='left')
+        load()
+
+    def _load_attendance_report_data(self):
+        """Apply the current filters to the report model and show the first page"""
+        selected, username_kw = self._report_filters()
+        self.report_model.set_filter(selected, username_kw)
+        self._render_report_page()
+
+    def _render_report_page(self):
+        """Materialize the current page of the report model into the Treeview"""
+        model = self.report_model
+        self.report_tree.delete(*self.report_tree.get_children())
+        rows = model.page_rows()
+        anchors = ("w", "center", "center", "center") if rows else ("center",) * 4
+        for col, anchor in zip(("Tên", "Ngày", "Giờ vào", "Giờ ra"), anchors):
+            self.report_tree.column(col, anchor=anchor)
+        if rows:
+            for i, row in enumerate(rows):
+                self.report_tree.insert("", "end", values=row, tags=('odd',) if i % 2 else ('even',))
         else:
             # Comment: Show a placeholder row when there is no data
-            try:
-                # Center align all columns for the placeholder row only case
-                self.report_tree.column("Tên", anchor="center")
-                self.report_tree.column("Ngày", anchor="center")
-                self.report_tree.column("Giờ vào", anchor="center")
-                self.report_tree.column("Giờ ra", anchor="center")
-            except Exception:
-                pass
             self.report_tree.insert("", "end", values=("Trống", "Trống", "Trống", "Trống"), tags=('empty',))
+        self.report_page_label.configure(text=f"Page {model.page + 1} / {model.page_count}")
+        self.report_total_label.configure(text=f"Total records: {model.total}")
 
-        # Re-apply zebra striping
-        for i, iid in enumerate(self.report_tree.get_children()):
-            tags = self.report_tree.item(iid, 'tags')
-            if 'empty' in tags:
-                continue
-            self.report_tree.item(iid, tags=('odd',) if i % 2 else ('even',))
-        self.report_tree.tag_configure('odd', background=self.colors['surface_light'])
-        self.report_tree.tag_configure('empty', foreground=self.colors['danger'])
+    def _report_go_page(self, step):
+        if self.report_model.go_to(self.report_model.page + step):
+            self._render_report_page()
 
-    
-    # Removed sorting feature by request; keep date filtering only
+    def _schedule_report_filter(self):
+        """Debounce username typing so filtering runs once the user pauses"""
+        if self._report_filter_job is not None:
+            self.report_tree.after_cancel(self._report_filter_job)
+        self._report_filter_job = self.report_tree.after(REPORT_FILTER_DEBOUNCE_MS, self._on_report_date_change)
 
     def _on_report_date_change(self):
         """Handle change of selected date and reload data.
         Comment: Refresh table when user selects a different date.
         """
-        # Reload table on date or username change
+        self._report_filter_job = None
         if hasattr(self, 'report_tree') and self.report_tree.winfo_exists():
             self._load_attendance_report_data()
-            # Count only non-empty rows
-            data_count = 0
-            for iid in self.report_tree.get_children():
-                if 'empty' not in self.report_tree.item(iid, 'tags'):
-                    data_count += 1
-            for widget in self.root.winfo_children():
-                if isinstance(widget, tk.Toplevel):
-                    for child in widget.winfo_children():
-                        if isinstance(child, ttk.Frame):
-                            for grandchild in child.winfo_children():
-                                if isinstance(grandchild, ttk.Label) and "Total records" in str(grandchild.cget("text")):
-                                    grandchild.configure(text=f"Total records: {data_count}")
-                                    break
 
     def _refresh_report_date_options(self):
         """Populate date combobox with available report dates; default to today or latest.
-        Comment: Scan reports folder for CSVs and parse dates.
+        Comment: Collect report dates from raw CSVs and the archive.
         """
         from datetime import datetime
-        from config import REPORTS_DIR
+        from attendance import report_days
 
-        dates = []
-        if REPORTS_DIR.exists():
-            for csv_path in REPORTS_DIR.glob('*.csv'):
-                stem = csv_path.stem
-                if stem.startswith('attendance_'):
-                    try:
-                        d = datetime.strptime(stem[11:], '%Y%m%d').strftime('%d/%m/%Y')
-                        dates.append(d)
-                    except Exception:
-                        continue
+        # Includes days already compacted into the archive
+        dates = [d.strftime('%d/%m/%Y') for d in report_days()]
         dates = sorted(set(dates), key=lambda s: datetime.strptime(s, '%d/%m/%Y'), reverse=True)
 
         # If using DateEntry, set default to today; else populate combobox
@@ -1434,114 +1620,92 @@ class AttendanceApp:
             default_date = today_str if today_str in dates else (dates[0] if dates else '')
             self.report_date_var.set(default_date)
     
-    def _get_last_attendance_status(self, name):
-        """Get the last attendance status for a person today"""
-        from pathlib import Path
-        from datetime import datetime
-        import csv
-        
-        path = Path("app/reports") / (datetime.now().strftime("attendance_%Y%m%d.csv"))
-        if not path.exists():
-            return None
-        
-        last_status = None
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["name"] == name:
-                    last_status = row["status"]
-        
-        return last_status
-
     def _refresh_attendance_report(self):
         """Refresh the attendance report data"""
         if hasattr(self, 'report_tree') and self.report_tree.winfo_exists():
-            self._load_attendance_report_data()
-            # Update status label (exclude placeholder row)
-            data_count = 0
-            for iid in self.report_tree.get_children():
-                if 'empty' not in self.report_tree.item(iid, 'tags'):
-                    data_count += 1
-            # Find and update status label
-            for widget in self.root.winfo_children():
-                if isinstance(widget, tk.Toplevel):
-                    for child in widget.winfo_children():
-                        if isinstance(child, ttk.Frame):
-                            for grandchild in child.winfo_children():
-                                if isinstance(grandchild, ttk.Label) and "Total records" in str(grandchild.cget("text")):
-                                    grandchild.configure(text=f"Total records: {data_count}")
-                                    break
+            from datetime import date
+            # Only today's rows can change while the app is running
+            self.report_model.refresh_day(date.today())
+            self._render_report_page()
             print("REFRESH: Attendance report data refreshed")
 
-    def _export_to_excel(self, parent_window):
-        """Export attendance report to Excel file"""
+    def _report_filters(self):
+        """Return (selected date or None, username keyword) from the report controls"""
+        from datetime import datetime
+        selected = None
         try:
-            import pandas as pd
-            from tkinter import filedialog
-            from datetime import datetime
-            
-            # Get currently displayed (sorted) data from the table
-            data = []
-            if hasattr(self, 'report_tree') and self.report_tree.winfo_exists():
-                for iid in self.report_tree.get_children():
-                    values = self.report_tree.item(iid, 'values')
-                    if values and len(values) == 4:
-                        data.append({
-                            "name": values[0],
-                            "date": values[1],
-                            "time_in": values[2],
-                            "time_out": values[3]
-                        })
-            else:
-                # Fallback to raw data if table not available
-                data = get_detailed_attendance_data()
-                data = self._sort_report_data(data)
-            
-            if not data:
-                messagebox.showwarning("Cảnh báo", "Không có dữ liệu điểm danh để xuất!")
+            if getattr(self, 'report_date_picker', None) is not None:
+                selected = self.report_date_picker.get_date()
+            elif getattr(self, 'report_date_combo', None) is not None and self.report_date_var.get():
+                selected = datetime.strptime(self.report_date_var.get(), '%d/%m/%Y').date()
+        except Exception:
+            selected = None
+        username_kw = ''
+        if hasattr(self, 'report_user_var'):
+            username_kw = (self.report_user_var.get() or '').strip()
+        return selected, username_kw
+
+    def _export_to_excel(self, parent_window):
+        """Export attendance report to Excel/CSV in the background"""
+        from tkinter import filedialog
+        from export import ExportJob
+
+        selected, username_kw = self._report_filters()
+        filename = filedialog.asksaveasfilename(
+            parent=parent_window,
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Lưu báo cáo điểm danh"
+        )
+        if not filename:
+            return
+        if not filename.lower().endswith(".csv"):
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                messagebox.showerror("Lỗi", "Cần cài đặt openpyxl để xuất Excel!\nChạy: pip install openpyxl",
+                                     parent=parent_window)
                 return
-            
-            # Create DataFrame
-            df = pd.DataFrame(data)
-            df.columns = ["User Name", "Date", "Check-in Time", "Check-out Time"]
-            
-            # Ask for save location
-            filename = filedialog.asksaveasfilename(
-                parent=parent_window,
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-                title="Lưu báo cáo điểm danh"
-            )
-            
-            if filename:
-                # Export to Excel
-                with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                    df.to_excel(writer, sheet_name='Báo cáo điểm danh', index=False)
-                    
-                    # Get the workbook and worksheet
-                    workbook = writer.book
-                    worksheet = writer.sheets['Báo cáo điểm danh']
-                    
-                    # Auto-adjust column widths
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                messagebox.showinfo("Thành công", f"Đã xuất báo cáo thành công!\nFile: {filename}")
-                print(f"EXPORT: Excel report exported: {filename}")
-                
-        except ImportError:
-            messagebox.showerror("Lỗi", "Cần cài đặt pandas và openpyxl để xuất Excel!\nChạy: pip install pandas openpyxl")
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể xuất file Excel:\n{str(e)}")
+
+        job = ExportJob(filename, days=[selected] if selected else None, name_contains=username_kw).start()
+
+        # Progress dialog; the export itself runs off the Tk thread
+        dlg = tk.Toplevel(parent_window)
+        dlg.title("Exporting...")
+        dlg.geometry("360x130")
+        dlg.resizable(False, False)
+        dlg.configure(bg=self.colors['background'])
+        dlg.transient(parent_window)
+        label = tk.Label(dlg, text="Đang xuất báo cáo...", font=("Segoe UI", 10),
+                         fg=self.colors['text_secondary'], bg=self.colors['background'])
+        label.pack(anchor='w', padx=16, pady=(16, 6))
+        bar = ttk.Progressbar(dlg, mode='determinate', maximum=100, length=320)
+        bar.pack(padx=16)
+        ttk.Button(dlg, text="Cancel", command=job.cancel).pack(anchor='e', padx=16, pady=10)
+        dlg.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            if not dlg.winfo_exists():
+                job.cancel()
+                return
+            bar['value'] = job.progress * 100
+            label.configure(text=f"Đang xuất báo cáo... {job.rows} dòng")
+            if not job.done:
+                dlg.after(100, poll)
+                return
+            dlg.destroy()
+            if job.cancelled:
+                print("EXPORT: cancelled")
+            elif job.error is not None:
+                messagebox.showerror("Lỗi", f"Không thể xuất file:\n{job.error}", parent=parent_window)
+            elif job.rows == 0:
+                messagebox.showwarning("Cảnh báo", "Không có dữ liệu điểm danh để xuất!", parent=parent_window)
+            else:
+                messagebox.showinfo("Thành công", f"Đã xuất báo cáo thành công!\nFile: {filename}",
+                                    parent=parent_window)
+                print(f"EXPORT: {job.rows} rows exported: {filename}")
+
+        poll()
 
 def main():
     root = tk.Tk()
@@ -1562,11 +1726,25 @@ def main():
             root.geometry(f"{sw}x{sh}+0+0")
         except Exception:
             pass
-    # Allow ESC to close the app
-    root.bind('<Escape>', lambda _e: (root.quit(), root.destroy()))
     app = AttendanceApp(root)
-    root.protocol("WM_DELETE_WINDOW", lambda: (app.stop_scan(), root.destroy()))
-    root.mainloop()
+    # ESC and the window close button shut down the same way (pending adapted templates are written)
+    root.bind('<Escape>', lambda _e: app.on_close())
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    reporter = MetricsReporter().start()
+    server = MetricsServer(METRICS_PORT).start() if METRICS_PORT else None
+    install_signal_handlers()
+
+    def _shown():
+        t = time.perf_counter() - LAUNCHED
+        METRICS.set_gauge("startup_window_seconds", round(t, 3))
+        print(f"STARTUP: window shown {t:.2f}s after launch")
+    root.after_idle(_shown)
+    try:
+        root.mainloop()
+    finally:
+        reporter.stop()
+        if server is not None:
+            server.stop()
 
 if __name__ == "__main__":
     main()
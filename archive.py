@@ -0,0 +1,227 @@
+# archive.py
+import argparse
+import csv
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import ARCHIVE_DIR
+
+# Month partitions are column-oriented .npz files:
+#   ts       datetime64[s]   event time, sorted
+#   name     int32           code into ``names``   (dictionary-encoded)
+#   status   int8            code into ``statuses`` (dictionary-encoded)
+#   names, statuses          the dictionaries
+#   days     int32           YYYYMMDD of every archived day (incl. empty ones)
+# np.load on an .npz is lazy per member, so readers only pay for the columns
+# they ask for.
+COLUMNS = ("ts", "name", "status")
+
+
+def partition_path(year: int, month: int) -> Path:
+    return ARCHIVE_DIR / f"attendance_{year:04d}{month:02d}.npz"
+
+
+def _day_key(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _key_day(key: int) -> date:
+    return date(key // 10000, key // 100 % 100, key % 100)
+
+
+def partitions() -> List[Path]:
+    if not ARCHIVE_DIR.exists():
+        return []
+    return sorted(ARCHIVE_DIR.glob("attendance_??????.npz"))
+
+
+def partition_for(day: date) -> Optional[Path]:
+    path = partition_path(day.year, day.month)
+    return path if path.exists() else None
+
+
+def partition_signature(day: date) -> Optional[Tuple[int, int]]:
+    path = partition_for(day)
+    if path is None:
+        return None
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+@lru_cache(maxsize=8)
+def _load(path_str: str, mtime_ns: int, columns: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+    with np.load(path_str, allow_pickle=False) as data:
+        return {c: data[c] for c in columns}
+
+
+def _columns(path: Path, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    return _load(str(path), path.stat().st_mtime_ns, tuple(columns))
+
+
+def archived_days() -> List[date]:
+    days = []
+    for path in partitions():
+        days.extend(_key_day(int(k)) for k in _columns(path, ("days",))["days"])
+    return sorted(days)
+
+
+def _decode(cols: Dict[str, np.ndarray], mask, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    out = {}
+    if "ts" in columns:
+        out["ts"] = cols["ts"][mask]
+    if "name" in columns:
+        out["name"] = cols["names"][cols["name"][mask]]
+    if "status" in columns:
+        out["status"] = cols["statuses"][cols["status"][mask]]
+    return out
+
+
+def read_range(start: date, end: date, columns: Sequence[str] = COLUMNS) -> Dict[str, np.ndarray]:
+    """Decoded column arrays for all archived events with start <= day <= end.
+
+    Only the month partitions overlapping the range are opened and only the
+    requested columns (plus their dictionaries) are read.
+    """
+    need = {"ts"} | set(columns)
+    load = [c for c in ("ts", "name", "status") if c in need]
+    load += [d for c, d in (("name", "names"), ("status", "statuses")) if c in need]
+    lo = np.datetime64(start, "s")
+    hi = np.datetime64(end + timedelta(days=1), "s")
+
+    parts = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        path = partition_path(y, m)
+        if path.exists():
+            cols = _columns(path, load)
+            i, j = np.searchsorted(cols["ts"], [lo, hi])
+            parts.append(_decode(cols, slice(i, j), columns))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+    if not parts:
+        empty = {"ts": np.array([], dtype="datetime64[s]"), "name": np.array([], dtype=str),
+                 "status": np.array([], dtype=str)}
+        return {c: empty[c] for c in columns}
+    return {c: np.concatenate([p[c] for p in parts]) for c in columns}
+
+
+def _rows(cols: Dict[str, np.ndarray]) -> List[dict]:
+    stamps = np.datetime_as_string(cols["ts"], unit="s")
+    return [{"timestamp": t.replace("T", " "), "name": str(n), "status": str(s)}
+            for t, n, s in zip(stamps, cols["name"], cols["status"])]
+
+
+def read_day_rows(day: date) -> List[dict]:
+    """Archived rows of one day in the same shape as ``csv.DictReader`` rows."""
+    return _rows(read_range(day, day))
+
+
+def read_range_rows(start: date, end: date) -> Dict[date, List[dict]]:
+    """Archived rows of every day in [start, end] from a single ``read_range``
+    (each month partition is opened once), keyed by day."""
+    cols = read_range(start, end)
+    days = cols["ts"].astype("datetime64[D]")
+    keys, first = np.unique(days, return_index=True)  # ts is sorted, so first is increasing
+    bounds = first.tolist() + [len(days)]
+    return {k.astype(date): _rows({c: v[i:j] for c, v in cols.items()})
+            for k, i, j in zip(keys, bounds, bounds[1:])}
+
+
+def _encode(values: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    uniques, codes = np.unique(np.asarray(list(values), dtype=str), return_inverse=True)
+    return uniques, codes
+
+
+def write_partition(year: int, month: int, day_rows: Dict[date, List[dict]]):
+    """Merge ``day_rows`` into the month partition, replacing those days if present."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = partition_path(year, month)
+    ts: List[np.ndarray] = []
+    names: List[np.ndarray] = []
+    statuses: List[np.ndarray] = []
+    days = set(_day_key(d) for d in day_rows)
+
+    if path.exists():
+        with np.load(path, allow_pickle=False) as old:
+            keep_days = [int(k) for k in old["days"] if int(k) not in days]
+            old_ts = old["ts"]
+            keep = np.array([_key_day(k) for k in keep_days], dtype="datetime64[D]")
+            mask = np.isin(old_ts.astype("datetime64[D]"), keep)
+            ts.append(old_ts[mask])
+            names.append(old["names"][old["name"][mask]])
+            statuses.append(old["statuses"][old["status"][mask]])
+            days.update(keep_days)
+
+    for day in sorted(day_rows):
+        rows = day_rows[day]
+        ts.append(np.array([r["timestamp"].replace(" ", "T") for r in rows], dtype="datetime64[s]"))
+        names.append(np.array([r["name"] for r in rows], dtype=str))
+        statuses.append(np.array([r["status"].upper() for r in rows], dtype=str))
+
+    all_ts = np.concatenate(ts) if ts else np.array([], dtype="datetime64[s]")
+    order = np.argsort(all_ts, kind="stable")
+    name_dict, name_codes = _encode(np.concatenate(names)[order] if names else [])
+    status_dict, status_codes = _encode(np.concatenate(statuses)[order] if statuses else [])
+
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        ts=all_ts[order],
+        name=name_codes.astype(np.int32),
+        names=name_dict,
+        status=status_codes.astype(np.int8),
+        statuses=status_dict,
+        days=np.array(sorted(days), dtype=np.int32),
+    )
+    os.replace(tmp, path)
+    return len(all_ts)
+
+
+def archive_closed_days(keep_csv: bool = False, before: Optional[date] = None) -> Dict[str, int]:
+    """Compact closed-day CSVs into month partitions.
+
+    Days strictly before ``before`` (default today) are archived. Source CSVs
+    are removed once their partition has been written, unless ``keep_csv``.
+    """
+    from attendance import csv_path_for, csv_report_days
+
+    before = before or date.today()
+    by_month: Dict[Tuple[int, int], Dict[date, List[dict]]] = {}
+    for day in csv_report_days():
+        if day >= before:
+            continue
+        with open(csv_path_for(day), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        by_month.setdefault((day.year, day.month), {})[day] = rows
+
+    stats = {"days": 0, "rows": 0, "partitions": 0}
+    for (year, month), day_rows in sorted(by_month.items()):
+        write_partition(year, month, day_rows)
+        stats["partitions"] += 1
+        stats["days"] += len(day_rows)
+        stats["rows"] += sum(len(r) for r in day_rows.values())
+        print(f"ARCHIVE: {year:04d}-{month:02d} <- {len(day_rows)} day(s)")
+        if not keep_csv:
+            for day in day_rows:
+                csv_path_for(day).unlink()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact closed-day attendance CSVs into monthly columnar partitions")
+    parser.add_argument("--keep-csv", action="store_true", help="keep the source CSVs after archiving")
+    parser.add_argument("--before", help="archive days before this date (YYYY-MM-DD, default today)")
+    args = parser.parse_args(argv)
+    before = datetime.strptime(args.before, "%Y-%m-%d").date() if args.before else None
+    stats = archive_closed_days(keep_csv=args.keep_csv, before=before)
+    print(f"Archived {stats['rows']} rows from {stats['days']} day(s) into {stats['partitions']} partition(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,48 @@
 # attendance.py
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, date
 import csv
-from config import REPORTS_DIR
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from config import REPORTS_DIR, SUMMARY_DIR
+import archive
+from metrics import METRICS
 
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SUMMARY_VERSION = 2  # bump when summarize_rows changes; older summary files are rebuilt
+
+# day -> (source signature, users); avoids re-reading summary files in-process
+_summary_cache: Dict[date, Tuple[Tuple[int, int], Dict[str, dict]]] = {}
+_close_lock = threading.Lock()
+
 def today_csv_path() -> Path:
     return REPORTS_DIR / (datetime.now().strftime("attendance_%Y%m%d.csv"))
 
+def csv_path_for(day: date) -> Path:
+    return REPORTS_DIR / day.strftime("attendance_%Y%m%d.csv")
+
+def summary_path_for(day: date) -> Path:
+    return SUMMARY_DIR / day.strftime("attendance_%Y%m%d.json")
+
+def csv_report_days() -> List[date]:
+    """Days that still have a raw CSV report, oldest first."""
+    days = []
+    for path in REPORTS_DIR.glob("attendance_*.csv"):
+        try:
+            days.append(datetime.strptime(path.stem[11:], "%Y%m%d").date())
+        except ValueError:
+            continue
+    return sorted(days)
+
+def report_days() -> List[date]:
+    """All days that have a report, raw or archived, oldest first."""
+    return sorted(set(csv_report_days()) | set(archive.archived_days()))
+
 def log_event(person: str, status: str):
     path = today_csv_path()
     new = not path.exists()
@@ -16,9 +50,174 @@ def log_event(person: str, status: str):
         w = csv.writer(f)
         if new:
             w.writerow(["timestamp", "name", "status"])  # status: IN / OUT
-        w.writerow([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), person, status])
+        w.writerow([datetime.now().strftime(TS_FORMAT), person, status])
+    METRICS.inc(f'attendance_events{{status="{status}"}}')
+    if new:
+        # first event of a new day: the previous days are now closed; summarize
+        # them off the scanner thread
+        threading.Thread(target=close_past_days, name="close-past-days", daemon=True).start()
+
+def read_day_rows(day: date) -> List[dict]:
+    """Raw rows of one day, from its CSV or, once compacted, from the archive."""
+    path = csv_path_for(day)
+    if not path.exists():
+        if archive.partition_for(day) is not None:
+            return archive.read_day_rows(day)
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def summarize_rows(rows) -> Dict[str, dict]:
+    """Per-user counts, sessions and durations for the rows of one day.
+
+    Sessions are the IN/OUT pairs of ``pair_sessions`` (the report table);
+    open sessions are counted but add no duration.
+    """
+    rows = list(rows)
+    users = {}
+    for row in sorted(rows, key=lambda r: r["timestamp"]):
+        status = row["status"].upper()
+        ts = row["timestamp"]
+        u = users.setdefault(row["name"], {"in": 0, "out": 0, "total": 0, "sessions": 0,
+                                           "seconds": 0.0, "first_in": "", "last_out": ""})
+        u["total"] += 1
+        if status == "IN":
+            u["in"] += 1
+            if not u["first_in"]:
+                u["first_in"] = ts
+        elif status == "OUT":
+            u["out"] += 1
+            u["last_out"] = ts
+    for name, time_in, time_out in pair_sessions(rows):
+        u = users[name]
+        u["sessions"] += 1
+        if time_out:
+            try:
+                delta = datetime.strptime(time_out, TS_FORMAT) - datetime.strptime(time_in, TS_FORMAT)
+                u["seconds"] += delta.total_seconds()
+            except ValueError:
+                pass
+    return users
+
+def _source_signature(day: date) -> Optional[Tuple[int, int]]:
+    path = csv_path_for(day)
+    if not path.exists():
+        return archive.partition_signature(day)
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+def _write_summary(day: date, signature: Tuple[int, int], users: Dict[str, dict]):
+    SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
+    path = summary_path_for(day)
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    payload = {"date": day.isoformat(),
+               "version": SUMMARY_VERSION,
+               "source": {"mtime_ns": signature[0], "size": signature[1]},
+               "users": users}
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def _read_summary(day: date, signature: Tuple[int, int]) -> Optional[Dict[str, dict]]:
+    path = summary_path_for(day)
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != SUMMARY_VERSION:
+            return None  # written by an older summarize_rows
+        src = payload["source"]
+        if (src["mtime_ns"], src["size"]) != tuple(signature):
+            return None  # source CSV changed since the summary was written
+        return payload["users"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def day_summary(day: Optional[date] = None) -> Dict[str, dict]:
+    """Per-user summary of one day (default today).
+
+    Closed days are served from a materialized summary file, (re)built on
+    first read or whenever the source CSV changes. Today is always derived
+    from the raw rows since it is still being written.
+    """
+    day = day or date.today()
+    signature = _source_signature(day)
+    if signature is None:
+        return {}
+    if day >= date.today():
+        return summarize_rows(read_day_rows(day))
+    cached = _summary_cache.get(day)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    users = _read_summary(day, signature)
+    if users is None:
+        users = summarize_rows(read_day_rows(day))
+        _write_summary(day, signature, users)
+    _summary_cache[day] = (signature, users)
+    return users
 
-def daily_stats():
+def day_summaries(days: List[date]) -> Dict[date, Dict[str, dict]]:
+    """``day_summary`` of several days.
+
+    Archived days not in the in-process cache are summarized from one
+    ``archive.read_range_rows`` call over their span, so a range query loads
+    each month partition once instead of once per day.
+    """
+    out: Dict[date, Dict[str, dict]] = {}
+    missing: List[Tuple[date, Tuple[int, int]]] = []
+    today = date.today()
+    for day in sorted(days):
+        if day >= today or csv_path_for(day).exists():
+            out[day] = day_summary(day)
+            continue
+        signature = archive.partition_signature(day)
+        cached = _summary_cache.get(day)
+        if signature is None:
+            out[day] = {}
+        elif cached is not None and cached[0] == signature:
+            out[day] = cached[1]
+        else:
+            missing.append((day, signature))
+    if missing:
+        rows = archive.read_range_rows(missing[0][0], missing[-1][0])
+        for day, signature in missing:
+            users = _read_summary(day, signature)
+            if users is None:
+                users = summarize_rows(rows.get(day, []))
+                _write_summary(day, signature, users)
+            _summary_cache[day] = (signature, users)
+            out[day] = users
+    return out
+
+def close_past_days() -> int:
+    """Materialize summaries for every closed day that lacks an up-to-date one.
+    Runs on a background thread (see ``log_event``); concurrent calls do the work once."""
+    if not _close_lock.acquire(blocking=False):
+        return 0
+    try:
+        n = 0
+        today = date.today()
+        for day in report_days():
+            if day >= today:
+                continue
+            signature = _source_signature(day)
+            if signature is not None and _read_summary(day, signature) is None:
+                users = summarize_rows(read_day_rows(day))
+                _write_summary(day, signature, users)
+                _summary_cache[day] = (signature, users)
+                n += 1
+        return n
+    finally:
+        _close_lock.release()
+
+def daily_stats(day: Optional[date] = None):
+    if day is not None and day < date.today():
+        users = day_summary(day)
+        return {"count": sum(u["total"] for u in users.values()),
+                "in": sum(u["in"] for u in users.values()),
+                "out": sum(u["out"] for u in users.values()),
+                "unique": len(users)}
     path = today_csv_path()
     if not path.exists():
         return {"count": 0, "in": 0, "out": 0, "unique": 0}
@@ -36,8 +235,11 @@ def daily_stats():
                 outs += 1
     return {"count": cnt, "in": ins, "out": outs, "unique": len(seen)}
 
-def user_attendance_stats():
-    """Get attendance statistics by user for today"""
+def user_attendance_stats(day: Optional[date] = None):
+    """Get attendance statistics by user for today (or a closed day)"""
+    if day is not None and day < date.today():
+        return {name: {"in": u["in"], "out": u["out"], "total": u["total"]}
+                for name, u in day_summary(day).items()}
     path = today_csv_path()
     if not path.exists():
         return {}
@@ -60,6 +262,18 @@ def user_attendance_stats():
     
     return user_stats
 
+def last_status_today(person: str) -> Optional[str]:
+    """Last recorded status (IN/OUT) of a person today, or None"""
+    path = today_csv_path()
+    if not path.exists():
+        return None
+    last_status = None
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["name"] == person:
+                last_status = row["status"]
+    return last_status
+
 def can_attend_today(person: str) -> tuple[bool, str]:
     """
     Check if a person can attend today (no limit, alternating IN/OUT)
@@ -85,91 +299,53 @@ def get_next_attendance_status(person: str) -> str:
     else:
         return "IN"  # This shouldn't happen if can_attend_today is checked first
 
+def pair_sessions(rows) -> List[Tuple[str, str, str]]:
+    """Pair each IN with the person's next OUT; returns (name, time_in, time_out)."""
+    person_records = {}
+    for record in rows:
+        person_records.setdefault(record["name"], []).append(
+            (record["timestamp"], record["status"].upper()))
+
+    sessions = []
+    for name, records in person_records.items():
+        records.sort()
+        i = 0
+        while i < len(records):
+            time_in, status = records[i]
+            if status != "IN":
+                # OUT without corresponding IN (shouldn't happen with new logic)
+                i += 1
+                continue
+            time_out = ""
+            for j in range(i + 1, len(records)):
+                if records[j][1] == "OUT":
+                    time_out = records[j][0]
+                    i = j + 1  # Skip the OUT record
+                    break
+            else:
+                i += 1  # No OUT found, just IN
+            sessions.append((name, time_in, time_out))
+    return sessions
+
+def iter_detailed_records(days: Optional[List[date]] = None, name_contains: str = ""):
+    """Yield report rows (name, date, time_in, time_out) one day at a time,
+    newest day first, so callers can stream any range in bounded memory."""
+    kw = name_contains.strip().lower()
+    for day in sorted(report_days() if days is None else days, reverse=True):
+        sessions = pair_sessions(read_day_rows(day))
+        sessions.sort(key=lambda s: s[0], reverse=True)
+        date_str = day.strftime("%d/%m/%Y")
+        for name, time_in, time_out in sessions:
+            if kw and kw not in name.lower():
+                continue
+            yield {"name": name, "date": date_str, "time_in": time_in, "time_out": time_out}
+
 def get_detailed_attendance_data():
     """
     Get detailed attendance data for table display
     Returns list of dicts with: name, date, time_in, time_out
     """
-    from datetime import datetime
-    import os
-    
-    data = []
-    attendance_dir = REPORTS_DIR
-    
-    if not attendance_dir.exists():
-        return data
-    
-    # Get all CSV files
-    csv_files = list(attendance_dir.glob("*.csv"))
-    csv_files.sort()  # Sort by date
-    
-    for csv_file in csv_files:
-        date_str = csv_file.stem  # filename without extension
-        try:
-            # Parse date from filename (format: attendance_YYYYMMDD)
-            if date_str.startswith("attendance_"):
-                date_part = date_str[11:]  # Remove "attendance_" prefix
-                date_obj = datetime.strptime(date_part, "%Y%m%d").date()
-            else:
-                # Fallback for other formats
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-            
-            with open(csv_file, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                daily_records = list(reader)
-            
-            # Group by person and show all attendance records
-            person_records = {}
-            for record in daily_records:
-                name = record["name"]
-                if name not in person_records:
-                    person_records[name] = []
-                
-                status = record["status"].upper()
-                time_str = record["timestamp"]
-                
-                person_records[name].append({
-                    "status": status,
-                    "time": time_str
-                })
-            
-            # Add to data - show all attendance records
-            for name, records in person_records.items():
-                # Sort records by time
-                records.sort(key=lambda x: x["time"])
-                
-                # Group consecutive IN/OUT pairs
-                i = 0
-                while i < len(records):
-                    current_record = records[i]
-                    if current_record["status"] == "IN":
-                        # Look for corresponding OUT
-                        time_in = current_record["time"]
-                        time_out = ""
-                        
-                        # Find next OUT record
-                        for j in range(i + 1, len(records)):
-                            if records[j]["status"] == "OUT":
-                                time_out = records[j]["time"]
-                                i = j + 1  # Skip the OUT record
-                                break
-                        else:
-                            i += 1  # No OUT found, just IN
-                        
-                        data.append({
-                            "name": name,
-                            "date": date_obj.strftime("%d/%m/%Y"),
-                            "time_in": time_in,
-                            "time_out": time_out
-                        })
-                    else:
-                        # OUT without corresponding IN (shouldn't happen with new logic)
-                        i += 1
-                
-        except ValueError:
-            # Skip invalid date formats
-            continue
-    
+    data = list(iter_detailed_records())
     # Sort by date (newest first), then by name
     data.sort(key=lambda x: (x["date"], x["name"]), reverse=True)
     return data
@@ -0,0 +1,174 @@
+# audit.py
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from config import AUDIT_DUP_SIM, AUDIT_OUTLIER_SIM, AUDIT_BLOCK, TMP_DIR
+from registry import Registry, sample_index
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    return (m / (np.linalg.norm(m, axis=-1, keepdims=True) + 1e-8)).astype(np.float32)
+
+
+def duplicate_pairs(matrix: np.ndarray, threshold: float = AUDIT_DUP_SIM,
+                    block: int = AUDIT_BLOCK) -> Tuple[List[Tuple[int, int, float]], np.ndarray, np.ndarray]:
+    """All pairs i < j of centroids with cosine >= ``threshold``, plus each row's
+    nearest other identity (index, similarity).
+
+    Only the upper triangle of ``block`` x ``block`` tiles is computed, so
+    besides the gallery itself memory is one tile (block² floats) whatever
+    the number of identities."""
+    n = len(matrix)
+    nn_idx = np.full(n, -1, dtype=np.int64)
+    nn_sim = np.full(n, -1.0, dtype=np.float32)
+    pairs: List[Tuple[int, int, float]] = []
+
+    def nearest(rows: slice, sims: np.ndarray, offset: int):
+        best = sims.argmax(axis=1)
+        val = sims[np.arange(len(sims)), best]
+        better = val > nn_sim[rows]
+        nn_sim[rows][better] = val[better]
+        nn_idx[rows][better] = best[better] + offset
+
+    for i0 in range(0, n, block):
+        a = np.asarray(matrix[i0:i0 + block], dtype=np.float32)
+        for j0 in range(i0, n, block):
+            b = a if j0 == i0 else np.asarray(matrix[j0:j0 + block], dtype=np.float32)
+            sims = a @ b.T
+            if j0 == i0:
+                np.fill_diagonal(sims, -1.0)
+            nearest(slice(i0, i0 + len(a)), sims, j0)
+            if j0 != i0:
+                nearest(slice(j0, j0 + len(b)), sims.T, i0)
+            ii, jj = np.nonzero(sims >= threshold)
+            if j0 == i0:
+                ii, jj = ii[ii < jj], jj[ii < jj]
+            pairs.extend(zip((ii + i0).tolist(), (jj + j0).tolist(), sims[ii, jj].tolist()))
+    pairs.sort(key=lambda p: -p[2])
+    return pairs, nn_idx, nn_sim
+
+
+def sample_spread(vecs: np.ndarray, outlier_sim: float = AUDIT_OUTLIER_SIM):
+    """(similarity of each sample to the person's mean, indices of outliers).
+    Outliers: below ``outlier_sim``, or (4+ samples) more than 3 MADs under the median."""
+    sims = vecs @ _unit_rows(vecs.mean(axis=0))
+    bad = sims < outlier_sim
+    if len(sims) >= 4:
+        med = np.median(sims)
+        mad = np.median(np.abs(sims - med))
+        bad |= sims < med - 3.0 * max(mad, 0.01)
+    return sims, np.flatnonzero(bad)
+
+
+def audit(reg: Registry, dup_sim: float = AUDIT_DUP_SIM, outlier_sim: float = AUDIT_OUTLIER_SIM,
+          block: int = AUDIT_BLOCK, samples: bool = True) -> dict:
+    t0 = time.perf_counter()
+    names, matrix = reg.load_gallery()
+    pairs, nn_idx, nn_sim = duplicate_pairs(matrix, dup_sim, block)
+    t_pairs = time.perf_counter() - t0
+
+    people, outliers, outlier_vecs = [], [], []
+    if samples:
+        for i, name in enumerate(names):
+            data = reg.load_person(name)
+            if data is None:
+                continue
+            vecs = data["vecs"].astype(np.float32)
+            sims, bad = sample_spread(vecs, outlier_sim)
+            images = sorted(reg.sample_images(name), key=sample_index)
+            people.append({"person": name, "samples": len(vecs), "spread": round(float(1.0 - sims.mean()), 4),
+                           "min_sample_sim": round(float(sims.min()), 4),
+                           "nearest": names[nn_idx[i]] if nn_idx[i] >= 0 else "",
+                           "nearest_sim": round(float(nn_sim[i]), 4)})
+            for k in bad:
+                outliers.append({"person": name, "sample": int(k), "sim_to_own": round(float(sims[k]), 4),
+                                 # vecs and images line up unless legacy images were added separately
+                                 "image": str(images[k]) if len(images) == len(vecs) else ""})
+                outlier_vecs.append(vecs[k])
+        # Does an outlier look more like someone else? (mislabeled sample)
+        if outlier_vecs:
+            q = _unit_rows(np.stack(outlier_vecs))
+            own = {n: i for i, n in enumerate(names)}
+            for s0 in range(0, len(q), block):
+                sims = q[s0:s0 + block] @ matrix.T
+                for r, o in enumerate(outliers[s0:s0 + block]):
+                    sims[r, own[o["person"]]] = -1.0
+                best = sims.argmax(axis=1)
+                for r, o in enumerate(outliers[s0:s0 + block]):
+                    o["best_other"] = names[best[r]] if len(names) > 1 else ""
+                    o["best_other_sim"] = round(float(sims[r, best[r]]), 4)
+        outliers.sort(key=lambda o: o["sim_to_own"])
+
+    return {
+        "identities": len(names),
+        "dup_sim": dup_sim,
+        "outlier_sim": outlier_sim,
+        "block": block,
+        "pairs_seconds": round(t_pairs, 3),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "duplicates": [{"a": names[i], "b": names[j], "sim": round(s, 4)} for i, j, s in pairs],
+        "outliers": outliers,
+        "people": people,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gallery health audit: suspected duplicate identities and outlier samples")
+    parser.add_argument("--dup-sim", type=float, default=AUDIT_DUP_SIM,
+                        help="centroid cosine at which two identities are reported as possible duplicates")
+    parser.add_argument("--outlier-sim", type=float, default=AUDIT_OUTLIER_SIM,
+                        help="sample-to-own-mean cosine below which a sample is an outlier")
+    parser.add_argument("--block", type=int, default=AUDIT_BLOCK, help="tile size of the blocked all-pairs pass")
+    parser.add_argument("--top", type=int, default=20, help="rows of each list printed")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="time the all-pairs pass on N random identities (10 planted duplicates) instead")
+    parser.add_argument("--out", type=Path, help="report JSON (default: TMP_DIR/audit_<time>.json)")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from bench_matching import synth_gallery
+        matrix = synth_gallery(args.synthetic)
+        rng = np.random.default_rng(2)
+        src, dst = rng.choice(len(matrix), (2, 10), replace=False)
+        matrix[dst] = _unit_rows(matrix[src] + 0.02 * rng.standard_normal((10, matrix.shape[1]), dtype=np.float32))
+        t0 = time.perf_counter()
+        pairs, _idx, _sim = duplicate_pairs(matrix, args.dup_sim, args.block)
+        print(f"{len(matrix)} identities: {len(pairs)} pair(s) >= {args.dup_sim} in "
+              f"{time.perf_counter() - t0:.2f}s (tile {args.block}x{args.block}, "
+              f"{args.block * args.block * 4 / 2**20:.0f} MiB)")
+        return 0
+
+    report = audit(Registry(), args.dup_sim, args.outlier_sim, args.block)
+    print(f"Audited {report['identities']} identities in {report['seconds']:.2f}s "
+          f"(all-pairs {report['pairs_seconds']:.2f}s)")
+    print(f"\nSuspected duplicates (centroid cosine >= {args.dup_sim}): {len(report['duplicates'])}")
+    for d in report["duplicates"][:args.top]:
+        print(f"  {d['sim']:.3f}  {d['a']}  <->  {d['b']}")
+    print(f"\nOutlier samples (cosine to own mean < {args.outlier_sim} or far below the person's median): "
+          f"{len(report['outliers'])}")
+    for o in report["outliers"][:args.top]:
+        other = f"  closer to {o['best_other']} ({o['best_other_sim']:.3f})" \
+            if o.get("best_other") and o["best_other_sim"] > o["sim_to_own"] else ""
+        print(f"  {o['sim_to_own']:.3f}  {o['person']} #{o['sample']}  {o['image']}{other}")
+    widest = sorted(report["people"], key=lambda p: -p["spread"])[:args.top]
+    if widest:
+        print("\nWidest sample spread (1 - mean cosine to own mean):")
+        for p in widest:
+            print(f"  {p['spread']:.3f}  {p['person']} ({p['samples']} samples)")
+
+    out = args.out or TMP_DIR / f"audit_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
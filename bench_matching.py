@@ -0,0 +1,197 @@
+# bench_matching.py
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from config import TMP_DIR
+from registry import Registry, match_matrix
+
+DIM = 512
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+FORMATS = ("npz_per_person", "npy_matrix", "npy_mmap")
+
+
+def synth_gallery(n: int, seed: int = 0) -> np.ndarray:
+    """(n, 512) random L2-normalized float32 centroids."""
+    rng = np.random.default_rng(seed)
+    m = rng.standard_normal((n, DIM), dtype=np.float32)
+    m /= np.linalg.norm(m, axis=1, keepdims=True)
+    return m
+
+
+def synth_queries(gallery: np.ndarray, count: int, noise: float = 0.6, seed: int = 1) -> np.ndarray:
+    """Noisy copies of random gallery rows (about half land above SIM_THRESHOLD)."""
+    rng = np.random.default_rng(seed)
+    q = gallery[rng.integers(0, len(gallery), count)] + noise * rng.standard_normal((count, DIM), dtype=np.float32) / np.sqrt(DIM)
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    a = np.asarray(samples_ms)
+    return {"p50_ms": round(float(np.percentile(a, 50)), 4), "p90_ms": round(float(np.percentile(a, 90)), 4),
+            "p99_ms": round(float(np.percentile(a, 99)), 4), "mean_ms": round(float(a.mean()), 4)}
+
+
+def _timed(fn, repeats: int) -> List[float]:
+    out = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def write_format(fmt: str, root: Path, names: List[str], matrix: np.ndarray):
+    root.mkdir(parents=True, exist_ok=True)
+    if fmt == "npz_per_person":
+        # What Registry.write_embeddings produces (one vec per person here)
+        for name, c in zip(names, matrix):
+            with open(root / f"{name}.npz", "wb") as f:
+                np.savez_compressed(f, vecs=c[None, :], centroid=c)
+    else:
+        np.save(root / "centroids.npy", matrix)
+        with open(root / "names.json", "w", encoding="utf-8") as f:
+            json.dump(names, f)
+
+
+def load_format(fmt: str, root: Path):
+    if fmt == "npz_per_person":
+        return Registry(embed_dir=root, faces_dir=root / "_faces").load_gallery()
+    with open(root / "names.json", encoding="utf-8") as f:
+        names = json.load(f)
+    return names, np.load(root / "centroids.npy", mmap_mode="r" if fmt == "npy_mmap" else None)
+
+
+def bench_size(n: int, formats, queries: int, batch: int, max_files: int, workdir: Path) -> List[dict]:
+    names = [f"user_{i:07d}" for i in range(n)]
+    gallery = synth_gallery(n)
+    q = synth_queries(gallery, queries)
+    results = []
+
+    for fmt in formats:
+        res = {"size": n, "format": fmt}
+        if fmt == "npz_per_person" and n > max_files:
+            res["skipped"] = f"more than --max-files={max_files} files"
+            results.append(res)
+            print(f"  {fmt:15s} n={n:>9,}  skipped ({res['skipped']})")
+            continue
+        root = workdir / f"{fmt}_{n}"
+        t0 = time.perf_counter()
+        write_format(fmt, root, names, gallery)
+        res["write_sec"] = round(time.perf_counter() - t0, 4)
+        res["disk_bytes"] = sum(p.stat().st_size for p in root.iterdir() if p.is_file())
+
+        # Cold load: fresh reader, allocations traced
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        l_names, l_matrix = load_format(fmt, root)
+        res["load_sec"] = round(time.perf_counter() - t0, 4)
+        res["load_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        res["matrix_bytes"] = int(l_matrix.nbytes)
+
+        # First query pays page faults for mmap
+        t0 = time.perf_counter()
+        match_matrix(l_names, l_matrix, q[:1])
+        res["first_match_ms"] = round((time.perf_counter() - t0) * 1000.0, 4)
+
+        if fmt == "npz_per_person":
+            # Full Registry.match path (cached matrix + directory signature check)
+            reg = Registry(embed_dir=root, faces_dir=root / "_faces")
+            reg.load_gallery()
+            it = iter(range(10 ** 9))
+            single = _timed(lambda: reg.match(q[next(it) % len(q)]), min(queries, 200))
+            batched = _timed(lambda: reg.match_batch(q[:batch]), max(5, min(50, queries // batch)))
+            res["path"] = "Registry.match"
+        else:
+            it = iter(range(10 ** 9))
+            single = _timed(lambda: match_matrix(l_names, l_matrix, q[next(it) % len(q)][None, :]), min(queries, 200))
+            batched = _timed(lambda: match_matrix(l_names, l_matrix, q[:batch]), max(5, min(50, queries // batch)))
+            res["path"] = "match_matrix"
+        res["single"] = _percentiles(single)
+        res["single"]["qps"] = round(1000.0 / res["single"]["mean_ms"], 1)
+        res["batch"] = _percentiles(batched)
+        res["batch"]["size"] = batch
+        res["batch"]["qps"] = round(batch * 1000.0 / res["batch"]["mean_ms"], 1)
+        recognized = sum(1 for name, _ in match_matrix(l_names, l_matrix, q) if name)
+        res["accept_rate"] = round(recognized / len(q), 4)
+        l_matrix = None  # drop the memory map before removing its file (the lambdas above close over it)
+        shutil.rmtree(root, ignore_errors=True)
+
+        results.append(res)
+        print(f"  {fmt:15s} n={n:>9,}  load={res['load_sec']:.3f}s  "
+              f"match p50={res['single']['p50_ms']:.3f}ms p99={res['single']['p99_ms']:.3f}ms  "
+              f"batch{batch}={res['batch']['qps']:.0f} q/s  mem={res['matrix_bytes'] / 2**20:.1f}MiB")
+    return results
+
+
+def environment() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {"git": rev, "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(old_path: Path, new: dict, tolerance: float = 0.2) -> int:
+    """Print per (size, format) p50 ratios against an older result file; 1 if any regressed."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["size"], r["format"]): r for r in json.load(f)["results"] if "single" in r}
+    regressed = 0
+    print(f"\nCompared with {old_path} (p50 more than {tolerance:.0%} slower is flagged):")
+    for r in new["results"]:
+        o = old.get((r["size"], r["format"]))
+        if o is None or "single" not in r:
+            continue
+        for key in ("single", "batch"):
+            ratio = r[key]["p50_ms"] / max(o[key]["p50_ms"], 1e-9)
+            flag = "  REGRESSION" if ratio > 1 + tolerance else ""
+            regressed |= bool(flag)
+            print(f"  {r['format']:15s} n={r['size']:>9,} {key:6s} p50 x{ratio:.2f}{flag}")
+    return int(regressed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark gallery matching on synthetic L2-normalized galleries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--queries", type=int, default=1000, help="query embeddings per size")
+    parser.add_argument("--batch", type=int, default=32, help="queries per match_batch call")
+    parser.add_argument("--max-files", type=int, default=20_000,
+                        help="largest gallery written as per-person .npz files")
+    parser.add_argument("--out", type=Path, help="result JSON (default: TMP_DIR/bench_matching_<time>.json)")
+    parser.add_argument("--compare", type=Path, help="previous result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown in --compare")
+    args = parser.parse_args(argv)
+
+    report = {"benchmark": "matching", "env": environment(), "results": []}
+    with tempfile.TemporaryDirectory(prefix="bench_matching_") as tmp:
+        for n in sorted(args.sizes):
+            print(f"Gallery size {n:,}")
+            report["results"].extend(bench_size(n, args.formats, args.queries, args.batch, args.max_files, Path(tmp)))
+
+    out = args.out or TMP_DIR / f"bench_matching_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+    if args.compare:
+        return compare(args.compare, report, args.tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
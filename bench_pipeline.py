@@ -0,0 +1,150 @@
+# bench_pipeline.py
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import archive
+import attendance
+from bench_matching import environment
+from camera import SyntheticCamera, open_camera
+from config import TMP_DIR
+from metrics import METRICS
+from scanner import FrameGrabber, Scanner
+from utils import CooldownKeeper
+
+STAGES = ("camera_read", "resize", "detect", "recognize", "match", "attendance", "convert", "capture_to_log")
+
+
+@contextmanager
+def scratch_reports(root: Path):
+    """Send attendance rows written during the run to ``root`` instead of the real reports."""
+    saved = attendance.REPORTS_DIR, attendance.SUMMARY_DIR, archive.ARCHIVE_DIR
+    attendance.REPORTS_DIR, attendance.SUMMARY_DIR = root, root / "summaries"
+    archive.ARCHIVE_DIR = root / "archive"
+    root.mkdir(parents=True, exist_ok=True)
+    try:
+        yield
+    finally:
+        attendance.REPORTS_DIR, attendance.SUMMARY_DIR, archive.ARCHIVE_DIR = saved
+        attendance._summary_cache.clear()
+        archive._load.cache_clear()
+
+
+def enroll_synthetic(engine, reg, cap) -> int:
+    """Register the faces a SyntheticCamera pastes so they are recognized and logged."""
+    if not isinstance(cap, SyntheticCamera):
+        return 0
+    for i, crop in enumerate(cap.crops):
+        reg.write_embeddings(f"bench_{i:03d}", engine.embed_aligned([crop]))
+    return len(cap.crops)
+
+
+def run_config(source, det_size: int, faces: int, threads: int, seconds: float, warmup: float,
+               camera_fps: float, workdir: Path, crowd_workers: int = 0, size=(1280, 720)) -> dict:
+    from face_engine import FaceEngine
+    from registry import Registry
+
+    res = {"source": str(source), "det_size": det_size, "faces": faces, "threads": threads,
+           "camera_fps": camera_fps, "crowd_workers": crowd_workers}
+    engine = FaceEngine(threads=threads, det_size=(det_size, det_size))
+    cap = open_camera(source, fps=camera_fps, faces=faces, size=size)
+    if not cap.isOpened():
+        res["error"] = "source could not be opened"
+        return res
+    crowd = None
+    if crowd_workers:
+        from crowd import CrowdDetector
+        crowd = CrowdDetector(engine, workers=crowd_workers).warmup()
+    run_dir = workdir / f"d{det_size}_f{faces}_t{threads}_c{crowd_workers}"
+    reg = Registry(embed_dir=run_dir / "embeddings", faces_dir=run_dir / "faces")
+    res["identities"] = enroll_synthetic(engine, reg, cap)
+
+    with scratch_reports(run_dir / "reports"):
+        ok, frame = cap.read()
+        if ok:
+            engine.detect_and_embed(frame)  # first inference allocates; keep it out of the numbers
+        grabber = FrameGrabber(cap).start()
+        scanner = Scanner(engine, reg, grabber, CooldownKeeper(0), fps_limit=0, crowd=crowd).start()
+        time.sleep(warmup)
+        METRICS.reset()
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        time.sleep(seconds)
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        snap = METRICS.snapshot()
+        scanner.stop()
+        grabber.stop()
+        cap.release()
+        if crowd is not None:
+            crowd.close()
+
+    c = snap["counters"]
+    processed = c.get("frames_processed", 0)
+    res.update({
+        "seconds": round(wall, 2),
+        "fps": round(processed / wall, 2),
+        "frames_captured": c.get("frames_captured", 0),
+        "frames_processed": processed,
+        "frames_dropped": c.get("frames_dropped", 0),
+        "faces_detected_per_frame": round(c.get("faces_detected", 0) / processed, 2) if processed else 0.0,
+        "recognized": c.get("faces_recognized", 0),
+        "attendance_logged": c.get("attendance_logged", 0),
+        "cpu_percent": round(100.0 * cpu / wall, 1),
+        "cpu_percent_of_machine": round(100.0 * cpu / wall / (os.cpu_count() or 1), 1),
+        "stages": {k: v for k, v in snap["stages"].items() if k in STAGES},
+    })
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end scan pipeline benchmark (no webcam needed)")
+    parser.add_argument("--source", default="synthetic",
+                        help='"synthetic" (stored face crops pasted on frames), a video file or an image folder')
+    parser.add_argument("--det-sizes", type=int, nargs="+", default=[320, 480, 640])
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4], help="faces per synthetic frame")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0, 1], help="ONNXRuntime threads (0 = default)")
+    parser.add_argument("--crowd-workers", type=int, nargs="+", default=[0],
+                        help="crowd-mode tile worker processes (0 = crowd mode off)")
+    parser.add_argument("--size", default="1280x720", help="synthetic frame size WxH (e.g. 3840x2160)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="measured duration per configuration")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--camera-fps", type=float, default=0.0,
+                        help="source frame rate (0 = as fast as possible; e.g. 30 to emulate a webcam)")
+    parser.add_argument("--out", type=Path, help="result JSON (default: TMP_DIR/bench_pipeline_<time>.json)")
+    args = parser.parse_args(argv)
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    faces = args.faces if args.source == "synthetic" else [0]
+    report = {"benchmark": "pipeline", "env": environment(), "results": []}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        for det_size, n_faces, threads, crowd_workers in itertools.product(args.det_sizes, faces, args.threads,
+                                                                           args.crowd_workers):
+            print(f"det_size={det_size} faces={n_faces} threads={threads} crowd_workers={crowd_workers} ...",
+                  flush=True)
+            r = run_config(args.source, det_size, n_faces, threads, args.seconds, args.warmup,
+                           args.camera_fps, Path(tmp), crowd_workers, size)
+            report["results"].append(r)
+            if "error" in r:
+                print(f"  ERROR: {r['error']}")
+                continue
+            st = r["stages"]
+            lat = " ".join(f"{k}={st[k]['p50_ms']:g}/{st[k]['p99_ms']:g}" for k in ("detect", "recognize", "match")
+                           if k in st)
+            print(f"  fps={r['fps']:.1f} cpu={r['cpu_percent']:.0f}% dropped={r['frames_dropped']} "
+                  f"faces/frame={r['faces_detected_per_frame']} p50/p99 ms: {lat}")
+
+    out = args.out or TMP_DIR / f"bench_pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
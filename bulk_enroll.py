@@ -0,0 +1,142 @@
+# bulk_enroll.py
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from config import SAVE_CONTEXT_IMAGE, CONTEXT_MAX_SIDE
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+_engine = None  # one FaceEngine (or inference worker client) per worker process
+
+
+def _init_worker(threads: int):
+    global _engine
+    from inference_server import create_engine
+    _engine = create_engine(threads=threads)
+
+
+def imread(path) -> np.ndarray:
+    # np.fromfile + imdecode also works for non-ASCII paths on Windows
+    return cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _embed_job(job: Tuple[str, str]):
+    """Detect + embed the largest face; return it as an aligned FaceSample."""
+    from registry import FaceSample
+    person, path = job
+    try:
+        img = imread(path)
+    except Exception:
+        img = None
+    if img is None:
+        return person, path, None, None, "unreadable"
+    try:
+        face = _engine.largest_face(img)
+        if face is None:
+            return person, path, None, None, "no_face"
+        bbox, kps, score, emb = face
+        # Only the crop (and, if configured, a small context image) goes back to the parent
+        context = _downscale(img) if SAVE_CONTEXT_IMAGE else None
+        sample = FaceSample(_engine.align(img, kps), kps, bbox, score, context)
+    except Exception as e:
+        # One bad image (odd shape, model error) must not abort the whole pool.map
+        return person, path, None, None, str(e) or type(e).__name__
+    return person, path, emb, sample, ""
+
+
+def _downscale(img: np.ndarray) -> np.ndarray:
+    h, w = img.shape[:2]
+    scale = CONTEXT_MAX_SIDE / max(h, w)
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def collect_images(root: Path) -> List[Tuple[str, str]]:
+    """(person, image path) for every <root>/<person>/<image>."""
+    jobs = []
+    for person_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        person = person_dir.name.strip().replace(" ", "_")
+        for img in sorted(person_dir.iterdir()):
+            if img.suffix.lower() in IMAGE_EXTS:
+                jobs.append((person, str(img)))
+    return jobs
+
+
+def bulk_enroll(root: Path, workers: int, threads: int = 1, skip_existing: bool = False,
+                dry_run: bool = False) -> Dict:
+    from registry import Registry
+
+    reg = Registry()
+    jobs = collect_images(root)
+    if skip_existing:
+        existing = {p.lower() for p in reg.list_people()}
+        jobs = [j for j in jobs if j[0].lower() not in existing]
+    if not jobs:
+        print("No images to enroll.")
+        return {"images": 0, "enrolled": 0, "people": 0, "failures": [], "seconds": 0.0}
+
+    print(f"Enrolling {len(jobs)} images with {workers} worker process(es)...")
+    t0 = time.perf_counter()
+    embs: Dict[str, List[np.ndarray]] = {}
+    samples: Dict[str, List] = {}
+    failures = []
+    chunksize = max(1, min(16, len(jobs) // (workers * 4) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as ex:
+        for i, (person, path, emb, sample, err) in enumerate(ex.map(_embed_job, jobs, chunksize=chunksize), 1):
+            if emb is None:
+                failures.append((person, path, err))
+                print(f"FAIL: {path}: {err}")
+            else:
+                embs.setdefault(person, []).append(emb)
+                samples.setdefault(person, []).append(sample)
+            if i % 100 == 0:
+                rate = i / (time.perf_counter() - t0)
+                print(f"  {i}/{len(jobs)} images ({rate:.1f} img/s)")
+    elapsed = time.perf_counter() - t0
+
+    # One registry commit for the whole roster
+    batch = {p: (np.stack(v), samples[p]) for p, v in embs.items()}
+    if not dry_run:
+        reg.add_batch(batch)
+        reg.flush()
+    enrolled = sum(len(v) for v in embs.values())
+    return {"images": len(jobs), "enrolled": enrolled, "people": len(batch),
+            "failures": failures, "seconds": elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-enroll faces from <dir>/<person>/*.jpg")
+    parser.add_argument("root", type=Path, help="directory with one sub-folder per person")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="worker processes (default: CPU count - 1)")
+    parser.add_argument("--threads", type=int, default=1, help="ONNXRuntime threads per worker")
+    parser.add_argument("--skip-existing", action="store_true", help="skip people already registered")
+    parser.add_argument("--dry-run", action="store_true", help="embed but do not write to the registry")
+    parser.add_argument("--failures", help="write per-image failures to this CSV")
+    args = parser.parse_args(argv)
+
+    if not args.root.is_dir():
+        parser.error(f"not a directory: {args.root}")
+    r = bulk_enroll(args.root, args.workers, args.threads, args.skip_existing, args.dry_run)
+    if args.failures and r["failures"]:
+        with open(args.failures, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["person", "path", "error"])
+            w.writerows(r["failures"])
+    rate = r["images"] / r["seconds"] if r["seconds"] else 0.0
+    print(f"Done: {r['enrolled']}/{r['images']} images enrolled for {r['people']} people, "
+          f"{len(r['failures'])} failed, {r['seconds']:.1f}s ({rate:.1f} img/s)")
+    return 0 if not r["failures"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
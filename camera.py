@@ -0,0 +1,164 @@
+# camera.py
+import time
+from pathlib import Path
+from typing import List, Optional, Union
+
+import cv2
+import numpy as np
+
+from config import FACES_DIR
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# All sources expose the subset of cv2.VideoCapture that the app uses
+# (isOpened / read / release), so FrameGrabber works with any of them.
+
+
+class _Paced:
+    """Sleep so that read() returns at most ``fps`` frames per second (0 = as fast as possible)."""
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self._next = 0.0
+
+    def _pace(self):
+        if self.fps <= 0:
+            return
+        now = time.perf_counter()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = max(now, self._next) + 1.0 / self.fps
+
+
+class VideoFileCamera(_Paced):
+    """Replay a video file, at its own frame rate by default; ``loop`` restarts at the end."""
+
+    def __init__(self, path: Union[str, Path], fps: Optional[float] = None, loop: bool = True):
+        self.cap = cv2.VideoCapture(str(path))
+        native = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0.0
+        super().__init__((native or 30.0) if fps is None else fps)
+        self.loop = loop
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self):
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        self._pace()
+        return ok, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageFolderCamera(_Paced):
+    """Cycle through the images of a folder (or a single image) as frames."""
+
+    def __init__(self, path: Union[str, Path], fps: float = 15.0, loop: bool = True):
+        super().__init__(fps)
+        path = Path(path)
+        files = [path] if path.is_file() else sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        self.frames = [f for f in (cv2.imread(str(p)) for p in files) if f is not None]
+        self.loop = loop
+        self._i = 0
+
+    def isOpened(self) -> bool:
+        return bool(self.frames)
+
+    def read(self):
+        if self._i >= len(self.frames):
+            if not self.loop or not self.frames:
+                return False, None
+            self._i = 0
+        frame = self.frames[self._i]
+        self._i += 1
+        self._pace()
+        return True, frame.copy()
+
+    def release(self):
+        self.frames = []
+
+
+def stored_face_crops(limit: int = 64) -> List[np.ndarray]:
+    """Aligned sample crops from FACES_DIR (one per person first), for synthetic frames."""
+    from registry import Registry
+
+    reg = Registry()
+    per_person = []
+    for person in sorted(p.name for p in FACES_DIR.iterdir() if p.is_dir()) if FACES_DIR.exists() else []:
+        images = [p for p in reg.sample_images(person) if (reg.sample_meta(p) or {}).get("aligned")]
+        per_person.append(images)
+    crops = []
+    depth = 0
+    while len(crops) < limit and any(len(imgs) > depth for imgs in per_person):
+        for imgs in per_person:
+            if len(imgs) > depth and len(crops) < limit:
+                img = cv2.imread(str(imgs[depth]))
+                if img is not None:
+                    crops.append(img)
+        depth += 1
+    return crops
+
+
+class SyntheticCamera(_Paced):
+    """Generated frames with ``faces`` face crops pasted on a moving background.
+
+    Crops default to the stored aligned samples; without any, frames carry no
+    faces and only exercise capture/detection cost.
+    """
+
+    def __init__(self, faces: int = 1, size=(1280, 720), fps: float = 30.0, face_px: int = 160,
+                 crops: Optional[List[np.ndarray]] = None, seed: int = 0):
+        super().__init__(fps)
+        self.faces = faces
+        self.w, self.h = size
+        self.face_px = face_px
+        self.crops = stored_face_crops() if crops is None else crops
+        self._rng = np.random.default_rng(seed)
+        self._t = 0
+        yy, xx = np.mgrid[0:self.h, 0:self.w]
+        self._base = ((xx * 255 // max(1, self.w - 1) + yy * 255 // max(1, self.h - 1)) // 2).astype(np.uint8)
+        self._tiles = [cv2.resize(c, (face_px, face_px)) for c in self.crops]
+        cols = max(1, self.w // (face_px + 40))
+        self._slots = [(40 + (i % cols) * (face_px + 40), 40 + (i // cols) * (face_px + 40)) for i in range(faces)]
+
+    def isOpened(self) -> bool:
+        return True
+
+    def read(self):
+        self._t += 1
+        shade = np.roll(self._base, self._t * 4, axis=1)
+        frame = cv2.merge([shade, np.flipud(shade), np.full_like(shade, 96)])
+        if self._tiles:
+            for i, (x, y) in enumerate(self._slots):
+                dx, dy = (int(v) for v in self._rng.integers(-6, 7, 2))
+                x, y = min(max(0, x + dx), self.w - self.face_px), min(max(0, y + dy), self.h - self.face_px)
+                frame[y:y + self.face_px, x:x + self.face_px] = self._tiles[(i + self._t // 30) % len(self._tiles)]
+        self._pace()
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_camera(source: Union[int, str] = 0, fps: Optional[float] = None, faces: int = 1, loop: bool = True,
+                size=(1280, 720)):
+    """Open a frame source by spec.
+
+      0, "1"             OpenCV webcam index
+      "synthetic"        SyntheticCamera (``faces`` pasted faces per frame, ``size`` frames)
+      a video file       VideoFileCamera (native fps unless ``fps`` is given; 0 = as fast as possible)
+      an image / folder  ImageFolderCamera
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    if str(source) == "synthetic":
+        return SyntheticCamera(faces=faces, size=size, fps=30.0 if fps is None else fps)
+    path = Path(source)
+    if path.is_dir() or path.suffix.lower() in IMAGE_EXTS:
+        return ImageFolderCamera(path, fps=15.0 if fps is None else fps, loop=loop)
+    return VideoFileCamera(path, fps=fps, loop=loop)
@@ -7,6 +7,8 @@ DATA_DIR = BASE_DIR / "app" / "data"
 FACES_DIR = DATA_DIR / "faces"
 EMBED_DIR = DATA_DIR / "embeddings"
 REPORTS_DIR = BASE_DIR / "app" / "reports"
+SUMMARY_DIR = REPORTS_DIR / "summaries"   # materialized per-day summaries of closed days
+ARCHIVE_DIR = REPORTS_DIR / "archive"       # monthly columnar partitions of closed days
 TMP_DIR = BASE_DIR / "app" / "tmp"
 
 # Thresholds & params
@@ -15,13 +17,84 @@ MIN_FACE_SIZE = 50        # pixels (shorter side) to consider a face valid
 ATTEND_COOLDOWN_SEC = 5   # min seconds between two scans of the same person
 TOPK = 1                  # only use best match
 
+# Stored samples (aligned 112x112 crops + JSON sidecar)
+SAVE_CONTEXT_IMAGE = False  # also keep a downscaled copy of the full frame
+CONTEXT_MAX_SIDE = 320      # longest side of the context image
+
+# Analytics
+WORK_START = "08:00"      # scheduled start of day (HH:MM), used for late arrivals
+LATE_GRACE_MIN = 5        # minutes after WORK_START before a first IN counts as late
+
+# Report table (report_model.py)
+REPORT_PAGE_SIZE = 200      # rows materialized per report table page
+REPORT_FILTER_DEBOUNCE_MS = 250  # delay after the last keystroke before filtering
+
 # InsightFace
 PROVIDERS = ["CPUExecutionProvider"]
 MODEL_NAME = "buffalo_l"  # auto download on first run
 DET_SIZE = (480, 480)       # detection input size (smaller => faster)
 EMB_NORM = True             # L2-normalize embeddings before cosine
 
+# Persistent inference worker (python inference_server.py); None = load the model in-process
+INFERENCE_ADDRESS = None    # e.g. "127.0.0.1:7711" or "/tmp/attendance-infer.sock"
+INFERENCE_AUTHKEY_FILE = TMP_DIR / "inference.key"  # per-install random secret (0600), created on first use
+FRAME_RING_SLOTS = 4        # shared-memory frame slots per inference client
+FRAME_RING_SLOT_BYTES = 1920 * 1080 * 3  # slot capacity (larger frames grow the ring)
+
+# Tracking (tracking.py): per-face identity voting instead of matching every frame
+TRACK_IOU = 0.3             # min box overlap to continue a track in the next frame
+TRACK_VOTES = 3             # accepted matches needed to commit a track's identity (and other-person matches to drop it)
+TRACK_REVERIFY_SEC = 2.0    # committed tracks are re-matched only this often
+TRACK_MAX_AGE_SEC = 1.0     # a track not seen for this long ends
+TRACK_FORGET_SEC = 3.0      # an ended track's attendance state is kept for a returning track this long
+
+# Template adaptation (adaptation.py): confident recognitions refine the person's template
+ADAPT_MODE = ""             # "" = off, "ema" (moving centroid) or "reservoir" (fixed-size sample reservoir)
+ADAPT_MIN_SIM = 0.55        # only recognitions at least this similar feed back
+ADAPT_INTERVAL_SEC = 30     # at most one sample per person per interval
+ADAPT_EMA_ALPHA = 0.05      # weight of one sample in the moving centroid
+ADAPT_RESERVOIR = 20        # adapted samples kept per person (reservoir mode)
+ADAPT_FLUSH_SEC = 300       # pending samples are written to the registry this often
+
+# Unknown faces (unknowns.py): clustered while scanning, enrollable from Tools > Người lạ
+UNKNOWN_CLUSTERING = True
+UNKNOWN_DIR = TMP_DIR / "unknowns"  # representative crops per cluster (cleared at start)
+UNKNOWN_CLUSTER_SIM = 0.45  # cosine to a cluster centroid to join it
+UNKNOWN_MAX_CLUSTERS = 200  # beyond this the least recently seen cluster is evicted
+UNKNOWN_SAMPLES = 5         # best-scored faces (embedding + crop) kept per cluster
+UNKNOWN_SAMPLE_SEC = 1.0    # min interval between samples taken from one track
+
+# Crowd mode: tiled full-resolution detection for high-resolution cameras (crowd.py)
+CROWD_MODE = False          # detect on overlapping tiles of the camera frame instead of the 640x480 downscale
+CROWD_TILE = 640            # tile side in camera pixels (also the tile detector input size)
+CROWD_OVERLAP = 0.25        # tile overlap as a fraction of CROWD_TILE
+CROWD_WORKERS = 0           # tile detector processes (0 = CPU count - 1)
+CROWD_NMS_IOU = 0.4         # IoU above which overlapping tile detections are merged
+
+# Gallery audit (audit.py)
+AUDIT_DUP_SIM = 0.6         # centroid cosine at which two identities are reported as possible duplicates
+AUDIT_OUTLIER_SIM = 0.35    # a sample less similar than this to its person's mean is an outlier
+AUDIT_BLOCK = 2048          # tile side of the blocked all-pairs pass (one block x block float32 tile in memory)
+
 # UI
 WINDOW_TITLE = "Attendance (ArcFace / InsightFace / CPU)"
-CAM_INDEX = 0               # default webcam index
+CAM_INDEX = 0               # webcam index, or a video/image path, or "synthetic" (see camera.py)
 FPS_LIMIT = 15              # simple limiter for GUI preview
+UI_REFRESH_MS = 33          # Tk render/poll interval, independent of inference rate
+PREVIEW_DETECT_SEC = 0.2    # how often registration preview refreshes its face boxes
+
+# Metrics
+METRICS_LOG_SEC = 60        # period of the METRICS: log line / JSON snapshot (0 = off)
+METRICS_SNAPSHOT = TMP_DIR / "metrics.json"
+METRICS_PORT = 0            # Prometheus /metrics endpoint port (0 = disabled)
+METRICS_HOST = "127.0.0.1"  # bind address of the endpoint
+
+# Profiling (on demand: Tools menu, headless --profile, SIGUSR1/SIGUSR2)
+PROFILE_DIR = TMP_DIR / "profiles"
+PROFILE_SECONDS = 30        # length of a cProfile / stack-sampling window
+PROFILE_SAMPLE_MS = 10      # stack sampling interval
+
+# Burst enrollment
+BURST_FRAMES = 12           # frames grabbed per burst
+BURST_SECONDS = 3.0         # spread over this many seconds
+BURST_KEEP = 5              # best / most pose-diverse frames kept as samples
@@ -0,0 +1,18 @@
+# conftest.py
+import pytest
+
+import archive
+import attendance
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    """Point attendance reports, summaries and the archive at a scratch directory."""
+    monkeypatch.setattr(attendance, "REPORTS_DIR", tmp_path)
+    monkeypatch.setattr(attendance, "SUMMARY_DIR", tmp_path / "summaries")
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    attendance._summary_cache.clear()
+    archive._load.cache_clear()
+    yield tmp_path
+    attendance._summary_cache.clear()
+    archive._load.cache_clear()
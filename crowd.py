@@ -0,0 +1,155 @@
+# crowd.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import CROWD_TILE, CROWD_OVERLAP, CROWD_WORKERS, CROWD_NMS_IOU
+from frame_ring import FrameRing
+from metrics import METRICS
+
+_engine = None  # detect-only FaceEngine per tile worker process
+_ring: Optional[FrameRing] = None  # the detector's frame ring, attached in this worker
+_EDGE_MARGIN = 2  # px: a tile box this close to an inner tile edge is a cut-off face
+
+
+def _init_worker(tile: int):
+    global _engine
+    from face_engine import FaceEngine
+    _engine = FaceEngine(threads=1, det_size=(tile, tile), min_face_size=0, modules=("detection",))
+    _engine.warmup(1)
+
+
+def _ready() -> bool:
+    return _engine is not None
+
+
+def _detect_tile(ring_name: str, seq: int, rect, frame_size):
+    """Detect on one tile of frame ``seq``; boxes/landmarks in full-frame coordinates.
+
+    Boxes touching an inner tile edge are dropped: they are faces cut by the
+    tile, seen whole by the neighbouring tile (or by the whole-frame pass when
+    larger than the overlap)."""
+    global _ring
+    if _ring is None or _ring.name != ring_name:
+        if _ring is not None:
+            _ring.close()
+        _ring = FrameRing.attach(ring_name)  # not tracked here: only the detector may unlink it
+    x0, y0, x1, y1 = rect
+    w, h = frame_size
+    tile = _ring.get(seq)[y0:y1, x0:x1]
+    dets = _engine.detect(tile)
+    del tile
+    m = _EDGE_MARGIN
+    out = []
+    for (bx0, by0, bx1, by1), kps, score in dets:
+        if kps is None:
+            continue
+        if (x0 and bx0 < m) or (y0 and by0 < m) or (x1 < w and bx1 > x1 - x0 - m) or (y1 < h and by1 > y1 - y0 - m):
+            continue
+        out.append(((bx0 + x0, by0 + y0, bx1 + x0, by1 + y0), kps + (x0, y0), score))
+    return out
+
+
+def tile_grid(w: int, h: int, tile: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """Overlapping ``tile`` x ``tile`` rects covering a w x h frame, edge tiles flush with the border."""
+    stride = max(1, int(tile * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        n = -(-(length - tile) // stride) + 1
+        return [round(i * (length - tile) / (n - 1)) for i in range(n)]
+
+    return [(x, y, min(x + tile, w), min(y + tile, h)) for y in starts(h) for x in starts(w)]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou: float = CROWD_NMS_IOU, contain: float = 0.8) -> List[int]:
+    """Greedy NMS; also drops a box mostly inside a higher-scoring one
+    (e.g. a face part the whole-frame pass picked up). Return kept indices."""
+    if len(boxes) == 0:
+        return []
+    boxes = boxes.astype(np.float32)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(int(i))
+        ix = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        iy = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = ix * iy
+        overlap_iou = inter / (areas[i] + areas[rest] - inter + 1e-6)
+        overlap_min = inter / (np.minimum(areas[i], areas[rest]) + 1e-6)
+        order = rest[(overlap_iou <= iou) & (overlap_min <= contain)]
+    return keep
+
+
+class CrowdDetector:
+    """Crowd mode for high-resolution cameras.
+
+    The full-resolution frame is written once into a FrameRing; a pool of
+    detect-only worker processes (one ONNXRuntime thread each) runs the
+    detector on overlapping CROWD_TILE tiles at native resolution, while
+    ``engine`` detects on the whole frame for faces larger than the overlap.
+    Boxes are merged with NMS, then every face is aligned from the
+    full-resolution frame and recognized in one ``embed_aligned`` batch.
+    Same ``detect`` / ``detect_and_embed`` results as FaceEngine, in frame
+    coordinates.
+    """
+
+    def __init__(self, engine, workers: int = CROWD_WORKERS, tile: int = CROWD_TILE,
+                 overlap: float = CROWD_OVERLAP, nms_iou: float = CROWD_NMS_IOU):
+        self.engine = engine
+        self.tile = tile
+        self.overlap = overlap
+        self.nms_iou = nms_iou
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # spawn: the parent already holds ONNXRuntime thread pools and camera threads
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(tile,))
+        self.ring: Optional[FrameRing] = None
+
+    def warmup(self):
+        """Start every worker and wait for its model, so the first frame is not slow."""
+        for f in [self.pool.submit(_ready) for _ in range(self.workers)]:
+            f.result()
+        return self
+
+    def detect(self, bgr_image: np.ndarray):
+        h, w = bgr_image.shape[:2]
+        if max(w, h) <= self.tile:
+            return self.engine.detect(bgr_image)
+        if self.ring is None or bgr_image.nbytes > self.ring.slot_bytes:
+            if self.ring is not None:
+                self.ring.close()
+            self.ring = FrameRing.create(slots=2, slot_bytes=bgr_image.nbytes)
+        seq = self.ring.write(np.ascontiguousarray(bgr_image))
+        rects = tile_grid(w, h, self.tile, self.overlap)
+        futures = [self.pool.submit(_detect_tile, self.ring.name, seq, r, (w, h)) for r in rects]
+        dets = [d for d in self.engine.detect(bgr_image) if d[1] is not None]
+        for f in futures:
+            dets.extend(f.result())
+        METRICS.inc("crowd_tiles", len(rects))
+        if not dets:
+            return []
+        keep = nms(np.array([d[0] for d in dets]), np.array([d[2] for d in dets]), self.nms_iou)
+        min_size = self.engine.min_face_size
+        return [dets[i] for i in keep if min(dets[i][0][2] - dets[i][0][0], dets[i][0][3] - dets[i][0][1]) >= min_size]
+
+    def detect_and_embed(self, bgr_image: np.ndarray):
+        with METRICS.timer("detect"):
+            dets = self.detect(bgr_image)
+        if not dets:
+            return []
+        with METRICS.timer("recognize"):
+            embs = self.engine.embed_aligned([self.engine.align(bgr_image, kps) for _b, kps, _s in dets])
+        return [(bbox, kps, score, emb) for (bbox, kps, score), emb in zip(dets, embs)]
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
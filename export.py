@@ -0,0 +1,161 @@
+# export.py
+import csv
+import os
+import tempfile
+import threading
+from datetime import date
+from typing import List, Optional
+
+from attendance import iter_detailed_records, report_days
+
+HEADERS = ["User Name", "Date", "Check-in Time", "Check-out Time"]
+FIELDS = ["name", "date", "time_in", "time_out"]
+SHEET_TITLE = "Báo cáo điểm danh"
+MAX_SHEET_ROWS = 1_048_575   # Excel row limit minus the header
+MAX_COL_WIDTH = 50
+FLUSH_EVERY = 5000           # rows between flushes / progress updates
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportJob:
+    """Stream report rows from the attendance store to .xlsx or .csv in a worker thread.
+
+    Rows are read one day at a time and never held in memory as a whole.
+    For .xlsx the rows are first spooled to a temporary CSV while column
+    widths are measured, then written with openpyxl's write-only workbook
+    (which needs widths before the first row).
+    Output goes to a temporary file next to ``filename`` that replaces it only
+    once complete, so a cancelled or failed export leaves no partial file and
+    keeps the file it would have overwritten.
+    Poll ``progress`` / ``done`` / ``error`` from the UI and call ``cancel()``
+    to abort.
+    """
+
+    def __init__(self, filename: str, days: Optional[List[date]] = None, name_contains: str = ""):
+        self.filename = filename
+        self.days = days         # None = every report day, listed on the worker thread
+        self.name_contains = name_contains
+        self.progress = 0.0      # 0..1
+        self.rows = 0
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._partial: Optional[str] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _check(self):
+        if self._cancel.is_set():
+            raise ExportCancelled()
+
+    def _run(self):
+        try:
+            self.days = sorted(report_days() if self.days is None else self.days)
+            directory, name = os.path.split(os.path.abspath(self.filename))
+            fd, self._partial = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".part")
+            os.close(fd)
+            os.chmod(self._partial, 0o644)  # mkstemp creates 0600
+            if self.filename.lower().endswith(".csv"):
+                self._write_csv(self._partial)
+            else:
+                self._write_xlsx(self._partial)
+            os.replace(self._partial, self.filename)
+            self._partial = None
+            self.progress = 1.0
+        except ExportCancelled:
+            self.cancelled = True
+            self._remove_partial()
+        except BaseException as e:
+            self.error = e
+            self._remove_partial()
+        finally:
+            self.done = True
+
+    def _remove_partial(self):
+        if self._partial is None:
+            return
+        try:
+            os.remove(self._partial)
+        except OSError:
+            pass
+
+    def _iter_rows(self, weight: float):
+        """Yield row lists, advancing progress by day up to ``weight``."""
+        total = max(1, len(self.days))
+        for i, day in enumerate(reversed(self.days), 1):
+            for rec in iter_detailed_records([day], self.name_contains):
+                self._check()
+                yield [rec[f] for f in FIELDS]
+            self._check()
+            self.progress = weight * i / total
+
+    def _write_csv(self, path: str):
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f)
+            w.writerow(HEADERS)
+            for row in self._iter_rows(1.0):
+                w.writerow(row)
+                self.rows += 1
+                if self.rows % FLUSH_EVERY == 0:
+                    f.flush()
+
+    def _write_xlsx(self, path: str):
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+
+        widths = [len(h) for h in HEADERS]
+        spool = tempfile.NamedTemporaryFile("w+", newline="", encoding="utf-8", suffix=".csv", delete=False)
+        try:
+            # Pass 1: stream rows to disk and measure column widths as we go
+            w = csv.writer(spool)
+            for row in self._iter_rows(0.5):
+                w.writerow(row)
+                for c, v in enumerate(row):
+                    if len(v) > widths[c]:
+                        widths[c] = len(v)
+                self.rows += 1
+            spool.flush()
+            spool.seek(0)
+
+            # Pass 2: write-only workbook, rolling over to a new sheet at the row limit
+            wb = Workbook(write_only=True)
+            ws = None
+            sheet_rows = MAX_SHEET_ROWS
+            written = 0
+            for row in csv.reader(spool):
+                self._check()
+                if sheet_rows >= MAX_SHEET_ROWS:
+                    n = len(wb.worksheets)
+                    ws = wb.create_sheet(SHEET_TITLE if n == 0 else f"{SHEET_TITLE} ({n + 1})")
+                    for c, width in enumerate(widths, 1):
+                        ws.column_dimensions[get_column_letter(c)].width = min(width + 2, MAX_COL_WIDTH)
+                    ws.append(HEADERS)
+                    sheet_rows = 0
+                ws.append(row)
+                sheet_rows += 1
+                written += 1
+                if written % FLUSH_EVERY == 0:
+                    self.progress = 0.5 + 0.5 * written / max(1, self.rows)
+            if ws is None:
+                ws = wb.create_sheet(SHEET_TITLE)
+                ws.append(HEADERS)
+            self._check()
+            wb.save(path)
+        finally:
+            spool.close()
+            os.remove(spool.name)
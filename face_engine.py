@@ -1,41 +1,113 @@
 # face_engine.py
-from typing import List, Tuple
+import threading
+import time
+from typing import Optional
+
 import numpy as np
 import cv2
-from insightface.app import FaceAnalysis
-import onnxruntime as ort
 
-from config import MODEL_NAME, DET_SIZE, PROVIDERS, EMB_NORM, MIN_FACE_SIZE
+from config import MODEL_NAME, DET_SIZE, PROVIDERS, MIN_FACE_SIZE, INFERENCE_ADDRESS
+from metrics import METRICS
 
 class FaceEngine:
-    def __init__(self):
+    def __init__(self, threads: int = 0, det_size=None, min_face_size: int = MIN_FACE_SIZE,
+                 modules=("detection", "recognition")):
+        """threads: ONNXRuntime intra-op threads per model (0 = ORT default,
+        use 1 when running one engine per process).
+        det_size: detector input size, defaults to DET_SIZE.
+        min_face_size: faces with a shorter side are dropped (0 keeps all).
+        modules: ("detection",) for detect-only engines (crowd-mode tile workers)."""
+        # insightface/onnxruntime take most of a second to import; only pay that here
+        from insightface.app import FaceAnalysis
+        import onnxruntime as ort
+
         # Ensure ONNXRuntime is available (CPU)
         assert 'CPUExecutionProvider' in ort.get_available_providers()
-        self.app = FaceAnalysis(name=MODEL_NAME, providers=PROVIDERS)
-        self.app.prepare(ctx_id=0, det_size=DET_SIZE)
+        kwargs = {}
+        if threads:
+            so = ort.SessionOptions()
+            so.intra_op_num_threads = threads
+            so.inter_op_num_threads = 1
+            kwargs["sess_options"] = so
+        # Only detection + recognition are used; skip loading the landmark/genderage heads
+        self.app = FaceAnalysis(name=MODEL_NAME, providers=PROVIDERS,
+                                allowed_modules=list(modules), **kwargs)
+        self.model_name = MODEL_NAME
+        self.det_size = tuple(det_size or DET_SIZE)
+        self.min_face_size = min_face_size
+        self.app.prepare(ctx_id=0, det_size=self.det_size)
 
     def detect_and_embed(self, bgr_image: np.ndarray):
-        """Return list of (bbox, kps, det_score, embedding[512]) for each face."""
-        faces = self.app.get(bgr_image)  # returns list with .bbox, .kps, .det_score, .normed_embedding
+        """Return list of (bbox, kps, det_score, embedding[512]) for each face.
+
+        Detection, then one batched recognition call over the aligned crops of
+        the faces that pass min_face_size (the other FaceAnalysis heads are
+        not run). Both stages are timed in METRICS.
+        """
+        with METRICS.timer("detect"):
+            dets = [d for d in self.detect(bgr_image) if d[1] is not None]
+        if not dets:
+            return []
+        with METRICS.timer("recognize"):
+            crops = [self.align(bgr_image, kps) for _bbox, kps, _score in dets]
+            embs = self.embed_aligned(crops)
+        return [(bbox, kps, score, emb) for (bbox, kps, score), emb in zip(dets, embs)]
+
+    def detect(self, bgr_image: np.ndarray):
+        """Detection only, no embedding (cheap enough for live preview boxes).
+        Return list of (bbox, kps, det_score)."""
+        bboxes, kpss = self.app.det_model.detect(bgr_image, max_num=0, metric='default')
+        METRICS.inc("engine_detect_calls")
         results = []
-        h, w = bgr_image.shape[:2]
-        for f in faces:
-            x1, y1, x2, y2 = [int(v) for v in f.bbox]
-            if min(x2 - x1, y2 - y1) < MIN_FACE_SIZE:
+        for i, b in enumerate(bboxes):
+            x1, y1, x2, y2 = [int(v) for v in b[:4]]
+            if min(x2 - x1, y2 - y1) < self.min_face_size:
                 continue
-            emb = f.normed_embedding if EMB_NORM else f.embedding / (np.linalg.norm(f.embedding) + 1e-8)
-            results.append(((x1, y1, x2, y2), f.kps, float(f.det_score), emb.astype(np.float32)))
+            kps = kpss[i] if kpss is not None else None
+            results.append(((x1, y1, x2, y2), kps, float(b[4])))
         return results
 
-    def embed_crop(self, bgr_image: np.ndarray):
-        """Embed the largest detected face. Return (embedding, bbox) or (None, None)."""
+    def largest_face(self, bgr_image: np.ndarray):
+        """Largest detected face as (bbox, kps, det_score, embedding), or None."""
         dets = self.detect_and_embed(bgr_image)
         if not dets:
+            return None
+        return max(dets, key=lambda it: (it[0][2] - it[0][0]) * (it[0][3] - it[0][1]))
+
+    def embed_crop(self, bgr_image: np.ndarray):
+        """Embed the largest detected face. Return (embedding, bbox) or (None, None)."""
+        face = self.largest_face(bgr_image)
+        if face is None:
             return None, None
-        dets.sort(key=lambda it: (it[0][2] - it[0][0]) * (it[0][3] - it[0][1]), reverse=True)
-        bbox, kps, score, emb = dets[0]
+        bbox, kps, score, emb = face
         return emb, bbox
 
+    @staticmethod
+    def align(bgr_image: np.ndarray, kps) -> np.ndarray:
+        """Aligned 112x112 ArcFace crop from 5-point landmarks."""
+        from insightface.utils import face_align
+        return face_align.norm_crop(bgr_image, landmark=np.asarray(kps), image_size=112)
+
+    def embed_aligned(self, crops) -> np.ndarray:
+        """Embed several aligned 112x112 crops in one batched inference call.
+        Return (N, 512) float32, L2-normalized."""
+        if len(crops) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        feats = self.app.models['recognition'].get_feat(list(crops)).astype(np.float32)
+        METRICS.inc("engine_embed_batches")
+        METRICS.inc("engine_faces_embedded", len(crops))
+        return feats / (np.linalg.norm(feats, axis=1, keepdims=True) + 1e-8)
+
+    def warmup(self, runs: int = 2):
+        """Push dummy inputs through both models so ONNXRuntime's lazy
+        allocations and kernel selection happen before the first real frame."""
+        frame = np.zeros((self.det_size[1], self.det_size[0], 3), dtype=np.uint8)
+        crop = np.zeros((112, 112, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.app.det_model.detect(frame, max_num=0, metric='default')
+            if 'recognition' in self.app.models:
+                self.app.models['recognition'].get_feat([crop])
+
     @staticmethod
     def draw_bbox(img, bbox, name=None, sim=None):
         x1, y1, x2, y2 = bbox
@@ -47,3 +119,51 @@ class FaceEngine:
             cv2.putText(img, label, (x1, max(y1-8, 10)),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2, cv2.LINE_AA)
         return img
+
+
+class EngineLoader:
+    """Build, warm up and (optionally) load the gallery on a background thread,
+    so the UI can show itself immediately and poll ``stage`` / ``done``."""
+
+    STAGES = ("import", "model", "warmup", "gallery", "ready")
+
+    def __init__(self, registry=None, **engine_kwargs):
+        self.registry = registry
+        self.engine_kwargs = engine_kwargs
+        self.stage = "import"
+        self.engine = None  # FaceEngine, or RemoteFaceEngine with INFERENCE_ADDRESS
+        self.error: Optional[BaseException] = None
+        self.seconds = 0.0
+        self.done = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def progress(self) -> float:
+        return self.STAGES.index(self.stage) / (len(self.STAGES) - 1) if self.stage in self.STAGES else 1.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="engine-loader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            from inference_server import create_engine
+            if not INFERENCE_ADDRESS:
+                import insightface  # noqa: F401  (the slow import, reported as its own stage)
+            self.stage = "model"
+            engine = create_engine(**self.engine_kwargs)
+            self.stage = "warmup"
+            engine.warmup()
+            if self.registry is not None:
+                self.stage = "gallery"
+                self.registry.load_gallery()
+            self.engine = engine
+            self.stage = "ready"
+        except BaseException as e:
+            self.error = e
+            self.stage = "error"
+        finally:
+            self.seconds = time.perf_counter() - t0
+            self.done = True
@@ -0,0 +1,162 @@
+# frame_ring.py
+import sys
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config import FRAME_RING_SLOTS, FRAME_RING_SLOT_BYTES
+from metrics import METRICS
+
+_DATA_OFFSET_ALIGN = 64
+_WRITING = -1
+_tracker_lock = threading.Lock()  # serializes the register() swap in _open_untracked with create()
+
+
+def _open_untracked(name: str) -> SharedMemory:
+    """Map segment ``name`` without registering it with the resource tracker.
+
+    Before Python 3.13 every attach registers the segment, so a reader's own
+    tracker unlinks the creator's segment when the reader exits, and
+    unregistering afterwards removes the creator's entry from a tracker
+    they share (spawned children, or the creator itself).
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class FrameOverrun(RuntimeError):
+    """The slot holding a frame was reused by the producer before the reader finished."""
+
+
+class FrameRing:
+    """Fixed-size ring of uint8 frames in shared memory, one producer, any number of readers.
+
+    Layout: an int64 header ``[slots + 1, 4]`` followed by ``slots`` data
+    slots of ``slot_bytes`` each. Row 0 holds (next_seq, slots, slot_bytes, 0);
+    row i+1 holds (seq, h, w, c) of the frame in slot i, with seq = -1 while
+    it is being written. Frame ``seq`` lives in slot ``seq % slots``.
+
+    The producer either ``write()``s a frame (one memcpy) or ``claim()``s a
+    slot, fills the returned view in place (e.g. ``cap.read(view)``) and
+    ``commit()``s it. Readers get zero-copy views with ``get(seq)`` and call
+    ``valid(seq)`` when done: False means the slot was reused meanwhile
+    (overrun) and the result computed from the view must be discarded.
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        head = np.ndarray((4,), dtype=np.int64, buffer=shm.buf)
+        self.slots, self.slot_bytes = int(head[1]), int(head[2])
+        del head
+        self.header = np.ndarray((self.slots + 1, 4), dtype=np.int64, buffer=shm.buf)
+        offset = -(-self.header.nbytes // _DATA_OFFSET_ALIGN) * _DATA_OFFSET_ALIGN
+        self.data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8, buffer=shm.buf, offset=offset)
+        self._base = self.data.ctypes.data
+
+    @classmethod
+    def create(cls, slots: int = FRAME_RING_SLOTS, slot_bytes: int = FRAME_RING_SLOT_BYTES) -> "FrameRing":
+        header_bytes = -(-(slots + 1) * 4 * 8 // _DATA_OFFSET_ALIGN) * _DATA_OFFSET_ALIGN
+        with _tracker_lock:
+            shm = SharedMemory(create=True, size=header_bytes + slots * slot_bytes)
+        head = np.ndarray((slots + 1, 4), dtype=np.int64, buffer=shm.buf)
+        head[:] = 0
+        head[0, 1:3] = slots, slot_bytes
+        head[1:, 0] = _WRITING  # nothing committed yet
+        del head
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, untrack: bool = True) -> "FrameRing":
+        """Map an existing ring. The creator owns the segment, so by default it
+        is not registered with this process's resource tracker; safe from
+        another client, a spawned worker, or the creator itself."""
+        return cls(_open_untracked(name) if untrack else SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # Producer ---------------------------------------------------------------
+
+    def claim(self, shape) -> Tuple[int, np.ndarray]:
+        """Reserve the next slot for a frame of ``shape``; return (seq, writable view)."""
+        shape = tuple(int(d) for d in shape)
+        nbytes = int(np.prod(shape))
+        if len(shape) not in (2, 3) or nbytes > self.slot_bytes:
+            raise ValueError(f"frame {shape} does not fit a {self.slot_bytes}-byte slot")
+        seq = int(self.header[0, 0])
+        self.header[0, 0] = seq + 1
+        row = self.header[1 + seq % self.slots]
+        row[0] = _WRITING
+        row[1:] = shape if len(shape) == 3 else (*shape, 0)
+        return seq, self.data[seq % self.slots, :nbytes].reshape(shape)
+
+    def commit(self, seq: int):
+        self.header[1 + seq % self.slots, 0] = seq
+
+    def write(self, frame: np.ndarray) -> int:
+        if frame.dtype != np.uint8:
+            raise ValueError(f"FrameRing stores uint8 frames, got {frame.dtype}")
+        seq, view = self.claim(frame.shape)
+        view[...] = frame
+        self.commit(seq)
+        return seq
+
+    # Readers ----------------------------------------------------------------
+
+    def valid(self, seq: int) -> bool:
+        return int(self.header[1 + seq % self.slots, 0]) == seq
+
+    def get(self, seq: int) -> np.ndarray:
+        """Zero-copy view of frame ``seq``; FrameOverrun if it has already been replaced."""
+        row = self.header[1 + seq % self.slots]
+        h, w, c = (int(v) for v in row[1:])
+        if int(row[0]) != seq:
+            METRICS.inc("frame_ring_overruns")
+            raise FrameOverrun(f"frame {seq} was overwritten (slot now holds {int(row[0])})")
+        shape = (h, w, c) if c else (h, w)
+        return self.data[seq % self.slots, :int(np.prod(shape))].reshape(shape)
+
+    def latest(self) -> Tuple[Optional[int], Optional[np.ndarray]]:
+        """(seq, view) of the newest committed frame, or (None, None)."""
+        seq = int(self.header[0, 0]) - 1
+        for s in range(seq, max(-1, seq - self.slots), -1):
+            if self.valid(s):
+                return s, self.get(s)
+        return None, None
+
+    def seq_of(self, arr: np.ndarray) -> Optional[int]:
+        """Seq of the committed frame ``arr`` is a whole view of, else None
+        (lets a client pass a frame the producer wrote in place without copying)."""
+        offset = arr.__array_interface__["data"][0] - self._base
+        if offset < 0 or offset % self.slot_bytes or offset // self.slot_bytes >= self.slots:
+            return None
+        row = self.header[1 + offset // self.slot_bytes]
+        seq = int(row[0])
+        shape = tuple(int(v) for v in row[1:] if v)
+        if seq < 0 or arr.shape != shape or not arr.flags.c_contiguous:
+            return None
+        return seq
+
+    def unlink(self):
+        """Remove the segment's name now (the creator only); the mapping stays until close()."""
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+    def close(self):
+        """Unmap (and unlink if owned). Views from claim/get/latest must not be used afterwards."""
+        del self.header, self.data
+        self.shm.close()
+        self.unlink()
@@ -0,0 +1,121 @@
+# headless.py
+import argparse
+import queue
+import signal
+import threading
+import time
+
+from camera import open_camera
+from config import CAM_INDEX, ATTEND_COOLDOWN_SEC, METRICS_PORT, PROFILE_SECONDS, CROWD_MODE, ADAPT_MODE
+from metrics import MetricsReporter, MetricsServer
+from profiling import PROFILER, install_signal_handlers
+from scanner import FrameGrabber, Scanner
+from utils import CooldownKeeper
+
+
+def run(cam_index=CAM_INDEX, metrics_port: int = METRICS_PORT, minutes: float = 0.0,
+        profile: float = 0.0, trace_memory: bool = False, crowd_mode: bool = CROWD_MODE) -> int:
+    """Scan and log attendance without a window until Ctrl+C / SIGTERM
+    (or ``minutes`` elapse). Same pipeline as the app: FrameGrabber -> Scanner.
+    ``profile``: seconds of cProfile + stack sampling once scanning starts;
+    SIGUSR1 / SIGUSR2 trigger a profile window / tracemalloc snapshot at any time.
+    ``crowd_mode``: tiled full-resolution detection (see crowd.py)."""
+    from inference_server import create_engine
+    from registry import Registry
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    install_signal_handlers()
+    if trace_memory:
+        PROFILER.tracemalloc_snapshot()
+
+    server = MetricsServer(metrics_port).start() if metrics_port else None
+    reporter = MetricsReporter().start()
+    t0 = time.perf_counter()
+    print("Initializing AI model...")
+    engine = create_engine()
+    engine.warmup()
+    crowd = None
+    if crowd_mode:
+        from crowd import CrowdDetector
+        crowd = CrowdDetector(engine).warmup()
+        print(f"CROWD: {crowd.workers} tile worker(s), tile={crowd.tile}px")
+    reg = Registry()
+    reg.load_gallery()
+    print(f"STARTUP: model + gallery ready in {time.perf_counter() - t0:.2f}s")
+    warning = reg.check_gallery()
+    if warning:
+        print(f"WARN: {warning}")
+
+    cap = open_camera(cam_index)
+    if not cap.isOpened():
+        print(f"ERROR: Cannot connect to camera {cam_index}!")
+        return 1
+    grabber = FrameGrabber(cap).start()
+    adapter = None
+    if ADAPT_MODE:
+        from adaptation import TemplateAdapter
+        adapter = TemplateAdapter(reg).start()
+    scanner = Scanner(engine, reg, grabber, CooldownKeeper(ATTEND_COOLDOWN_SEC), crowd=crowd,
+                      adapter=adapter).start()
+    print(f"SCAN: headless scanning on camera {cam_index} (Ctrl+C to stop)")
+    if profile:
+        PROFILER.profile_window(profile)
+        PROFILER.sample_thread(profile)
+
+    deadline = time.time() + minutes * 60 if minutes else None
+    code = 0
+    reported = False
+    try:
+        while not stop.is_set() and scanner.is_alive():
+            if deadline and time.time() >= deadline:
+                break
+            if not reported and scanner.first_match_at is not None:
+                reported = True
+                print(f"STARTUP: first recognition {scanner.first_match_at - t0:.2f}s after start")
+            try:
+                ev = scanner.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if ev.kind == "notice":
+                print(f"NOTICE: {ev.message}")
+            elif ev.kind == "camera_lost":
+                print("ERROR: camera signal lost")
+                code = 1
+    finally:
+        if trace_memory:
+            PROFILER.tracemalloc_snapshot()
+        scanner.stop()
+        grabber.stop()
+        cap.release()
+        if crowd is not None:
+            crowd.close()
+        if adapter is not None:
+            adapter.stop()
+        reporter.stop()
+        if server is not None:
+            server.stop()
+    print("STOP: headless scanning stopped")
+    return code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the attendance scanner without the Tk window")
+    parser.add_argument("--cam", default=CAM_INDEX,
+                        help='camera index, video/image path or "synthetic"')
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on 127.0.0.1:<port> (0 = off)")
+    parser.add_argument("--minutes", type=float, default=0.0, help="stop after this many minutes (0 = run until stopped)")
+    parser.add_argument("--profile", type=float, nargs="?", const=PROFILE_SECONDS, default=0.0,
+                        help=f"profile the scan thread for N seconds after start (default {PROFILE_SECONDS})")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="trace allocations; snapshot on SIGUSR2 and at exit")
+    parser.add_argument("--crowd", action="store_true", default=CROWD_MODE,
+                        help="tiled full-resolution detection for high-resolution cameras")
+    args = parser.parse_args(argv)
+    return run(args.cam, args.metrics_port, args.minutes, args.profile, args.tracemalloc, args.crowd)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,282 @@
+# inference_server.py
+import argparse
+import ipaddress
+import os
+import secrets
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import INFERENCE_ADDRESS, INFERENCE_AUTHKEY_FILE, MODEL_NAME, DET_SIZE
+from face_engine import FaceEngine
+from frame_ring import FrameOverrun, FrameRing
+
+# Wire protocol (multiprocessing.connection, pickled tuples):
+#   request  (op, frame_ref, *args)    frame_ref = (ring name, seq) or None
+#   reply    ("ok", result) | ("error", message)
+# Frames travel through a FrameRing (shared memory) owned by the client; only
+# small results (boxes, landmarks, 512-d embeddings) are pickled.
+# Unpickling a request can run arbitrary code, so the server only listens on
+# loopback / local sockets and clients must prove they can read the
+# per-install key file.
+FRAME_OPS = ("detect_and_embed", "detect", "largest_face", "embed_crop", "align")
+
+
+def _check_loopback(host: str):
+    if host == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise ValueError(f"inference worker address must be loopback (127.0.0.1 / localhost), got {host!r}")
+
+
+def parse_address(addr):
+    """"host:port" -> (host, port); anything else is a Unix socket / Windows pipe path.
+    Raise ValueError for a non-loopback host."""
+    if isinstance(addr, (tuple, list)):
+        host, port = addr
+    else:
+        host, sep, port = str(addr).rpartition(":")
+        if not (sep and port.isdigit() and "/" not in host and "\\" not in host):
+            return str(addr)
+        host = host or "127.0.0.1"
+    _check_loopback(host)
+    return host, int(port)
+
+
+def load_authkey(path: Path = INFERENCE_AUTHKEY_FILE) -> bytes:
+    """The per-install secret shared by the worker and its clients, created
+    (random, owner-only) on first use."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        # Write the key aside and publish it whole, so a concurrent reader never sees an empty file
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            os.link(tmp, path)  # atomic and never replaces a key another process published first
+        except FileExistsError:
+            pass
+        except OSError:
+            os.replace(tmp, path)  # filesystem without hard links
+        finally:
+            tmp.unlink(missing_ok=True)
+    key = path.read_bytes()
+    if len(key) < 16:
+        raise ValueError(f"inference key file {path} is truncated; delete it and restart the worker")
+    return key
+
+
+class InferenceServer:
+    """Long-lived process holding one warmed-up FaceEngine for every local client
+    (GUI, headless, bulk tools). Restarting a client costs no model reload."""
+
+    def __init__(self, address=INFERENCE_ADDRESS, threads: int = 0, det_size=None):
+        self.address = parse_address(address)
+        t0 = time.perf_counter()
+        self.engine = FaceEngine(threads=threads, det_size=det_size)
+        self.engine.warmup()
+        print(f"INFER: model loaded and warmed up in {time.perf_counter() - t0:.2f}s")
+        self._lock = threading.Lock()  # one inference at a time; ORT already uses all cores
+        self.listener: Optional[Listener] = None
+
+    def serve_forever(self):
+        self.listener = Listener(self.address, authkey=load_authkey())
+        print(f"INFER: listening on {self.listener.address}")
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                break  # listener closed
+            except Exception as e:
+                print(f"WARN: rejected connection: {e}")
+                continue
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+
+    def info(self) -> dict:
+        return {"model_name": self.engine.model_name, "det_size": list(self.engine.det_size),
+                "min_face_size": self.engine.min_face_size}
+
+    def _serve_client(self, conn):
+        rings: Dict[str, FrameRing] = {}
+        try:
+            while True:
+                try:
+                    op, ref, *args = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    conn.send(("ok", self._handle(op, ref, args, rings)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            for ring in rings.values():
+                ring.close()
+            conn.close()
+
+    def _handle(self, op, ref, args, rings):
+        if op == "info":
+            return self.info()
+        if op == "embed_aligned":
+            with self._lock:
+                return self.engine.embed_aligned(args[0])
+        if op not in FRAME_OPS:
+            raise ValueError(f"unknown op {op!r}")
+        name, seq = ref
+        ring = rings.get(name)
+        if ring is None:
+            for old in rings.values():
+                old.close()  # the client replaced its ring with a larger one
+            rings.clear()
+            ring = rings[name] = FrameRing.attach(name)
+        frame = ring.get(seq)
+        with self._lock:
+            result = getattr(self.engine, op)(frame, *args)
+        del frame
+        if not ring.valid(seq):
+            raise FrameOverrun(f"frame {seq} was overwritten during {op}")
+        return result
+
+
+class RemoteFaceEngine:
+    """FaceEngine stand-in that forwards inference to an InferenceServer.
+
+    Thread-safe (one request in flight per client). Frames go through
+    ``self.ring``: a frame the caller wrote in place into a ring slot
+    (``seq, view = engine.ring.claim(shape)``; fill; ``commit(seq)``) is sent
+    without a copy, any other frame is copied into the next slot.
+
+    A worker running another model or det_size than ``model_name`` /
+    ``det_size`` (default: this process's config) is refused with ValueError,
+    so embeddings never silently come from a different model than the gallery.
+    """
+
+    def __init__(self, address=INFERENCE_ADDRESS, timeout: float = 2.0,
+                 model_name: str = MODEL_NAME, det_size=None):
+        self.address = parse_address(address)
+        self._conn = self._connect(timeout)
+        self._lock = threading.Lock()
+        self.ring = FrameRing.create()
+        self._retired = []
+        info = self._call("info", None)
+        expected = (model_name, tuple(det_size or DET_SIZE))
+        served = (info.get("model_name"), tuple(info["det_size"]))
+        if served != expected:
+            self.close()
+            raise ValueError(f"worker runs {served[0]} det_size={served[1]}, "
+                             f"expected {expected[0]} det_size={expected[1]}")
+        self.model_name, self.det_size = served
+        self.min_face_size = info["min_face_size"]
+
+    def _connect(self, timeout: float):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return Client(self.address, authkey=load_authkey())
+            except (ConnectionError, FileNotFoundError, OSError):
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _frame_ref(self, frame: np.ndarray):
+        seq = self.ring.seq_of(frame)
+        if seq is None:
+            if frame.nbytes > self.ring.slot_bytes:
+                # Callers may still hold views into the old ring: unlink it now, unmap on close()
+                self.ring.unlink()
+                self._retired.append(self.ring)
+                self.ring = FrameRing.create(slot_bytes=frame.nbytes)
+            seq = self.ring.write(frame)
+        return self.ring.name, seq
+
+    def _call(self, op, frame, *args):
+        with self._lock:
+            ref = self._frame_ref(frame) if frame is not None else None
+            self._conn.send((op, ref, *args))
+            status, result = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"inference server: {result}")
+        return result
+
+    def detect_and_embed(self, bgr_image):
+        return self._call("detect_and_embed", bgr_image)
+
+    def detect(self, bgr_image):
+        return self._call("detect", bgr_image)
+
+    def largest_face(self, bgr_image):
+        return self._call("largest_face", bgr_image)
+
+    def embed_crop(self, bgr_image):
+        return self._call("embed_crop", bgr_image)
+
+    def align(self, bgr_image, kps):
+        return self._call("align", bgr_image, np.asarray(kps))
+
+    def embed_aligned(self, crops):
+        return self._call("embed_aligned", None, list(crops))
+
+    def warmup(self, runs: int = 2):
+        pass  # the server warmed up once at start
+
+    draw_bbox = staticmethod(FaceEngine.draw_bbox)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            for ring in [*self._retired, self.ring]:
+                ring.close()
+
+
+def create_engine(address=INFERENCE_ADDRESS, **engine_kwargs):
+    """RemoteFaceEngine when an inference worker is configured, reachable and
+    running the configured model and det_size, otherwise an in-process
+    FaceEngine(**engine_kwargs). The worker's own thread settings apply to
+    remote engines."""
+    if address:
+        try:
+            engine = RemoteFaceEngine(address, det_size=engine_kwargs.get("det_size"))
+            print(f"INFER: using inference worker at {address}")
+            return engine
+        except (OSError, EOFError, AuthenticationError, ValueError) as e:
+            print(f"WARN: inference worker at {address} unavailable ({e}); loading the model in-process")
+    return FaceEngine(**engine_kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent local inference worker (loads the model once)")
+    parser.add_argument("--address", default=INFERENCE_ADDRESS or "127.0.0.1:7711",
+                        help='"host:port" or a Unix socket / Windows pipe path')
+    parser.add_argument("--threads", type=int, default=0, help="ONNXRuntime intra-op threads (0 = default)")
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port")
+    args = parser.parse_args(argv)
+
+    server = InferenceServer(args.address, threads=args.threads)
+    if args.metrics_port:
+        from metrics import MetricsServer
+        MetricsServer(args.metrics_port).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print("INFER: stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
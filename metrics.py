@@ -0,0 +1,261 @@
+# metrics.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import METRICS_LOG_SEC, METRICS_SNAPSHOT, METRICS_HOST
+
+# Latency histogram bucket upper bounds in milliseconds (roughly x1.5 steps)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 1.5, 2.5, 4, 6, 10, 15, 25, 40, 60, 100, 150, 250, 400, 600, 1000, 2500, 5000)
+
+# Prometheus metric name prefix
+PREFIX = "attendance_app_"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (ms): O(1) observe, approximate percentiles."""
+
+    def __init__(self):
+        self.counts = np.zeros(len(BUCKETS_MS) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[np.searchsorted(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (q in 0..100)."""
+        if not self.count:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), self.count * q / 100.0))
+        return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Metrics:
+    """Process-wide stage timers and counters.
+
+    Stages used by the scan pipeline: camera_read, resize, detect, recognize,
+    match, attendance, convert, render and capture_to_log (frame capture to
+    attendance row written). Counters: frames_captured, frames_processed,
+    frames_dropped, faces_detected, faces_recognized, faces_unknown,
+    attendance_logged, plus engine_*/registry_*/attendance_* counters fed by
+    FaceEngine, Registry and attendance. Gauges hold current values (fps,
+    gallery size, queue depths). Names may carry Prometheus labels, e.g.
+    ``attendance_events{status="IN"}``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.hists: Dict[str, Histogram] = {}
+            self.counters: Dict[str, int] = {}
+            self.gauges: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.hists.get(stage)
+            if hist is None:
+                hist = self.hists[stage] = Histogram()
+            hist.observe(seconds * 1000.0)
+
+    @contextmanager
+    def timer(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, counter: str, n: int = 1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = float(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = time.time() - self.started
+            processed = self.counters.get("frames_processed", 0)
+            return {
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "uptime_sec": round(uptime, 1),
+                "avg_fps": round(processed / uptime, 2) if uptime > 0 else 0.0,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "stages": {k: h.to_dict() for k, h in sorted(self.hists.items())},
+            }
+
+    def summary(self) -> str:
+        snap = self.snapshot()
+        c = snap["counters"]
+        parts = [f"frames={c.get('frames_processed', 0)}/{c.get('frames_captured', 0)}",
+                 f"dropped={c.get('frames_dropped', 0)}"]
+        for stage, h in snap["stages"].items():
+            parts.append(f"{stage}={h['p50_ms']:g}/{h['p99_ms']:g}ms")
+        return " ".join(parts)
+
+    def write_snapshot(self, path: Path = METRICS_SNAPSHOT, **extra):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**self.snapshot(), **extra}, f, indent=2)
+        os.replace(tmp, path)
+
+    def prometheus(self) -> str:
+        """Text exposition format (version 0.0.4) of all counters, gauges and stage histograms."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            hists = {k: (h.counts.copy(), h.count, h.total) for k, h in self.hists.items()}
+            uptime = time.time() - self.started
+        lines = []
+        typed = set()
+
+        def sample(kind: str, name: str, value: float):
+            base = PREFIX + name.split("{", 1)[0]
+            if kind == "counter":
+                base += "_total"
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {base} {kind}")
+            labels = name[len(name.split("{", 1)[0]):]
+            lines.append(f"{base}{labels} {value:g}")
+
+        sample("gauge", "uptime_seconds", round(uptime, 3))
+        for name in sorted(counters):
+            sample("counter", name, counters[name])
+        for name in sorted(gauges):
+            sample("gauge", name, gauges[name])
+        if hists:
+            base = PREFIX + "stage_seconds"
+            lines.append(f"# TYPE {base} histogram")
+            for stage in sorted(hists):
+                counts, count, total = hists[stage]
+                cum = np.cumsum(counts)
+                for le, c in zip(BUCKETS_MS, cum):
+                    lines.append(f'{base}_bucket{{stage="{stage}",le="{le / 1000:g}"}} {int(c)}')
+                lines.append(f'{base}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{base}_sum{{stage="{stage}"}} {total / 1000:.6f}')
+                lines.append(f'{base}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class MetricsReporter:
+    """Every ``interval`` seconds print a METRICS: line (fps over the interval,
+    p50/p99 per stage) and rewrite the JSON snapshot."""
+
+    def __init__(self, metrics: Metrics = METRICS, interval: float = METRICS_LOG_SEC,
+                 path: Path = METRICS_SNAPSHOT):
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._mark = (time.time(), 0)
+
+    def start(self):
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self.report()
+
+    def report(self):
+        if not self.metrics.counters.get("frames_captured"):
+            return
+        now, processed = time.time(), self.metrics.counters.get("frames_processed", 0)
+        t0, n0 = self._mark
+        fps = (processed - n0) / (now - t0) if processed >= n0 and now > t0 else 0.0
+        self._mark = (now, processed)
+        print(f"METRICS: fps={fps:.1f} {self.metrics.summary()}")
+        try:
+            self.metrics.write_snapshot(self.path, fps=round(fps, 2))
+        except OSError as e:
+            print(f"WARN: could not write metrics snapshot: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics: Metrics = METRICS
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/metrics":
+            body, ctype = self.metrics.prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?", 1)[0] == "/metrics.json":
+            body, ctype = json.dumps(self.metrics.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+class MetricsServer:
+    """Serve /metrics (Prometheus text) and /metrics.json on a daemon thread.
+    Binds to METRICS_HOST (localhost by default); port 0 picks a free port."""
+
+    def __init__(self, port: int, host: str = METRICS_HOST, metrics: Metrics = METRICS):
+        handler = type("Handler", (_Handler,), {"metrics": metrics})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        host, port = self.address
+        print(f"METRICS: serving http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
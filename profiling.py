@@ -0,0 +1,189 @@
+# profiling.py
+import cProfile
+import io
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import PROFILE_DIR, PROFILE_SECONDS, PROFILE_SAMPLE_MS
+
+SCAN_THREAD = "scanner"  # thread name the sampler follows by default
+FINISH_WAIT_SEC = 5.0    # how long a closed cProfile window waits for threads still mid-iteration
+
+
+def _stamp() -> str:
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+class Profiler:
+    """On-demand profiling of a running app / headless kiosk; results go to PROFILE_DIR.
+
+    - cProfile for a fixed window. cProfile only sees the thread that enables
+      it, so instrumented loops (the scanner) call ``hook()`` once per
+      iteration to join an active window; when no window is active that is a
+      single attribute check.
+    - Sampling of a thread's Python stack every PROFILE_SAMPLE_MS, written as
+      folded stacks (flamegraph.pl / speedscope input). Costs nothing when off.
+    - tracemalloc start / snapshot / stop.
+    """
+
+    def __init__(self, out_dir: Path = PROFILE_DIR):
+        self.out_dir = Path(out_dir)
+        self.active = False           # read by hook() without locking
+        self._lock = threading.Lock()
+        self._profiles: Dict[int, cProfile.Profile] = {}  # enabled, until the owning thread disables it
+        self._finished: List[cProfile.Profile] = []
+        self._sampling = False
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def _path(self, kind: str, suffix: str) -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        return self.out_dir / f"{kind}_{_stamp()}{suffix}"
+
+    # cProfile ---------------------------------------------------------------
+
+    def hook(self):
+        """Called from instrumented loops; enables/disables cProfile for this thread."""
+        if not self.active and not self._profiles:
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            prof = self._profiles.get(ident)
+            if self.active and prof is None:
+                prof = self._profiles[ident] = cProfile.Profile()
+                try:
+                    prof.enable()
+                except ValueError:
+                    # 3.12+: one profiler covers every thread and a second one may not start
+                    del self._profiles[ident]
+            elif not self.active and prof is not None:
+                prof.disable()
+                self._finished.append(self._profiles.pop(ident))
+
+    def profile_window(self, seconds: float = PROFILE_SECONDS) -> bool:
+        """Profile instrumented threads for ``seconds`` and dump to .prof + .txt.
+        Return False if a window is already running."""
+        with self._lock:
+            if self.active or self._profiles:
+                return False  # running, or a thread of the last window has not disabled its profiler yet
+            self._finished.clear()
+            self.active = True
+        print(f"PROFILE: cProfile window started ({seconds:.0f}s)")
+        threading.Thread(target=self._finish_window, args=(seconds,), daemon=True).start()
+        return True
+
+    def _finish_window(self, seconds: float):
+        time.sleep(seconds)
+        self.active = False
+        # Only the owning thread can disable its profiler: wait for each to pass hook() again
+        deadline = time.monotonic() + FINISH_WAIT_SEC
+        while self._profiles and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._lock:
+            profiles, self._finished = self._finished, []
+            late = len(self._profiles)
+        if late:
+            print(f"PROFILE: {late} thread(s) still inside a long iteration, left out of this dump")
+        if not profiles:
+            if not late:
+                print("PROFILE: no instrumented thread ran during the window (is scanning running?)")
+            return
+        stats = pstats.Stats(profiles[0])
+        for prof in profiles[1:]:
+            stats.add(prof)
+        path = self._path("cprofile", ".prof")
+        stats.dump_stats(str(path))
+        text = io.StringIO()
+        pstats.Stats(str(path), stream=text).sort_stats("cumulative").print_stats(40)
+        path.with_suffix(".txt").write_text(text.getvalue(), encoding="utf-8")
+        print(f"PROFILE: wrote {path} (+ .txt)")
+
+    # Stack sampling ---------------------------------------------------------
+
+    def sample_thread(self, seconds: float = PROFILE_SECONDS, thread_name: str = SCAN_THREAD) -> bool:
+        """Sample ``thread_name``'s stack for ``seconds`` on a helper thread."""
+        if self._sampling:
+            return False
+        self._sampling = True
+        print(f"PROFILE: sampling thread '{thread_name}' every {PROFILE_SAMPLE_MS} ms for {seconds:.0f}s")
+        threading.Thread(target=self._sample, args=(seconds, thread_name), daemon=True).start()
+        return True
+
+    def _sample(self, seconds: float, thread_name: str):
+        try:
+            stacks: Counter = Counter()
+            interval = PROFILE_SAMPLE_MS / 1000.0
+            deadline = time.time() + seconds
+            samples = 0
+            while time.time() < deadline:
+                idents = [t.ident for t in threading.enumerate() if t.name == thread_name]
+                frames = sys._current_frames()
+                for ident in idents:
+                    frame = frames.get(ident)
+                    stack: List[str] = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                        frame = frame.f_back
+                    if stack:
+                        stacks[";".join(reversed(stack))] += 1
+                        samples += 1
+                time.sleep(interval)
+            if not samples:
+                print(f"PROFILE: thread '{thread_name}' not found while sampling")
+                return
+            path = self._path("stacks", ".folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, n in stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            print(f"PROFILE: wrote {path} ({samples} samples)")
+        finally:
+            self._sampling = False
+
+    # tracemalloc ------------------------------------------------------------
+
+    def tracemalloc_snapshot(self) -> Optional[Path]:
+        """Start tracing on the first call; afterwards dump top allocations
+        (and the growth since the previous snapshot)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._last_snapshot = None
+            print("PROFILE: tracemalloc started; trigger again for a snapshot")
+            return None
+        snap = tracemalloc.take_snapshot()
+        path = self._path("tracemalloc", ".txt")
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced current={current / 2**20:.1f} MiB peak={peak / 2**20:.1f} MiB", "", "Top allocations:"]
+        lines += [str(s) for s in snap.statistics("lineno")[:30]]
+        if self._last_snapshot is not None:
+            lines += ["", "Growth since previous snapshot:"]
+            lines += [str(s) for s in snap.compare_to(self._last_snapshot, "lineno")[:30]]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        snap.dump(str(path.with_suffix(".snap")))
+        self._last_snapshot = snap
+        print(f"PROFILE: wrote {path}")
+        return path
+
+    def tracemalloc_stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._last_snapshot = None
+            print("PROFILE: tracemalloc stopped")
+
+
+PROFILER = Profiler()
+
+
+def install_signal_handlers(profiler: Profiler = PROFILER, seconds: float = PROFILE_SECONDS):
+    """SIGUSR1: cProfile window + scan-thread sampling; SIGUSR2: tracemalloc snapshot.
+    No-op where these signals do not exist (Windows). Main thread only."""
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: (profiler.profile_window(seconds), profiler.sample_thread(seconds)))
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda *_: profiler.tracemalloc_snapshot())
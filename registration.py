@@ -0,0 +1,194 @@
+# registration.py
+import queue
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from config import PREVIEW_DETECT_SEC, BURST_FRAMES, BURST_SECONDS, BURST_KEEP
+from registry import FaceSample
+from scanner import DISPLAY_SIZE
+from utils import LatestSlot
+
+PREVIEW_FPS = 30
+
+
+class CaptureResult(NamedTuple):
+    ok: bool
+    name: str
+    tag: str             # caller-defined, e.g. "auto", "manual" or "burst"
+    error: str = ""      # "camera" | "no_face" | exception text
+    count: int = 1       # samples saved
+
+
+def face_pose(kps) -> np.ndarray:
+    """Rough (yaw, pitch) proxies from 5-point landmarks (eyes, nose, mouth corners)."""
+    kps = np.asarray(kps, dtype=np.float32)
+    eye_mid = (kps[0] + kps[1]) / 2
+    mouth_mid = (kps[3] + kps[4]) / 2
+    eye_dist = np.linalg.norm(kps[1] - kps[0]) + 1e-6
+    yaw = (kps[2, 0] - eye_mid[0]) / eye_dist
+    pitch = (kps[2, 1] - eye_mid[1]) / (mouth_mid[1] - eye_mid[1] + 1e-6) - 0.5
+    return np.array([yaw, pitch], dtype=np.float32)
+
+
+def face_quality(bgr_image: np.ndarray, bbox, det_score: float, pose: np.ndarray) -> float:
+    """Score in [0, 1]: detector confidence x size x sharpness x not-too-turned."""
+    x1, y1, x2, y2 = bbox
+    crop = bgr_image[max(y1, 0):y2, max(x1, 0):x2]
+    if crop.size == 0:
+        return 0.0
+    sharp = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+    size = min(1.0, min(x2 - x1, y2 - y1) / 112.0)
+    turned = max(0.0, 1.0 - float(np.abs(pose).max()))
+    return float(det_score * size * (sharp / (sharp + 100.0)) * turned)
+
+
+def select_diverse(quality: np.ndarray, poses: np.ndarray, k: int) -> List[int]:
+    """Greedy pick: best frame first, then frames that are both good and far
+    (in pose space) from everything already picked."""
+    order = [int(np.argmax(quality))]
+    dist = np.linalg.norm(poses - poses[order[0]], axis=1)
+    while len(order) < min(k, len(quality)):
+        gain = quality * (dist + 0.05)
+        gain[order] = -1.0
+        i = int(np.argmax(gain))
+        if gain[i] <= 0:
+            break
+        order.append(i)
+        dist = np.minimum(dist, np.linalg.norm(poses - poses[i], axis=1))
+    return order
+
+
+class RegistrationSession:
+    """Preview and face capture for the registration window, off the Tk thread.
+
+    Frames come from the shared FrameGrabber. The preview thread resizes,
+    draws detection boxes (refreshed every PREVIEW_DETECT_SEC) and converts
+    to RGB; the Tk side only wraps ``preview`` into a PhotoImage. Captures
+    are queued with ``capture()`` / ``burst()`` and processed (detect +
+    embed + Registry write) on a worker; outcomes arrive on ``results``.
+    """
+
+    def __init__(self, engine, registry, grabber):
+        self.engine = engine
+        self.reg = registry
+        self.grabber = grabber
+        self.preview = LatestSlot()
+        self.results: "queue.SimpleQueue[CaptureResult]" = queue.SimpleQueue()
+        self._jobs: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self._engine_lock = threading.Lock()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        self._threads = [threading.Thread(target=self._preview_loop, daemon=True),
+                         threading.Thread(target=self._capture_loop, daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float = 1.0):
+        self._running = False
+        self._jobs.put(None)
+        for t in self._threads:
+            t.join(timeout)
+
+    def capture(self, name: str, tag: str = "auto"):
+        self._jobs.put(("single", name, tag))
+
+    def burst(self, name: str, tag: str = "burst"):
+        """Grab BURST_FRAMES frames over BURST_SECONDS and keep the best BURST_KEEP."""
+        self._jobs.put(("burst", name, tag))
+
+    def _preview_loop(self):
+        seq = 0
+        boxes = []
+        next_detect = 0.0
+        while self._running:
+            seq, frame = self.grabber.latest(seq)
+            if frame is None:
+                time.sleep(1.0 / PREVIEW_FPS)
+                continue
+            frame = cv2.resize(frame, DISPLAY_SIZE)
+            now = time.time()
+            # Skip detection while a capture holds the engine; keep the old boxes
+            if now >= next_detect and self._engine_lock.acquire(blocking=False):
+                try:
+                    boxes = [bbox for bbox, _kps, _score in self.engine.detect(frame)]
+                finally:
+                    self._engine_lock.release()
+                next_detect = now + PREVIEW_DETECT_SEC
+            for bbox in boxes:
+                self.engine.draw_bbox(frame, bbox)
+            self.preview.put(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def _capture_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None or not self._running:
+                break
+            kind, name, tag = job
+            try:
+                if kind == "burst":
+                    self.results.put(self._do_burst(name, tag))
+                else:
+                    self.results.put(self._do_single(name, tag))
+            except Exception as e:
+                self.results.put(CaptureResult(False, name, tag, str(e)))
+
+    def _do_single(self, name: str, tag: str) -> CaptureResult:
+        _seq, frame = self.grabber.latest()
+        if frame is None:
+            return CaptureResult(False, name, tag, "camera")
+        with self._engine_lock:
+            face = self.engine.largest_face(frame)
+        if face is None:
+            return CaptureResult(False, name, tag, "no_face")
+        bbox, kps, score, emb = face
+        self.reg.add_sample(name, emb, FaceSample(self.engine.align(frame, kps), kps, bbox, score, frame))
+        return CaptureResult(True, name, tag)
+
+    def _do_burst(self, name: str, tag: str) -> CaptureResult:
+        # 1) collect distinct frames over the burst window
+        frames = []
+        seq = 0
+        interval = BURST_SECONDS / max(1, BURST_FRAMES)
+        deadline = time.time() + BURST_SECONDS + 1.0
+        while len(frames) < BURST_FRAMES and time.time() < deadline and self._running:
+            seq, frame = self.grabber.latest(seq)
+            if frame is not None:
+                frames.append(frame)
+            time.sleep(interval)
+        if not frames:
+            return CaptureResult(False, name, tag, "camera", 0)
+
+        # 2) detect the largest face per frame and score it (detection only)
+        cands = []
+        with self._engine_lock:
+            for frame in frames:
+                dets = self.engine.detect(frame)
+                if not dets:
+                    continue
+                bbox, kps, score = max(dets, key=lambda d: (d[0][2] - d[0][0]) * (d[0][3] - d[0][1]))
+                if kps is None:
+                    continue
+                pose = face_pose(kps)
+                cands.append((frame, kps, pose, face_quality(frame, bbox, score, pose), bbox, score))
+        if not cands:
+            return CaptureResult(False, name, tag, "no_face", 0)
+
+        # 3) keep a good, pose-diverse subset and embed it in one batch
+        picked = select_diverse(np.array([c[3] for c in cands]), np.stack([c[2] for c in cands]), BURST_KEEP)
+        crops = [self.engine.align(cands[i][0], cands[i][1]) for i in picked]
+        with self._engine_lock:
+            embs = self.engine.embed_aligned(crops)
+
+        # 4) single Registry write for the whole burst
+        samples = [FaceSample(crop, cands[i][1], cands[i][4], cands[i][5], cands[i][0])
+                   for crop, i in zip(crops, picked)]
+        self.reg.add_samples(name, embs, samples)
+        return CaptureResult(True, name, tag, count=len(picked))
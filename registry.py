@@ -1,64 +1,282 @@
 # registry.py
 import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 import numpy as np
 import cv2
-from typing import Dict, Tuple
-from config import FACES_DIR, EMBED_DIR, SIM_THRESHOLD, TOPK
-from utils import cosine_similarity
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from config import (FACES_DIR, EMBED_DIR, SIM_THRESHOLD, TOPK, MODEL_NAME, DET_SIZE, EMB_NORM,
+                    SAVE_CONTEXT_IMAGE, CONTEXT_MAX_SIDE)
+from metrics import METRICS
+
+GALLERY_META = "_gallery.json"
+CONTEXT_SUFFIX = "_ctx"
+
+
+class FaceSample(NamedTuple):
+    crop: np.ndarray                       # aligned 112x112 BGR face
+    kps: Optional[np.ndarray] = None       # 5x2 landmarks in source-frame coordinates
+    bbox: Optional[tuple] = None           # (x1, y1, x2, y2) in the source frame
+    det_score: float = 0.0
+    context: Optional[np.ndarray] = None   # source frame, kept downscaled if SAVE_CONTEXT_IMAGE
+
+
+def sample_index(path: Path) -> int:
+    """Number of a stored sample ``<person>_<n>.jpg`` (0 if it has none); sorts images in write order."""
+    try:
+        return int(path.stem.rsplit("_", 1)[-1])
+    except ValueError:
+        return 0
+
+
+def _write_sample(base: Path, face):
+    if not isinstance(face, FaceSample):
+        cv2.imwrite(str(base.with_suffix(".jpg")), face)
+        return
+    cv2.imwrite(str(base.with_suffix(".jpg")), face.crop)
+    meta = {
+        "aligned": True,
+        "size": list(face.crop.shape[1::-1]),
+        "kps": None if face.kps is None else np.asarray(face.kps, dtype=float).round(2).tolist(),
+        "bbox": None if face.bbox is None else [int(v) for v in face.bbox],
+        "det_score": round(float(face.det_score), 4),
+        "model_name": MODEL_NAME,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if face.context is not None:
+        h, w = face.context.shape[:2]
+        meta["source_size"] = [w, h]
+        if SAVE_CONTEXT_IMAGE:
+            scale = min(1.0, CONTEXT_MAX_SIDE / max(h, w))
+            ctx = cv2.resize(face.context, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            cv2.imwrite(str(base.with_name(base.name + CONTEXT_SUFFIX + ".jpg")), ctx,
+                        [cv2.IMWRITE_JPEG_QUALITY, 80])
+            meta["context_scale"] = round(scale, 4)
+    with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def current_gallery_meta() -> dict:
+    """Identifies the model configuration that produces embeddings."""
+    return {"model_name": MODEL_NAME, "det_size": list(DET_SIZE), "emb_norm": bool(EMB_NORM)}
+
 
 class Registry:
-    def __init__(self):
-        FACES_DIR.mkdir(parents=True, exist_ok=True)
-        EMBED_DIR.mkdir(parents=True, exist_ok=True)
+    def __init__(self, embed_dir: Path = EMBED_DIR, faces_dir: Path = FACES_DIR):
+        self.embed_dir = Path(embed_dir)
+        self.faces_dir = Path(faces_dir)
+        self.faces_dir.mkdir(parents=True, exist_ok=True)
+        self.embed_dir.mkdir(parents=True, exist_ok=True)
+        # Sample images are encoded/written by a single background writer
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registry-writer")
+        self._pending = []
+        self._index_lock = threading.Lock()
+        self._update_lock = threading.RLock()  # read-modify-write of a person's .npz
+        self._next_index: Dict[str, int] = {}
+        self._gallery: Optional[Tuple[int, List[str], np.ndarray]] = None  # (dir mtime, names, centroids)
 
-    @staticmethod
-    def _embed_file(person: str) -> Path:
-        return EMBED_DIR / f"{person}.npz"
+    def _embed_file(self, person: str) -> Path:
+        return self.embed_dir / f"{person}.npz"
 
     def list_people(self):
-        return sorted([p.stem for p in EMBED_DIR.glob("*.npz")])
+        return sorted([p.stem for p in self.embed_dir.glob("*.npz")])
 
-    def add_sample(self, person: str, embedding: np.ndarray, raw_bgr: np.ndarray):
-        person = person.strip().replace(" ", "_")
-        # append embedding
-        ef = self._embed_file(person)
-        if ef.exists():
-            data = np.load(ef)
-            vecs = data['vecs']
-            vecs = np.vstack([vecs, embedding[None, :]])
+    def gallery_meta(self) -> Optional[dict]:
+        path = self.embed_dir / GALLERY_META
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_gallery_meta(self, meta: Optional[dict] = None):
+        meta = dict(meta or current_gallery_meta())
+        meta.setdefault("created", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        with open(self.embed_dir / GALLERY_META, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    def check_gallery(self) -> str:
+        """Return a warning if stored embeddings came from another (or an unknown,
+        pre-stamp) model config, else ""."""
+        meta = self.gallery_meta()
+        if meta is None:
+            if not self.list_people():
+                return ""
+            return "Gallery has no model stamp (built before stamping), so it may come from another " \
+                   "model configuration. Run 'python reindex.py' once to re-embed and stamp it."
+        current = current_gallery_meta()
+        diffs = [f"{k}: {meta.get(k)} -> {v}" for k, v in current.items() if meta.get(k) != v]
+        if not diffs:
+            return ""
+        return "Gallery was built with a different model configuration (" + "; ".join(diffs) + \
+               "). Run 'python reindex.py' to re-embed stored faces."
+
+    def write_embeddings(self, person: str, vecs: np.ndarray, extras: Optional[Dict[str, np.ndarray]] = None):
+        """Atomically (re)write a person's vectors and L2-normalized centroid.
+
+        ``extras`` are online-adaptation arrays stored alongside (see
+        adaptation.py): ``ema`` replaces the centroid, ``adapt`` samples are
+        averaged in with the enrolled ``vecs``."""
+        if self.gallery_meta() is None and not self.list_people():
+            # Empty gallery: stamp it with the model that is about to fill it
+            self.write_gallery_meta()
+        vecs = np.asarray(vecs, dtype=np.float32)
+        extras = {k: np.asarray(v) for k, v in (extras or {}).items()}
+        if "ema" in extras:
+            centroid = extras["ema"].astype(np.float32)
+        elif len(extras.get("adapt", ())):
+            centroid = np.vstack([vecs, extras["adapt"]]).mean(axis=0)
         else:
-            vecs = embedding[None, :]
-        centroid = vecs.mean(axis=0)
+            centroid = vecs.mean(axis=0)
         # L2 normalize for cosine shortcut
         centroid = centroid / (np.linalg.norm(centroid) + 1e-8)
-        np.savez_compressed(ef, vecs=vecs.astype(np.float32), centroid=centroid.astype(np.float32))
+        ef = self._embed_file(person)
+        tmp = ef.with_name(f".{ef.name}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, vecs=vecs, centroid=centroid.astype(np.float32), **extras)
+        os.replace(tmp, ef)
+        self._gallery = None
 
-        # save face image
-        person_dir = FACES_DIR / person
+    def load_person(self, person: str) -> Optional[Dict[str, np.ndarray]]:
+        """All arrays stored for a person (vecs, centroid, adaptation extras), or None."""
+        ef = self._embed_file(person)
+        if not ef.exists():
+            return None
+        with np.load(ef) as data:
+            return {k: data[k] for k in data.files}
+
+    def update_extras(self, person: str, update) -> bool:
+        """Locked read-modify-write of a person's adaptation arrays:
+        ``update(vecs, extras) -> extras``, or None to leave the file untouched.
+        Return True if the person's embeddings were rewritten."""
+        with self._update_lock:
+            data = self.load_person(person)
+            if data is None:
+                return False
+            vecs = data.pop("vecs")
+            data.pop("centroid", None)
+            extras = update(vecs, data)
+            if extras is None:
+                return False
+            self.write_embeddings(person, vecs, extras)
+            return True
+
+    def add_sample(self, person: str, embedding: np.ndarray, face):
+        self.add_samples(person, embedding[None, :], [face])
+
+    def add_samples(self, person: str, embeddings: np.ndarray, faces: List):
+        """Append several samples with a single embeddings/centroid write.
+
+        ``faces`` are FaceSample (aligned crop + landmarks; stored as a 112x112
+        JPEG with a JSON sidecar) or plain BGR images (stored as-is). Image
+        files are written on a background thread; call ``flush()`` to wait.
+        """
+        person = person.strip().replace(" ", "_")
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # append embeddings; adapted samples are kept, a moving centroid restarts from the new enrollment
+        with self._update_lock:
+            data = self.load_person(person)
+            if data is not None:
+                vecs = np.vstack([data.pop("vecs"), embeddings])
+                data.pop("centroid", None)
+                data.pop("ema", None)
+            else:
+                vecs, data = embeddings, None
+            self.write_embeddings(person, vecs, data)
+
+        # save face images (indices reserved here, encoding + disk IO off-thread)
+        person_dir = self.faces_dir / person
         person_dir.mkdir(exist_ok=True, parents=True)
-        n = len(list(person_dir.glob("*.jpg")))
-        cv2.imwrite(str(person_dir / f"{person}_{n+1:03d}.jpg"), raw_bgr)
+        with self._index_lock:
+            n = self._next_index.get(person)
+            if n is None:
+                n = max([sample_index(p) for p in person_dir.glob(f"{person}_*.jpg")] + [0]) + 1
+            self._next_index[person] = n + len(faces)
+        # drop finished writes so a long session doesn't accumulate futures until flush()
+        for fut in self._pending:
+            if fut.done() and fut.exception() is not None:
+                print(f"WARN: sample write failed: {fut.exception()}")
+        self._pending = [f for f in self._pending if not f.done()]
+        for k, face in enumerate(faces):
+            base = person_dir / f"{person}_{n + k:03d}"
+            self._pending.append(self._writer.submit(_write_sample, base, face))
+        METRICS.inc("registry_samples_added", len(faces))
+        METRICS.set_gauge("registry_pending_writes", len(self._pending))
+
+    def add_batch(self, batch: Dict[str, Tuple[np.ndarray, List]]):
+        """Commit samples for many people at once: {person: (embeddings, faces)}.
+        Each person's embeddings file is rewritten exactly once."""
+        for person, (embeddings, faces) in batch.items():
+            self.add_samples(person, embeddings, faces)
+
+    def flush(self):
+        """Block until all queued sample images are on disk."""
+        pending, self._pending = self._pending, []
+        for fut in pending:
+            fut.result()
+
+    def sample_images(self, person: str) -> List[Path]:
+        """Stored sample images of a person (context images excluded)."""
+        person_dir = self.faces_dir / person
+        if not person_dir.is_dir():
+            return []
+        return sorted(p for p in person_dir.glob("*.jpg") if not p.stem.endswith(CONTEXT_SUFFIX))
+
+    @staticmethod
+    def sample_meta(image_path: Path) -> Optional[dict]:
+        """Sidecar metadata of a stored sample, or None for legacy full-frame images."""
+        meta = Path(image_path).with_suffix(".json")
+        if not meta.exists():
+            return None
+        with open(meta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _gallery_signature(self) -> int:
+        # write_embeddings replaces files via rename, which bumps the directory mtime
+        return self.embed_dir.stat().st_mtime_ns
+
+    def load_gallery(self) -> Tuple[List[str], np.ndarray]:
+        """(names, (N, 512) centroid matrix), cached until the embeddings dir changes."""
+        sig = self._gallery_signature()
+        cached = self._gallery
+        if cached is not None and cached[0] == sig:
+            return cached[1], cached[2]
+        names, rows = [], []
+        for f in sorted(self.embed_dir.glob("*.npz")):
+            with np.load(f) as data:
+                rows.append(data['centroid'])
+            names.append(f.stem)
+        matrix = np.stack(rows).astype(np.float32) if rows else np.zeros((0, 512), dtype=np.float32)
+        self._gallery = (sig, names, matrix)
+        return names, matrix
 
     def get_centroids(self) -> Dict[str, np.ndarray]:
-        table = {}
-        for f in EMBED_DIR.glob("*.npz"):
-            data = np.load(f)
-            table[f.stem] = data['centroid']
-        return table
+        names, matrix = self.load_gallery()
+        return dict(zip(names, matrix))
 
     def match(self, embedding: np.ndarray) -> Tuple[str, float]:
         """Return (best_name, best_similarity) or ("", 0.0) if none meet threshold."""
-        cents = self.get_centroids()
-        if not cents:
-            return "", 0.0
-        best_name = ""
-        best_sim = -1.0
-        for name, c in cents.items():
-            sim = cosine_similarity(embedding, c)
-            if sim > best_sim:
-                best_sim = sim
-                best_name = name
-        if best_sim >= SIM_THRESHOLD:
-            return best_name, float(best_sim)
-        return "", float(best_sim)
+        return self.match_batch(np.asarray(embedding)[None, :])[0]
+
+    def match_batch(self, embeddings: np.ndarray) -> List[Tuple[str, float]]:
+        """``match`` for several (N, 512) embeddings with one matrix product."""
+        names, matrix = self.load_gallery()
+        METRICS.inc("registry_matches", len(embeddings))
+        METRICS.set_gauge("registry_people", len(names))
+        return match_matrix(names, matrix, embeddings)
+
+
+def match_matrix(names: List[str], matrix: np.ndarray, embeddings: np.ndarray,
+                 threshold: float = SIM_THRESHOLD) -> List[Tuple[str, float]]:
+    """Best centroid per query row by cosine (dot product of L2-normalized vectors)."""
+    if not names:
+        return [("", 0.0)] * len(embeddings)
+    sims = np.asarray(embeddings, dtype=np.float32) @ matrix.T
+    best = sims.argmax(axis=1)
+    out = []
+    for i, j in enumerate(best):
+        sim = float(sims[i, j])
+        out.append((names[j], sim) if sim >= threshold else ("", sim))
+    return out
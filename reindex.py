@@ -0,0 +1,154 @@
+# reindex.py
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from bulk_enroll import _init_worker, imread
+from config import EMBED_DIR
+from registry import Registry, current_gallery_meta
+
+STAGING_DIR = EMBED_DIR.with_name(EMBED_DIR.name + ".reindex")
+BATCH = 32  # aligned crops per recognition call
+
+
+def _staging(meta: dict, restart: bool) -> Registry:
+    """Open the side-by-side staging gallery; reuse it only if it targets the same model."""
+    if STAGING_DIR.exists():
+        stage = Registry(embed_dir=STAGING_DIR)
+        old = stage.gallery_meta() or {}
+        same = {k: old.get(k) for k in meta} == meta
+        if restart or not same:
+            shutil.rmtree(STAGING_DIR)
+        else:
+            print(f"Resuming: {len(stage.list_people())} people already re-embedded in {STAGING_DIR}")
+            return stage
+    stage = Registry(embed_dir=STAGING_DIR)
+    stage.write_gallery_meta(meta)
+    return stage
+
+
+def plan(reg: Registry, people: List[str], done: set) -> List[Tuple[str, List[str]]]:
+    """One job per chunk of up to BATCH images of a person."""
+    jobs = []
+    for person in people:
+        if person in done:
+            continue
+        images = [str(p) for p in reg.sample_images(person)]
+        for i in range(0, len(images), BATCH):
+            jobs.append((person, images[i:i + BATCH]))
+    return jobs
+
+
+def _reembed_job(job: Tuple[str, List[str]]):
+    """Stored aligned crops are embedded directly in one batched call (no
+    detection); legacy full-frame images still go through detect + embed."""
+    from bulk_enroll import _engine
+    person, paths = job
+    embs, failures, crops = [], [], []
+    for path in paths:
+        img = imread(path)
+        if img is None:
+            failures.append((path, "unreadable"))
+        elif (Registry.sample_meta(path) or {}).get("aligned"):
+            crops.append(img if img.shape[:2] == (112, 112) else cv2.resize(img, (112, 112)))
+        else:
+            emb, _bbox = _engine.embed_crop(img)
+            if emb is None:
+                failures.append((path, "no_face"))
+            else:
+                embs.append(emb)
+    if crops:
+        embs.extend(_engine.embed_aligned(crops))
+    return person, len(paths), embs, failures
+
+
+def swap(staging: Path) -> Path:
+    """Replace EMBED_DIR with ``staging``; the old gallery is kept as a backup."""
+    backup = EMBED_DIR.with_name(f"{EMBED_DIR.name}.bak-{datetime.now():%Y%m%d%H%M%S}")
+    os.replace(EMBED_DIR, backup)
+    try:
+        os.replace(staging, EMBED_DIR)
+    except OSError:
+        os.replace(backup, EMBED_DIR)
+        raise
+    return backup
+
+
+def reindex(workers: int, threads: int = 1, restart: bool = False, allow_missing: bool = False,
+            no_swap: bool = False) -> int:
+    reg = Registry()
+    meta = current_gallery_meta()
+    people = reg.list_people()
+    stage = _staging(meta, restart)
+    done = set(stage.list_people())
+    jobs = plan(reg, people, done)
+    n = sum(len(paths) for _, paths in jobs)
+    print(f"Re-embedding {n} images for {len(set(p for p, _ in jobs))} people "
+          f"with {workers} worker process(es) [{meta['model_name']}, det_size={tuple(meta['det_size'])}]")
+
+    t0 = time.perf_counter()
+    failures = 0
+    if jobs:
+        pending: Dict[str, List[np.ndarray]] = {}
+        remaining = {}
+        for person, paths in jobs:
+            remaining[person] = remaining.get(person, 0) + len(paths)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as ex:
+            for person, count, embs, errs in ex.map(_reembed_job, jobs):
+                for path, err in errs:
+                    failures += 1
+                    print(f"FAIL: {path}: {err}")
+                pending.setdefault(person, []).extend(embs)
+                remaining[person] -= count
+                if remaining[person] == 0 and pending.get(person):
+                    # Person complete: persist now so an interrupted run resumes from here
+                    stage.write_embeddings(person, np.stack(pending.pop(person)))
+    elapsed = time.perf_counter() - t0
+
+    missing = sorted(set(people) - set(stage.list_people()))
+    print(f"Embedded {n - failures}/{n} images in {elapsed:.1f}s ({n / elapsed if elapsed else 0:.1f} img/s)")
+    if missing:
+        print(f"WARN: no usable face images for: {', '.join(missing)}")
+        if not allow_missing:
+            print("Not swapping. Re-run with --allow-missing to drop them, or re-enroll them first.")
+            return 1
+    if no_swap:
+        print(f"Staged gallery left in {STAGING_DIR}")
+        return 0
+    backup = swap(STAGING_DIR)
+    print(f"Swapped in new gallery. Previous gallery kept at {backup}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-embed all stored faces with the current MODEL_NAME / DET_SIZE and swap the gallery")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--threads", type=int, default=1, help="ONNXRuntime threads per worker")
+    parser.add_argument("--restart", action="store_true", help="discard a previous partial run")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="swap even if some people have no usable images (they are dropped)")
+    parser.add_argument("--no-swap", action="store_true", help="build the staged gallery only")
+    parser.add_argument("--status", action="store_true", help="show gallery/model status and exit")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        reg = Registry()
+        print(json.dumps({"gallery": reg.gallery_meta(), "current": current_gallery_meta(),
+                          "people": len(reg.list_people())}, indent=2))
+        print(reg.check_gallery() or "Gallery matches current model configuration.")
+        return 0
+    return reindex(args.workers, args.threads, args.restart, args.allow_missing, args.no_swap)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+# report_model.py
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from attendance import iter_detailed_records, report_days
+from config import REPORT_PAGE_SIZE
+
+Row = Tuple[str, str, str, str]  # name, date (dd/mm/YYYY), time_in, time_out
+
+
+class ReportModel:
+    """Paged, filtered view over the detailed attendance report.
+
+    Rows are loaded lazily per day and cached, filtering happens here rather
+    than in the widget, and the table only ever materializes one page. The
+    filtered view is only built when a page is first asked for, so setting a
+    filter right after construction reads just the filtered day(s).
+    """
+
+    def __init__(self, page_size: int = REPORT_PAGE_SIZE):
+        self.page_size = page_size
+        self.page = 0
+        self._days: List[date] = []
+        self._rows: Dict[date, List[Row]] = {}
+        self._lower: Dict[date, List[str]] = {}
+        self._view: List[Row] = []
+        self._day: Optional[date] = None
+        self._kw = ""
+        self._stale = True
+        self.reload()
+
+    @staticmethod
+    def _read_day(day: date) -> List[Row]:
+        return [(r["name"], r["date"], r["time_in"], r["time_out"])
+                for r in iter_detailed_records([day])]
+
+    def _day_rows(self, day: date) -> List[Row]:
+        rows = self._rows.get(day)
+        if rows is None:
+            rows = self._rows[day] = self._read_day(day)
+            self._lower[day] = [r[0].lower() for r in rows]
+        return rows
+
+    def reload(self):
+        """Forget cached rows and re-scan the available days."""
+        self._days = sorted(report_days(), reverse=True)
+        self._rows.clear()
+        self._lower.clear()
+        self._stale = True
+
+    def refresh_day(self, day: date):
+        """Re-read a single (open) day, e.g. after a new attendance event."""
+        if day not in self._days:
+            self._days = sorted(set(self._days) | {day}, reverse=True)
+        self._rows.pop(day, None)
+        self._lower.pop(day, None)
+        self._stale = True
+
+    def set_filter(self, day: Optional[date] = None, name_contains: str = ""):
+        self._day = day
+        self._kw = name_contains.strip().lower()
+        self.page = 0
+        self._stale = True
+
+    def _apply(self):
+        if not self._stale:
+            return
+        self._stale = False
+        days = [self._day] if self._day else self._days
+        kw = self._kw
+        view: List[Row] = []
+        for d in days:
+            if d not in self._days:
+                continue
+            rows = self._day_rows(d)
+            if kw:
+                lower = self._lower[d]
+                view.extend(r for r, n in zip(rows, lower) if kw in n)
+            else:
+                view.extend(rows)
+        self._view = view
+        self.page = max(0, min(self.page, self.page_count - 1))
+
+    @property
+    def total(self) -> int:
+        self._apply()
+        return len(self._view)
+
+    @property
+    def page_count(self) -> int:
+        self._apply()
+        return max(1, -(-len(self._view) // self.page_size))
+
+    @property
+    def page_offset(self) -> int:
+        return self.page * self.page_size
+
+    def page_rows(self) -> List[Row]:
+        self._apply()
+        start = self.page_offset
+        return self._view[start:start + self.page_size]
+
+    def go_to(self, page: int) -> bool:
+        """Move to ``page`` (clamped); return True if the page changed."""
+        page = max(0, min(page, self.page_count - 1))
+        changed = page != self.page
+        self.page = page
+        return changed
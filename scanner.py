@@ -0,0 +1,255 @@
+# scanner.py
+import queue
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from config import FPS_LIMIT, TRACK_VOTES, UNKNOWN_SAMPLE_SEC
+from attendance import log_event, can_attend_today, last_status_today
+from metrics import METRICS
+from profiling import PROFILER, SCAN_THREAD
+from tracking import Tracker
+from utils import LatestSlot
+
+DISPLAY_SIZE = (640, 480)
+
+
+class ScanEvent(NamedTuple):
+    kind: str            # "attendance" | "notice" | "camera_lost"
+    name: str = ""
+    status: str = ""
+    sim: float = 0.0
+    message: str = ""
+
+
+class FrameGrabber:
+    """Reads the camera continuously on its own thread.
+
+    Consumers (scanner, registration preview, capture) take the newest frame
+    from ``frames`` at their own rate; stale frames are simply overwritten.
+    ``frames`` holds (frame, capture time) so latency can be measured end to end.
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.frames = LatestSlot()
+        self.lost = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def latest(self, after_seq: int = 0):
+        """Return (seq, frame) for the newest frame after ``after_seq``, else (after_seq, None)."""
+        seq, item = self.frames.get(after_seq)
+        return seq, item[0] if item is not None else None
+
+    def latest_stamped(self, after_seq: int = 0):
+        """Like ``latest`` but return (seq, frame, capture time)."""
+        seq, item = self.frames.get(after_seq)
+        if item is None:
+            return seq, None, 0.0
+        return seq, item[0], item[1]
+
+    def _loop(self):
+        while self._running:
+            t0 = time.perf_counter()
+            ok, frame = self.cap.read()
+            if not ok:
+                print("Camera signal lost!")
+                self.lost = True
+                break
+            METRICS.observe("camera_read", time.perf_counter() - t0)
+            METRICS.inc("frames_captured")
+            self.frames.put((frame, time.time()))
+        self._running = False
+
+
+class Scanner:
+    """Background scan pipeline: camera -> detect/embed -> match -> attendance log.
+
+    Never touches Tk. Frames come from a FrameGrabber; results are published
+    for the UI thread to consume at its own rate:
+      - ``frames``: LatestSlot holding (annotated RGB frame, info text)
+      - ``events``: queue of ScanEvent (attendance logged, notices, camera loss)
+    """
+
+    def __init__(self, engine, registry, grabber, cooldown, fps_limit: float = FPS_LIMIT, crowd=None,
+                 unknowns=None, adapter=None):
+        """crowd: optional CrowdDetector; detection then runs on the full camera
+        frame instead of the DISPLAY_SIZE downscale.
+        unknowns: optional UnknownClusters collecting faces that stay unrecognized.
+        adapter: optional TemplateAdapter fed with matches that confirm a track's identity."""
+        self.engine = engine
+        self.crowd = crowd
+        self.unknowns = unknowns
+        self.adapter = adapter
+        self.reg = registry
+        self.grabber = grabber
+        self.cooldown = cooldown
+        self.fps_limit = fps_limit  # 0 = process frames as fast as they arrive
+        self.frames = LatestSlot()
+        self.events: "queue.SimpleQueue[ScanEvent]" = queue.SimpleQueue()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.tracker = Tracker()  # per-face identity votes + attendance state for this session
+        self.first_match_at: Optional[float] = None  # perf_counter() of the first recognized face
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=SCAN_THREAD, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        period = 1.0 / self.fps_limit if self.fps_limit > 0 else 0.0
+        last = 0.0
+        seq = 0
+        fps = 0.0
+        while self._running:
+            PROFILER.hook()
+            wait = last + period - time.time()
+            if wait > 0:
+                time.sleep(min(wait, 0.005))
+                continue
+            prev = seq
+            seq, frame, captured = self.grabber.latest_stamped(seq)
+            if frame is None:
+                if self.grabber.lost:
+                    self.events.put(ScanEvent("camera_lost"))
+                    break
+                time.sleep(0.002)
+                continue
+            if last:
+                fps = 0.9 * fps + 0.1 / max(time.time() - last, 1e-3)
+                METRICS.set_gauge("scan_fps", round(fps, 2))
+            now = last = time.time()
+            if prev and seq - prev > 1:
+                METRICS.inc("frames_dropped", seq - prev - 1)
+
+            dets = None
+            if self.crowd is not None:
+                dets = self.crowd.detect_and_embed(frame)
+                sx, sy = DISPLAY_SIZE[0] / frame.shape[1], DISPLAY_SIZE[1] / frame.shape[0]
+                dets = [(tuple(int(v * f) for v, f in zip(bbox, (sx, sy, sx, sy))), kps * (sx, sy), score, emb)
+                        for bbox, kps, score, emb in dets]
+
+            # Resize frame to fixed display size
+            with METRICS.timer("resize"):
+                frame = cv2.resize(frame, DISPLAY_SIZE)
+            display, info = self.process(frame, now, captured, dets)
+            METRICS.inc("frames_processed")
+            METRICS.set_gauge("scan_event_queue", self.events.qsize())
+            if self._running:
+                with METRICS.timer("convert"):
+                    rgb = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
+                self.frames.put((rgb, info))
+        self._running = False
+
+    def process(self, frame, now: float, captured: Optional[float] = None, dets=None):
+        """Recognize faces in one frame, log attendance, return (annotated frame, info).
+        ``captured`` is the camera timestamp of the frame (for capture-to-log latency);
+        ``dets`` are precomputed detections in ``frame`` coordinates (crowd mode).
+
+        Faces are followed by the Tracker: only tracks without a committed
+        identity (or due for re-verification) are embedded and matched, and
+        attendance is decided once per committed track."""
+        if dets is None:
+            with METRICS.timer("detect"):
+                faces = [d for d in self.engine.detect(frame) if d[1] is not None]
+            embs = None
+        else:
+            faces = [(bbox, kps, score) for bbox, kps, score, _emb in dets]
+            embs = [emb for _b, _k, _s, emb in dets]
+        METRICS.inc("faces_detected", len(faces))
+        tracks = self.tracker.update([f[0] for f in faces], now)
+
+        pending = [i for i, t in enumerate(tracks) if self.tracker.needs_match(t, now)]
+        METRICS.inc("matches_skipped", len(tracks) - len(pending))
+        if pending:
+            crops = None
+            if embs is None:
+                with METRICS.timer("recognize"):
+                    crops = [self.engine.align(frame, faces[i][1]) for i in pending]
+                    batch = self.engine.embed_aligned(crops)
+            else:
+                batch = np.stack([embs[i] for i in pending])
+            with METRICS.timer("match"):
+                matches = self.reg.match_batch(batch)
+            for j, (i, (name, sim)) in enumerate(zip(pending, matches)):
+                track = tracks[i]
+                self.tracker.vote(track, name, sim, now)
+                if self.adapter is not None and name and track.identity == name:
+                    self.adapter.observe(name, batch[j], sim, now)
+                # Persistently unrecognized faces feed the unknown clusters, sampled per track
+                if (not name and self.unknowns is not None and track.votes.get("", 0) >= TRACK_VOTES
+                        and now - track.unknown_sampled_at >= UNKNOWN_SAMPLE_SEC):
+                    track.unknown_sampled_at = now
+                    crop = crops[j] if crops is not None else self.engine.align(frame, faces[i][1])
+                    self.unknowns.add(batch[j], crop, faces[i][2], now)
+
+        display = frame.copy()
+        info = ""
+        for (bbox, _kps, _score), track in zip(faces, tracks):
+            if track.identity is None:
+                METRICS.inc("faces_unknown")
+                self.engine.draw_bbox(display, bbox, "Unknown", None)
+                continue
+            METRICS.inc("faces_recognized")
+            if self.first_match_at is None:
+                self.first_match_at = time.perf_counter()
+            info = self._attend(track, now, captured) or info
+            self.engine.draw_bbox(display, bbox, track.identity, track.sim)
+        return display, info
+
+    def _attend(self, track, now: float, captured: Optional[float]) -> str:
+        """Attendance for a committed track: the daily-limit lookup runs once per
+        track, the IN/OUT log at most once; later frames only report the state."""
+        name, sim = track.identity, track.sim
+        if track.allowed is None:
+            track.allowed, limit_message = can_attend_today(name)
+            if not track.allowed:
+                self.events.put(ScanEvent("notice", name, message=f"{name}: {limit_message}"))
+                print(f"WARN: {name} has already attended today")
+        if not track.allowed:
+            return f"{name} - Đã đủ điểm danh hôm nay"
+        if track.status is not None:
+            return f"{name} - {track.status} (sim={sim:.2f})"
+        if not self.cooldown.ready(name):
+            return f"{name} (sim={sim:.2f}) - Chờ cooldown"
+
+        # Alternating logic based on actual attendance history: IN → OUT → IN → OUT → ...
+        new_state = "OUT" if last_status_today(name) == "IN" else "IN"
+        with METRICS.timer("attendance"):
+            log_event(name, new_state)
+        METRICS.inc("attendance_logged")
+        METRICS.observe("capture_to_log", time.time() - (captured or now))
+        track.status = new_state
+        if new_state == "IN":
+            print(f"IN: {name} checked in (confidence: {sim:.2f})")
+        else:
+            print(f"OUT: {name} checked out (confidence: {sim:.2f})")
+        self.events.put(ScanEvent("attendance", name, new_state, sim))
+        return f"{name} -> {new_state} (sim={sim:.2f})"
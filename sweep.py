@@ -0,0 +1,223 @@
+# sweep.py
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from bench_matching import environment
+from bulk_enroll import IMAGE_EXTS, imread
+from config import DET_SIZE, MIN_FACE_SIZE, SIM_THRESHOLD, TMP_DIR
+from registry import Registry, match_matrix
+from scanner import DISPLAY_SIZE
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+UNKNOWN_LABELS = ("unknown", "_unknown", "impostor")
+
+
+def iter_labeled(root: Path, video_step: int) -> Iterator[Tuple[str, str, np.ndarray]]:
+    """(label, source, frame) for <root>/<label>/<image or video>; videos yield every ``video_step``-th frame."""
+    for label_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        label = label_dir.name.strip().replace(" ", "_")
+        for f in sorted(label_dir.iterdir()):
+            ext = f.suffix.lower()
+            if ext in IMAGE_EXTS:
+                img = imread(f)
+                if img is not None:
+                    yield label, str(f), img
+            elif ext in VIDEO_EXTS:
+                cap = cv2.VideoCapture(str(f))
+                i = 0
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    if i % video_step == 0:
+                        yield label, f"{f}#{i}", frame
+                    i += 1
+                cap.release()
+
+
+def run_pass(engine, root: Path, video_step: int, size: Optional[Tuple[int, int]] = DISPLAY_SIZE) -> List[dict]:
+    """Detect + embed every probe once with no size filter; timings per probe.
+
+    Probes are first resized to ``size`` (default DISPLAY_SIZE, like
+    ``Scanner._loop``) so face sizes and latency match the scan pipeline;
+    ``size=None`` keeps the native resolution (crowd mode)."""
+    probes = []
+    for label, source, img in iter_labeled(root, video_step):
+        t0 = time.perf_counter()
+        if size is not None:
+            img = cv2.resize(img, size)
+        dets = [d for d in engine.detect(img) if d[1] is not None]
+        t1 = time.perf_counter()
+        embs = engine.embed_aligned([engine.align(img, kps) for _b, kps, _s in dets])
+        t2 = time.perf_counter()
+        sizes = [min(b[2] - b[0], b[3] - b[1]) for b, _k, _s in dets]
+        probes.append({"label": label, "source": source, "sizes": np.array(sizes, dtype=np.float32),
+                       "embs": embs, "detect_ms": (t1 - t0) * 1000.0,
+                       "recog_ms_per_face": (t2 - t1) * 1000.0 / max(1, len(dets))})
+    return probes
+
+
+def build_gallery(engine, enroll_root: Path) -> Tuple[List[str], np.ndarray]:
+    """Centroid per person from the largest face of each enrollment image."""
+    per_person: Dict[str, List[np.ndarray]] = {}
+    for label, _source, img in iter_labeled(enroll_root, video_step=10):
+        face = engine.largest_face(img)
+        if face is not None:
+            per_person.setdefault(label, []).append(face[3])
+    names = sorted(per_person)
+    rows = [np.mean(per_person[n], axis=0) for n in names]
+    matrix = np.stack([r / (np.linalg.norm(r) + 1e-8) for r in rows]).astype(np.float32) if rows else \
+        np.zeros((0, 512), dtype=np.float32)
+    return names, matrix
+
+
+def evaluate(probes: List[dict], names: List[str], matrix: np.ndarray, min_face: int,
+             thresholds: List[float]) -> List[dict]:
+    """Accuracy/latency for one MIN_FACE_SIZE at every threshold, from the cached pass.
+
+    Each probe is judged on its largest face that passes ``min_face`` (pixels of
+    the probe frame as detected, i.e. after run_pass's resize):
+      genuine (label enrolled):  TA if matched to its own label, mis-ID if matched to another
+      impostor (label not enrolled or "unknown"):  FA if matched to anyone
+    Latency is estimated as detection time + per-face recognition time x faces kept.
+    """
+    enrolled = set(names)
+    best_names, best_sims, genuine, latency = [], [], [], []
+    for p in probes:
+        keep = p["sizes"] >= min_face
+        latency.append(p["detect_ms"] + p["recog_ms_per_face"] * int(keep.sum()))
+        genuine.append(p["label"] in enrolled and p["label"].lower() not in UNKNOWN_LABELS)
+        if not keep.any():
+            best_names.append("")
+            best_sims.append(-1.0)
+            continue
+        i = int(np.argmax(np.where(keep, p["sizes"], -1)))
+        name, sim = match_matrix(names, matrix, p["embs"][i:i + 1], threshold=-1.0)[0]
+        best_names.append(name)
+        best_sims.append(sim)
+
+    sims = np.array(best_sims)
+    genuine = np.array(genuine)
+    correct = np.array([n == p["label"] for n, p in zip(best_names, probes)])
+    detected = sims > -1.0
+    lat = np.array(latency)
+    n_gen, n_imp = int(genuine.sum()), int((~genuine).sum())
+    out = []
+    for thr in thresholds:
+        accept = sims >= thr
+        out.append({
+            "min_face_size": min_face,
+            "sim_threshold": thr,
+            "genuine": n_gen,
+            "impostors": n_imp,
+            "detect_rate": round(float(detected.mean()), 4) if len(probes) else 0.0,
+            "tar": round(float((accept & correct & genuine).sum() / n_gen), 4) if n_gen else None,
+            "misid_rate": round(float((accept & ~correct & genuine).sum() / n_gen), 4) if n_gen else None,
+            "far": round(float((accept & ~genuine).sum() / n_imp), 4) if n_imp else None,
+            "latency_p50_ms": round(float(np.percentile(lat, 50)), 2),
+            "latency_p99_ms": round(float(np.percentile(lat, 99)), 2),
+            "throughput_fps": round(1000.0 / float(lat.mean()), 2),
+        })
+    return out
+
+
+def pareto(rows: List[dict]) -> None:
+    """Mark rows not dominated on (higher TAR, lower FAR + mis-ID, higher throughput)."""
+    def key(r):
+        return (r["tar"] or 0.0, -((r["far"] or 0.0) + (r["misid_rate"] or 0.0)), r["throughput_fps"])
+
+    keys = [key(r) for r in rows]
+    for r, k in zip(rows, keys):
+        r["pareto"] = not any(all(o >= s for o, s in zip(other, k)) and other != k for other in keys)
+
+
+def recommend(rows: List[dict], min_tar: float, max_far: float):
+    ok = [r for r in rows if (r["tar"] or 0.0) >= min_tar and (r["far"] or 0.0) <= max_far]
+    return max(ok, key=lambda r: r["throughput_fps"]) if ok else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep DET_SIZE x MIN_FACE_SIZE x SIM_THRESHOLD over a labeled set (<dir>/<person>/<images|videos>)")
+    parser.add_argument("root", type=Path, help='labeled probes; folders not enrolled (or "unknown") are impostors')
+    parser.add_argument("--enroll", type=Path, help="enrollment set with the same layout (default: current gallery)")
+    parser.add_argument("--det-sizes", type=int, nargs="+", default=[320, 480, 640])
+    parser.add_argument("--min-face", type=int, nargs="+", default=[20, 35, 50, 80])
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[round(t, 2) for t in np.arange(0.26, 0.56, 0.04)])
+    parser.add_argument("--threads", type=int, default=0, help="ONNXRuntime threads (0 = default)")
+    parser.add_argument("--native", action="store_true",
+                        help="detect at the probes' native resolution (as crowd mode does) instead of "
+                             "resizing to the scanner's DISPLAY_SIZE first")
+    parser.add_argument("--video-step", type=int, default=5, help="use every N-th video frame")
+    parser.add_argument("--min-tar", type=float, default=0.95, help="accuracy target for the recommendation")
+    parser.add_argument("--max-far", type=float, default=0.01)
+    parser.add_argument("--out", type=Path, help="result JSON (a .csv is written next to it)")
+    args = parser.parse_args(argv)
+    if not args.root.is_dir():
+        parser.error(f"not a directory: {args.root}")
+
+    from face_engine import FaceEngine
+
+    rows: List[dict] = []
+    for det_size in args.det_sizes:
+        engine = FaceEngine(threads=args.threads, det_size=(det_size, det_size), min_face_size=0)
+        if args.enroll:
+            names, matrix = build_gallery(engine, args.enroll)
+        else:
+            names, matrix = Registry().load_gallery()
+        if not names:
+            parser.error("empty gallery: enroll people first or pass --enroll")
+        print(f"det_size={det_size}: embedding probes against {len(names)} identities...", flush=True)
+        probes = run_pass(engine, args.root, args.video_step, None if args.native else DISPLAY_SIZE)
+        if not probes:
+            parser.error(f"no images or videos under {args.root}")
+        for min_face in args.min_face:
+            for r in evaluate(probes, names, matrix, min_face, args.thresholds):
+                rows.append({"det_size": det_size, **r})
+
+    probe_size = "native" if args.native else f"{DISPLAY_SIZE[0]}x{DISPLAY_SIZE[1]}"
+    print(f"MIN_FACE_SIZE and latency below refer to {probe_size} probe frames")
+    pareto(rows)
+    best = recommend(rows, args.min_tar, args.max_far)
+    current = next((r for r in rows if r["det_size"] == DET_SIZE[0] and r["min_face_size"] == MIN_FACE_SIZE
+                    and abs(r["sim_threshold"] - SIM_THRESHOLD) < 1e-6), None)
+
+    print(f"\n{'det':>4} {'minface':>7} {'thr':>5} {'TAR':>6} {'FAR':>6} {'misID':>6} {'fps':>7} {'p99ms':>7}")
+    for r in rows:
+        if r["pareto"]:
+            print(f"{r['det_size']:>4} {r['min_face_size']:>7} {r['sim_threshold']:>5.2f} {r['tar'] or 0:>6.3f} "
+                  f"{r['far'] or 0:>6.3f} {r['misid_rate'] or 0:>6.3f} {r['throughput_fps']:>7.1f} "
+                  f"{r['latency_p99_ms']:>7.1f}")
+    if current:
+        print(f"\nCurrent config (DET_SIZE={DET_SIZE}, MIN_FACE_SIZE={MIN_FACE_SIZE}, SIM_THRESHOLD={SIM_THRESHOLD}): "
+              f"TAR={current['tar']} FAR={current['far']} fps={current['throughput_fps']}")
+    if best:
+        print(f"Fastest with TAR>={args.min_tar} and FAR<={args.max_far}: DET_SIZE=({best['det_size']}, "
+              f"{best['det_size']}) MIN_FACE_SIZE={best['min_face_size']} SIM_THRESHOLD={best['sim_threshold']} "
+              f"({best['throughput_fps']} fps)")
+    else:
+        print(f"No configuration reaches TAR>={args.min_tar} with FAR<={args.max_far}.")
+
+    out = args.out or TMP_DIR / f"sweep_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"sweep": "det_size x min_face_size x sim_threshold", "env": environment(),
+                   "probes": str(args.root), "probe_size": probe_size, "recommended": best, "results": rows}, f, indent=2)
+    with open(out.with_suffix(".csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+# test_adaptation.py
+import numpy as np
+import pytest
+
+from adaptation import TemplateAdapter
+from registry import Registry
+
+
+def unit(v):
+    return (v / np.linalg.norm(v)).astype(np.float32)
+
+
+@pytest.fixture
+def reg(tmp_path):
+    return Registry(embed_dir=tmp_path / "embeddings", faces_dir=tmp_path / "faces")
+
+
+@pytest.fixture
+def person(reg):
+    rng = np.random.default_rng(0)
+    base = unit(rng.standard_normal(512))
+    vecs = np.stack([unit(base + 0.05 * rng.standard_normal(512)) for _ in range(4)])
+    reg.write_embeddings("An", vecs)
+    return base
+
+
+def test_ema_moves_centroid(reg, person):
+    before = reg.load_person("An")["centroid"]
+    adapter = TemplateAdapter(reg, mode="ema", min_sim=0.5, interval=0.0)
+    assert adapter.observe("An", unit(person + 0.02), 0.9, now=1.0)
+    assert adapter.flush() == 1
+    data = reg.load_person("An")
+    assert "ema" in data and not np.allclose(data["centroid"], before)
+
+
+def test_no_write_when_every_sample_is_rejected(reg, person):
+    path = reg._embed_file("An")
+    mtime = path.stat().st_mtime_ns
+    adapter = TemplateAdapter(reg, mode="reservoir", min_sim=0.0, interval=0.0)
+    far = unit(np.random.default_rng(1).standard_normal(512))  # not the enrolled person
+    adapter.observe("An", far, 0.9, now=1.0)
+    assert adapter.flush() == 0
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_reservoir_mode_drops_stale_ema(reg, person):
+    ema = TemplateAdapter(reg, mode="ema", min_sim=0.0, interval=0.0)
+    ema.observe("An", unit(person + 0.002), 0.9, now=1.0)
+    ema.flush()
+    assert "ema" in reg.load_person("An")
+
+    reservoir = TemplateAdapter(reg, mode="reservoir", min_sim=0.0, interval=0.0)
+    assert reservoir.prune() == 1
+    data = reg.load_person("An")
+    assert "ema" not in data
+    assert np.allclose(data["centroid"], unit(data["vecs"].mean(axis=0)), atol=1e-5)
+    assert reservoir.prune() == 0
+
+    reservoir.observe("An", unit(person + 0.02), 0.9, now=2.0)
+    reservoir.flush()
+    assert len(reg.load_person("An")["adapt"]) == 1
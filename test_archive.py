@@ -0,0 +1,106 @@
+# test_archive.py
+import csv
+from datetime import date
+
+import numpy as np
+
+import archive
+import attendance
+
+
+def write_day(day, rows):
+    with open(attendance.csv_path_for(day), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "name", "status"])
+        w.writerows(rows)
+
+
+def raw_rows(day):
+    with open(attendance.csv_path_for(day), newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def events(day, *people):
+    return [[f"{day:%Y-%m-%d} {8 + i:02d}:00:00", name, status]
+            for i, (name, status) in enumerate(people)]
+
+
+def test_compaction_to_monthly_partitions(reports):
+    d1, d2, d3 = date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)
+    for d in (d1, d2, d3):
+        write_day(d, events(d, ("An", "IN"), ("Bình", "IN"), ("An", "OUT")))
+    expected = {d: raw_rows(d) for d in (d1, d2, d3)}
+
+    stats = archive.archive_closed_days(before=date(2024, 3, 1))
+    assert stats == {"days": 3, "rows": 9, "partitions": 2}
+    assert [p.name for p in archive.partitions()] == ["attendance_202401.npz", "attendance_202402.npz"]
+    assert not attendance.csv_path_for(d1).exists()
+    assert archive.archived_days() == [d1, d2, d3]
+    assert attendance.report_days() == [d1, d2, d3]
+    for d, rows in expected.items():
+        assert archive.read_day_rows(d) == rows
+        assert attendance.read_day_rows(d) == rows
+
+
+def test_keep_csv_and_before(reports):
+    d1, d2 = date(2024, 1, 30), date(2024, 1, 31)
+    write_day(d1, events(d1, ("An", "IN")))
+    write_day(d2, events(d2, ("An", "IN")))
+    archive.archive_closed_days(keep_csv=True, before=d2)
+    assert archive.archived_days() == [d1]
+    assert attendance.csv_path_for(d1).exists() and attendance.csv_path_for(d2).exists()
+
+
+def test_recompaction_merges_and_replaces_days(reports):
+    d1, d2 = date(2024, 1, 10), date(2024, 1, 11)
+    write_day(d1, events(d1, ("An", "IN"), ("An", "OUT")))
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    write_day(d2, events(d2, ("Chi", "IN")))
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    assert archive.archived_days() == [d1, d2]
+    assert [r["name"] for r in archive.read_day_rows(d1)] == ["An", "An"]
+    assert [r["name"] for r in archive.read_day_rows(d2)] == ["Chi"]
+
+    # a day archived again replaces its old rows
+    write_day(d1, events(d1, ("Dung", "IN")))
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    assert [r["name"] for r in archive.read_day_rows(d1)] == ["Dung"]
+    assert [r["name"] for r in archive.read_day_rows(d2)] == ["Chi"]
+
+
+def test_empty_day_is_kept(reports):
+    d = date(2024, 1, 10)
+    write_day(d, [])
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    assert archive.archived_days() == [d]
+    assert archive.read_day_rows(d) == []
+
+
+def test_read_range_columns(reports):
+    d1, d2 = date(2024, 1, 31), date(2024, 2, 1)
+    write_day(d1, events(d1, ("An", "IN"), ("Bình", "OUT")))
+    write_day(d2, events(d2, ("Chi", "IN")))
+    archive.archive_closed_days(before=date(2024, 3, 1))
+    cols = archive.read_range(d1, d2)
+    assert cols["name"].tolist() == ["An", "Bình", "Chi"]
+    assert cols["status"].tolist() == ["IN", "OUT", "IN"]
+    assert np.all(np.diff(cols["ts"]) > np.timedelta64(0, "s"))
+    assert archive.read_range(d2, d2, columns=("name",))["name"].tolist() == ["Chi"]
+    assert len(archive.read_range(date(2023, 1, 1), date(2023, 12, 31))["ts"]) == 0
+    assert sorted(archive.read_range_rows(d1, d2)) == [d1, d2]
+
+
+def test_partition_signature_invalidates_summary(reports):
+    d1, d2 = date(2024, 1, 10), date(2024, 1, 11)
+    write_day(d1, events(d1, ("An", "IN")))
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    sig = archive.partition_signature(d1)
+    assert sig is not None and archive.partition_signature(date(2024, 5, 1)) is None
+    assert attendance.day_summary(d1)["An"]["in"] == 1
+
+    # re-compacting the month (a new day merged, d1 replaced) changes the signature
+    write_day(d1, events(d1, ("An", "IN"), ("An", "OUT")))
+    write_day(d2, events(d2, ("Chi", "IN")))
+    archive.archive_closed_days(before=date(2024, 2, 1))
+    assert archive.partition_signature(d1) != sig
+    assert attendance.day_summary(d1)["An"]["out"] == 1
@@ -0,0 +1,108 @@
+# test_attendance.py
+import csv
+import json
+from datetime import date, timedelta
+
+import attendance
+
+
+def write_day(day, rows):
+    with open(attendance.csv_path_for(day), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "name", "status"])
+        w.writerows(rows)
+
+
+def test_summarize_rows_matches_pair_sessions():
+    rows = [{"timestamp": "2025-01-02 08:00:00", "name": "An", "status": "IN"},
+            {"timestamp": "2025-01-02 08:30:00", "name": "An", "status": "IN"},
+            {"timestamp": "2025-01-02 10:00:00", "name": "An", "status": "OUT"},
+            {"timestamp": "2025-01-02 11:00:00", "name": "Binh", "status": "IN"}]
+    users = attendance.summarize_rows(rows)
+    sessions = attendance.pair_sessions(rows)
+    assert users["An"]["sessions"] == sum(s[0] == "An" for s in sessions) == 1
+    assert users["An"]["seconds"] == 2 * 3600  # from the first IN, like the report table
+    assert (users["An"]["in"], users["An"]["out"], users["An"]["total"]) == (2, 1, 3)
+    assert users["Binh"]["sessions"] == 1 and users["Binh"]["seconds"] == 0.0
+    assert users["An"]["first_in"] == "2025-01-02 08:00:00"
+    assert users["An"]["last_out"] == "2025-01-02 10:00:00"
+
+
+def test_day_summary_rebuilt_when_csv_changes(reports):
+    day = date.today() - timedelta(days=2)
+    stamp = day.strftime("%Y-%m-%d")
+    write_day(day, [[f"{stamp} 08:00:00", "An", "IN"]])
+    assert attendance.day_summary(day)["An"]["in"] == 1
+    assert attendance.summary_path_for(day).exists()
+
+    write_day(day, [[f"{stamp} 08:00:00", "An", "IN"], [f"{stamp} 17:00:00", "An", "OUT"]])
+    users = attendance.day_summary(day)
+    assert users["An"]["out"] == 1 and users["An"]["seconds"] == 9 * 3600
+
+    # a fresh process (empty cache) serves the summary file
+    attendance._summary_cache.clear()
+    assert attendance.day_summary(day) == users
+
+
+def test_old_summary_version_is_rebuilt(reports):
+    day = date.today() - timedelta(days=2)
+    write_day(day, [[f"{day:%Y-%m-%d} 08:00:00", "An", "IN"]])
+    attendance.day_summary(day)
+    path = attendance.summary_path_for(day)
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload.pop("version")
+    payload["users"]["An"]["in"] = 99
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    attendance._summary_cache.clear()
+    assert attendance.day_summary(day)["An"]["in"] == 1
+
+
+def test_close_past_days(reports):
+    today = date.today()
+    for back in (1, 3):
+        day = today - timedelta(days=back)
+        write_day(day, [[f"{day:%Y-%m-%d} 08:00:00", "An", "IN"]])
+    write_day(today, [[f"{today:%Y-%m-%d} 08:00:00", "An", "IN"]])
+    assert attendance.close_past_days() == 2
+    assert not attendance.summary_path_for(today).exists()
+    assert attendance.close_past_days() == 0
+
+
+def test_day_summaries_reads_archive_once(reports, monkeypatch):
+    import archive
+    days = [date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)]
+    by_month = {}
+    for d in days:
+        by_month.setdefault((d.year, d.month), {})[d] = [
+            {"timestamp": f"{d:%Y-%m-%d} 08:00:00", "name": "An", "status": "IN"},
+            {"timestamp": f"{d:%Y-%m-%d} 12:00:00", "name": "An", "status": "OUT"}]
+    for (y, m), day_rows in by_month.items():
+        archive.write_partition(y, m, day_rows)
+
+    calls = []
+    read_range = archive.read_range
+    monkeypatch.setattr(archive, "read_range", lambda *a, **k: calls.append(a) or read_range(*a, **k))
+    users = attendance.day_summaries(days)
+    assert len(calls) == 1
+    assert all(users[d]["An"]["seconds"] == 4 * 3600 for d in days)
+    assert attendance.day_summaries(days) == users and len(calls) == 1  # cached
+    assert users[days[0]] == attendance.summarize_rows(archive.read_day_rows(days[0]))
+
+
+def test_archived_days_get_summary_files(reports):
+    import archive
+    days = [date(2024, 3, 4), date(2024, 3, 5)]
+    archive.write_partition(2024, 3, {d: [
+        {"timestamp": f"{d:%Y-%m-%d} 08:00:00", "name": "An", "status": "IN"},
+        {"timestamp": f"{d:%Y-%m-%d} 09:00:00", "name": "An", "status": "OUT"}] for d in days})
+    assert attendance.close_past_days() == 2
+    assert all(attendance.summary_path_for(d).exists() for d in days)
+    assert attendance.close_past_days() == 0
+
+    for d in days:
+        attendance.summary_path_for(d).unlink()
+    attendance._summary_cache.clear()
+    users = attendance.day_summaries(days)
+    assert all(users[d]["An"]["seconds"] == 3600 for d in days)
+    assert all(attendance.summary_path_for(d).exists() for d in days)
+    assert attendance.close_past_days() == 0
@@ -0,0 +1,36 @@
+# test_audit.py
+import numpy as np
+import pytest
+
+from audit import _unit_rows, duplicate_pairs, sample_spread
+
+
+def brute_force(m, threshold):
+    sims = m @ m.T
+    np.fill_diagonal(sims, -1.0)
+    ii, jj = np.nonzero(np.triu(sims >= threshold, k=1))
+    return {(i, j) for i, j in zip(ii.tolist(), jj.tolist())}, sims.argmax(axis=1), sims.max(axis=1)
+
+
+@pytest.mark.parametrize("block", [16, 50, 64])  # < N, = N, > N
+def test_duplicate_pairs_matches_brute_force(block):
+    rng = np.random.default_rng(0)
+    m = _unit_rows(rng.standard_normal((50, 64)).astype(np.float32))
+    m[[7, 31, 44]] = _unit_rows(m[[3, 20, 7]] + 0.1 * rng.standard_normal((3, 64)).astype(np.float32))
+    want, want_idx, want_sim = brute_force(m, 0.3)
+    pairs, nn_idx, nn_sim = duplicate_pairs(m, 0.3, block)
+    assert {(i, j) for i, j, _s in pairs} == want and {(3, 7), (20, 31)} <= want
+    assert all(i < j for i, j, _s in pairs)
+    assert [s for *_ij, s in pairs] == sorted((s for *_ij, s in pairs), reverse=True)
+    np.testing.assert_array_equal(nn_idx, want_idx)
+    np.testing.assert_allclose(nn_sim, want_sim, atol=1e-5)
+
+
+def test_sample_spread_flags_planted_outlier():
+    rng = np.random.default_rng(1)
+    base = rng.standard_normal(64).astype(np.float32)
+    vecs = _unit_rows(base + 0.3 * rng.standard_normal((8, 64)).astype(np.float32))
+    vecs[5] = _unit_rows(rng.standard_normal(64).astype(np.float32))  # someone else
+    sims, bad = sample_spread(vecs)
+    assert bad.tolist() == [5]
+    assert sims[5] == sims.min()
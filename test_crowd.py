@@ -0,0 +1,53 @@
+# test_crowd.py
+import numpy as np
+
+from crowd import nms, tile_grid
+
+
+def covered(rects, w, h):
+    mask = np.zeros((h, w), dtype=np.int32)
+    for x0, y0, x1, y1 in rects:
+        mask[y0:y1, x0:x1] += 1
+    return mask
+
+
+def test_tile_grid_covers_frame_with_overlap():
+    w, h, tile, overlap = 1920, 1080, 640, 0.25
+    rects = tile_grid(w, h, tile, overlap)
+    assert covered(rects, w, h).min() >= 1
+    for x0, y0, x1, y1 in rects:
+        assert 0 <= x0 < x1 <= w and 0 <= y0 < y1 <= h
+        assert (x1 - x0, y1 - y0) == (tile, tile)
+    # edge tiles are flush with the border
+    assert max(r[2] for r in rects) == w and max(r[3] for r in rects) == h
+    assert min(r[0] for r in rects) == 0 and min(r[1] for r in rects) == 0
+    # neighbouring tiles overlap by at least overlap * tile
+    xs = sorted({r[0] for r in rects})
+    ys = sorted({r[1] for r in rects})
+    assert all(b - a <= tile * (1 - overlap) for a, b in zip(xs, xs[1:]))
+    assert all(b - a <= tile * (1 - overlap) for a, b in zip(ys, ys[1:]))
+
+
+def test_tile_grid_small_and_odd_frames():
+    assert tile_grid(640, 480, 640, 0.25) == [(0, 0, 640, 480)]
+    rects = tile_grid(1000, 333, 640, 0.25)
+    assert covered(rects, 1000, 333).min() >= 1
+    assert all(y0 == 0 and y1 == 333 for _x0, y0, _x1, y1 in rects)
+
+
+def test_nms_merges_duplicates_across_tiles():
+    boxes = np.array([
+        [600, 100, 680, 180],   # face on the tile seam, seen by the left tile
+        [602, 101, 681, 182],   # ... and by the right tile
+        [100, 100, 180, 180],   # another face
+        [110, 110, 150, 150],   # part of it picked up by the whole-frame pass
+    ], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.95, 0.6])
+    keep = nms(boxes, scores, iou=0.4)
+    assert sorted(keep) == [0, 2]
+
+
+def test_nms_keeps_separate_faces():
+    boxes = np.array([[0, 0, 50, 50], [60, 0, 110, 50], [0, 60, 50, 110]], dtype=np.float32)
+    assert sorted(nms(boxes, np.array([0.5, 0.9, 0.7]))) == [0, 1, 2]
+    assert nms(np.zeros((0, 4)), np.zeros(0)) == []
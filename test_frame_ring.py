@@ -0,0 +1,100 @@
+# test_frame_ring.py
+import multiprocessing
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from frame_ring import FrameOverrun, FrameRing
+
+
+@pytest.fixture
+def ring():
+    r = FrameRing.create(slots=3, slot_bytes=64 * 48 * 3)
+    yield r
+    r.close()
+
+
+def frame(i, shape=(48, 64, 3)):
+    return np.full(shape, i % 256, dtype=np.uint8)
+
+
+def test_write_get_roundtrip(ring):
+    seq = ring.write(frame(7))
+    view = ring.get(seq)
+    assert view.shape == (48, 64, 3) and (view == 7).all()
+    assert ring.valid(seq)
+    assert ring.latest()[0] == seq
+    gray = ring.write(frame(9, (48, 64)))
+    assert ring.get(gray).shape == (48, 64)
+
+
+def test_overrun_after_more_frames_than_slots(ring):
+    seqs = [ring.write(frame(i)) for i in range(ring.slots + 1)]
+    assert not ring.valid(seqs[0])
+    with pytest.raises(FrameOverrun):
+        ring.get(seqs[0])
+    for s in seqs[1:]:
+        assert ring.valid(s) and (ring.get(s) == s).all()
+
+
+def test_reader_detects_overrun_while_holding_view(ring):
+    seq = ring.write(frame(1))
+    view = ring.get(seq)
+    for i in range(ring.slots):
+        ring.write(frame(100 + i))
+    assert not ring.valid(seq)  # the result computed from ``view`` must be discarded
+    del view
+
+
+def test_claim_commit(ring):
+    seq, view = ring.claim((48, 64, 3))
+    with pytest.raises(FrameOverrun):
+        ring.get(seq)  # not committed yet
+    assert ring.latest() == (None, None)
+    view[...] = 5
+    ring.commit(seq)
+    assert ring.seq_of(view) == seq
+    assert ring.seq_of(view.copy()) is None
+    assert (ring.get(seq) == 5).all()
+    with pytest.raises(ValueError):
+        ring.claim((480, 640, 3))
+
+
+def test_attach_in_same_process(ring):
+    seq = ring.write(frame(3))
+    reader = FrameRing.attach(ring.name)
+    assert (reader.get(seq) == 3).all()
+    reader.close()
+    assert (ring.get(seq) == 3).all()  # the reader's close leaves the segment to its owner
+
+
+def test_same_process_attach_leaves_tracker_clean():
+    code = ("from frame_ring import FrameRing\n"
+            "r = FrameRing.create(slots=2, slot_bytes=16)\n"
+            "a = FrameRing.attach(r.name)\n"
+            "a.close(); r.close()\n")
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+    assert "KeyError" not in res.stderr and "leaked" not in res.stderr
+
+
+def _child_read(name, seq):
+    r = FrameRing.attach(name)
+    try:
+        return r.get(seq).copy()
+    finally:
+        r.close()
+
+
+def test_roundtrip_through_spawned_child(ring):
+    seq = ring.write(frame(42))
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        got = pool.apply(_child_read, (ring.name, seq))
+    assert got.shape == (48, 64, 3) and (got == 42).all()
+    # the child exited; the segment must still be there
+    again = FrameRing.attach(ring.name)
+    assert (again.get(seq) == 42).all()
+    again.close()
@@ -0,0 +1,61 @@
+# test_inference_server.py
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+import inference_server
+from config import DET_SIZE, MODEL_NAME
+from inference_server import InferenceServer, RemoteFaceEngine, load_authkey
+
+
+class _Engine:
+    model_name = MODEL_NAME
+    det_size = tuple(DET_SIZE)
+    min_face_size = 50
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    key = tmp_path / "inference.key"
+    monkeypatch.setattr(inference_server, "load_authkey", lambda: load_authkey(key))
+    srv = InferenceServer.__new__(InferenceServer)  # no model load: the engine is a stand-in
+    srv.address, srv.engine, srv._lock, srv.listener = ("127.0.0.1", 0), _Engine(), threading.Lock(), None
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    while srv.listener is None:
+        time.sleep(0.01)
+    yield srv
+    srv.close()
+
+
+def test_concurrent_load_authkey_agrees_on_one_key(tmp_path):
+    path = tmp_path / "inference.key"
+    keys, start = [], threading.Barrier(8)
+
+    def load():
+        start.wait()
+        keys.append(load_authkey(path))
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(keys) == 8 and len(set(keys)) == 1 and len(keys[0]) == 32
+    assert load_authkey(path) == keys[0]
+    assert [p.name for p in tmp_path.iterdir()] == ["inference.key"]
+    if os.name == "posix":
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_remote_engine_checks_model_and_det_size(server):
+    host, port = server.listener.address
+    engine = RemoteFaceEngine(f"{host}:{port}")
+    assert (engine.model_name, engine.det_size) == (MODEL_NAME, tuple(DET_SIZE))
+    engine.close()
+    with pytest.raises(ValueError, match="expected"):
+        RemoteFaceEngine(f"{host}:{port}", model_name="some_other_model")
+    with pytest.raises(ValueError, match="expected"):
+        RemoteFaceEngine(f"{host}:{port}", det_size=(320, 320))
@@ -0,0 +1,30 @@
+# test_metrics.py
+import json
+import urllib.request
+
+from metrics import Metrics, MetricsServer, PREFIX
+
+
+def test_metrics_server_serves_prometheus_and_json():
+    m = Metrics()
+    m.inc("frames_processed", 3)
+    m.observe("detect", 0.012)
+    server = MetricsServer(0, host="127.0.0.1", metrics=m).start()
+    try:
+        host, port = server.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as r:
+            assert r.headers["Content-Type"].startswith("text/plain")
+            text = r.read().decode()
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics.json", timeout=5) as r:
+            snap = json.loads(r.read())
+    finally:
+        server.stop()
+
+    lines = text.splitlines()
+    assert f"# TYPE {PREFIX}frames_processed_total counter" in lines
+    assert f"{PREFIX}frames_processed_total 3" in lines
+    assert f'{PREFIX}stage_seconds_bucket{{stage="detect",le="0.015"}} 1' in lines
+    assert f'{PREFIX}stage_seconds_bucket{{stage="detect",le="0.01"}} 0' in lines
+    assert f'{PREFIX}stage_seconds_count{{stage="detect"}} 1' in lines
+    assert snap["counters"]["frames_processed"] == 3
+    assert snap["stages"]["detect"]["count"] == 1
@@ -0,0 +1,28 @@
+# test_profiling.py
+import sys
+import threading
+import time
+
+from profiling import Profiler
+
+
+def test_thread_mid_iteration_disables_its_profiler_after_the_window(tmp_path):
+    prof = Profiler(tmp_path)
+    seen = []
+
+    def scan():
+        prof.hook()                  # joins the window
+        time.sleep(1.0)              # one long iteration, past the window's end
+        prof.hook()                  # must still find and disable its profiler
+        seen.append(sys.getprofile())
+
+    assert prof.profile_window(0.2)
+    t = threading.Thread(target=scan, name="scanner")
+    t.start()
+    t.join(5)
+    deadline = time.monotonic() + 5
+    while not list(tmp_path.glob("cprofile_*.prof")) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert seen == [None]
+    assert list(tmp_path.glob("cprofile_*.prof"))
+    assert not prof.active and not prof._profiles  # nothing left enabled; a new window may start
@@ -0,0 +1,80 @@
+# test_tracking.py
+import numpy as np
+
+from tracking import Tracker
+
+BOX = (100, 100, 200, 200)
+
+
+def committed(tracker, name="An", now=0.0):
+    track = tracker.update([BOX], now)[0]
+    for i in range(tracker.votes):
+        tracker.vote(track, name, 0.6, now + i * 0.1)
+    assert track.identity == name and track.just_committed
+    return track
+
+
+def test_commit_needs_votes():
+    tracker = Tracker(votes=3)
+    track = tracker.update([BOX], 0.0)[0]
+    for name in ("An", "", "Binh", "An", "", ""):
+        tracker.vote(track, name, 0.6, 0.0)
+    assert track.identity is None and track.votes == {"An": 2, "Binh": 1, "": 3}
+    tracker.vote(track, "An", 0.6, 0.0)
+    assert track.identity == "An"
+
+
+def test_unknown_frame_keeps_identity_and_status():
+    tracker = Tracker(votes=3, reverify_sec=2.0)
+    track = committed(tracker)
+    track.allowed, track.status = True, "IN"  # Scanner._attend logged IN
+
+    now = 3.0
+    assert tracker.needs_match(track, now)
+    tracker.vote(track, "", 0.2, now)  # one below-threshold frame while re-verifying
+    assert track.identity == "An"
+    assert (track.allowed, track.status) == (True, "IN")  # no second IN/OUT once the cooldown passes
+    assert tracker.needs_match(track, now)  # still to be confirmed
+    tracker.vote(track, "An", 0.6, now + 0.1)
+    assert not tracker.needs_match(track, now + 0.2)
+
+
+def test_identity_dropped_after_votes_disagreeing_matches():
+    tracker = Tracker(votes=3)
+    track = committed(tracker)
+    track.allowed, track.status = True, "IN"
+    tracker.vote(track, "Binh", 0.5, 3.0)
+    tracker.vote(track, "Binh", 0.5, 3.1)
+    tracker.vote(track, "An", 0.6, 3.2)  # confirmed again: disagreement forgotten
+    tracker.vote(track, "Binh", 0.5, 3.3)
+    tracker.vote(track, "Binh", 0.5, 3.4)
+    assert track.identity == "An" and track.status == "IN"
+    tracker.vote(track, "Binh", 0.5, 3.5)
+    assert track.identity == "Binh" and track.status is None
+
+    # back to An: the attendance state held for An returns
+    for i in range(3):
+        tracker.vote(track, "An", 0.6, 4.0 + i)
+    assert track.identity == "An"
+    assert (track.allowed, track.status) == (True, "IN")
+
+
+def test_status_inherited_after_track_break():
+    tracker = Tracker(votes=3, max_age_sec=1.0, forget_sec=3.0)
+    track = committed(tracker)
+    track.allowed, track.status = True, "OUT"
+    tracker.update([], 0.5)
+    new = tracker.update([(400, 100, 500, 200)], 2.0)[0]  # old track expired, a new one starts
+    assert new is not track
+    for i in range(3):
+        tracker.vote(new, "An", 0.6, 2.0 + i * 0.1)
+    assert new.status == "OUT"
+
+
+def test_update_associates_by_iou():
+    tracker = Tracker(iou=0.3)
+    a, b = tracker.update([(0, 0, 100, 100), (300, 0, 400, 100)], 0.0)
+    b2, a2 = tracker.update([(305, 2, 405, 102), (4, 0, 104, 100)], 0.1)
+    assert (a2, b2) == (a, b)
+    iou = Tracker.iou_matrix(np.array([[0, 0, 10, 10]], np.float32), np.array([[0, 0, 10, 10]], np.float32))
+    assert abs(float(iou[0, 0]) - 1.0) < 1e-4
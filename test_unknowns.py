@@ -0,0 +1,116 @@
+# test_unknowns.py
+import numpy as np
+import pytest
+
+from config import TRACK_VOTES, UNKNOWN_SAMPLE_SEC
+from scanner import Scanner
+from unknowns import UnknownClusters
+from utils import CooldownKeeper
+
+CROP = np.zeros((112, 112, 3), dtype=np.uint8)
+
+
+def unit(v):
+    return (v / np.linalg.norm(v)).astype(np.float32)
+
+
+def near(base, cos, rng):
+    """Unit vector with cosine ``cos`` to ``base``."""
+    noise = rng.standard_normal(base.shape).astype(np.float32)
+    noise = unit(noise - (noise @ base) * base)
+    return unit(cos * base + np.sqrt(1 - cos ** 2) * noise)
+
+
+@pytest.fixture
+def clusters(tmp_path):
+    c = UnknownClusters(tmp_path / "unknowns", threshold=0.45, max_clusters=3, samples=2)
+    yield c
+    c.flush()
+
+
+def test_merge_threshold(clusters):
+    rng = np.random.default_rng(0)
+    a = unit(rng.standard_normal(512))
+    uid = clusters.add(a, CROP, 0.9, now=1.0)
+    assert clusters.add(near(a, 0.6, rng), CROP, 0.8, now=2.0) == uid      # above threshold: same person
+    assert clusters.add(near(a, 0.3, rng), CROP, 0.8, now=3.0) != uid      # below: a new cluster
+    assert len(clusters) == 2
+    top = clusters.clusters()[0]
+    assert top.uid == uid and top.count == 2 and len(top.embs) == 2
+    assert abs(float(np.linalg.norm(top.centroid)) - 1.0) < 1e-4
+
+
+def test_keeps_best_samples_and_writes_crops(clusters):
+    rng = np.random.default_rng(1)
+    a = unit(rng.standard_normal(512))
+    for score in (0.5, 0.9, 0.7):
+        uid = clusters.add(near(a, 0.9, rng), CROP, score, now=score)
+    clusters.flush()
+    c = clusters.clusters()[0]
+    assert c.count == 3 and sorted(c.scores) == [0.7, 0.9]
+    assert all(p.exists() for p in c.crops) and c.uid == uid
+
+
+def test_eviction_prefers_single_sightings(clusters):
+    rng = np.random.default_rng(2)
+    people = [unit(rng.standard_normal(512)) for _ in range(4)]
+    keep = clusters.add(people[0], CROP, 0.9, now=0.0)
+    clusters.add(people[0], CROP, 0.9, now=0.5)       # seen twice, but the oldest
+    single = clusters.add(people[1], CROP, 0.9, now=1.0)
+    clusters.add(people[2], CROP, 0.9, now=2.0)
+    clusters.add(people[3], CROP, 0.9, now=3.0)       # full: evicts the oldest one-off
+    uids = {c.uid for c in clusters.clusters()}
+    assert keep in uids and single not in uids and len(uids) == 3
+
+
+def test_snapshots_are_independent(clusters):
+    rng = np.random.default_rng(3)
+    a = unit(rng.standard_normal(512))
+    clusters.add(a, CROP, 0.9, now=0.0)
+    snap = clusters.clusters()[0]
+    centroid = snap.centroid.copy()
+    clusters.add(near(a, 0.7, rng), CROP, 0.95, now=1.0)
+    assert snap.count == 1 and len(snap.embs) == 1 and len(snap.crops) == 1
+    assert np.array_equal(snap.centroid, centroid)
+    assert clusters.clusters()[0].count == 2
+
+
+class _Engine:
+    """One face per frame, always the same embedding."""
+
+    def __init__(self, emb):
+        self.emb = emb
+
+    def detect(self, frame):
+        return [((10, 10, 110, 110), np.zeros((5, 2), np.float32), 0.9)]
+
+    def align(self, frame, kps):
+        return CROP
+
+    def embed_aligned(self, crops):
+        return np.stack([self.emb] * len(crops))
+
+    @staticmethod
+    def draw_bbox(*args):
+        pass
+
+
+class _Registry:
+    def match_batch(self, embs):
+        return [("", 0.1)] * len(embs)
+
+
+def test_scanner_samples_unknown_tracks(clusters):
+    rng = np.random.default_rng(4)
+    scanner = Scanner(_Engine(unit(rng.standard_normal(512))), _Registry(), None, CooldownKeeper(0),
+                      unknowns=clusters)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    step = UNKNOWN_SAMPLE_SEC / 4
+    frames = TRACK_VOTES + 12
+    for k in range(frames):
+        scanner.process(frame, 100.0 + k * step)
+    c = clusters.clusters()
+    assert len(c) == 1
+    # nothing before TRACK_VOTES unknown results, then one sample per UNKNOWN_SAMPLE_SEC
+    span = (frames - TRACK_VOTES) * step
+    assert c[0].count == int(span // UNKNOWN_SAMPLE_SEC) + 1
@@ -0,0 +1,153 @@
+# tracking.py
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import TRACK_IOU, TRACK_VOTES, TRACK_REVERIFY_SEC, TRACK_MAX_AGE_SEC, TRACK_FORGET_SEC
+from metrics import METRICS
+
+
+class Track:
+    """One face followed across frames, with its identity votes and attendance state."""
+
+    def __init__(self, track_id: int, bbox, now: float):
+        self.id = track_id
+        self.bbox = bbox
+        self.created = now
+        self.last_seen = now
+        self.votes: Dict[str, int] = {}           # name ("" = unknown) -> match results for it
+        self.identity: Optional[str] = None       # committed name
+        self.dissent: Dict[str, int] = {}         # other names matched since the identity was last confirmed
+        self.sim = 0.0                            # similarity of the latest accepted match
+        self.verified_at = 0.0                    # when the identity was last (re)confirmed
+        self.just_committed = False               # identity committed during the last update
+        self.unknown_sampled_at = 0.0             # last time this track fed the unknown-face clusters
+        # Attendance, decided once per committed identity (see Scanner)
+        self.allowed: Optional[bool] = None       # can_attend_today result
+        self.status: Optional[str] = None         # IN / OUT logged (or inherited) for this track
+        self.released: Dict[str, Tuple[Optional[bool], Optional[str]]] = {}  # dropped name -> (allowed, status)
+
+    def reset_identity(self):
+        if self.identity is not None:
+            # restored if the track commits to this name again
+            self.released[self.identity] = (self.allowed, self.status)
+        self.votes.clear()
+        self.dissent.clear()
+        self.identity = None
+        self.allowed = None
+        self.status = None
+
+
+class Tracker:
+    """IoU tracker with temporal identity voting.
+
+    ``update()`` associates the frame's boxes with live tracks (greedy on a
+    vectorized IoU matrix). Tracks without an identity are matched every frame
+    and ``vote()`` commits a name once it has ``votes`` accepted matches and
+    leads every other candidate; committed tracks are only re-matched every
+    ``reverify_sec`` (``needs_match``). An unknown result does not touch a
+    committed identity; it is dropped only after ``votes`` matches to other
+    people since it was last confirmed, which become the new votes. A track
+    that commits to a name it held before gets its attendance state back.
+
+    Expired tracks are remembered per identity for ``forget_sec`` so a person
+    whose track broke (occlusion, missed detections) keeps their attendance
+    state instead of being logged again.
+    """
+
+    def __init__(self, iou: float = TRACK_IOU, votes: int = TRACK_VOTES, reverify_sec: float = TRACK_REVERIFY_SEC,
+                 max_age_sec: float = TRACK_MAX_AGE_SEC, forget_sec: float = TRACK_FORGET_SEC):
+        self.iou = iou
+        self.votes = votes
+        self.reverify_sec = reverify_sec
+        self.max_age_sec = max_age_sec
+        self.forget_sec = forget_sec
+        self.tracks: List[Track] = []
+        self._recent: Dict[str, Track] = {}  # identity -> last expired track with it
+        self._ids = count(1)
+
+    @staticmethod
+    def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        ix = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+        iy = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+        inter = ix * iy
+        area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+        area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-6)
+
+    def update(self, bboxes, now: float) -> List[Track]:
+        """Assign each box to a track (new or existing); return tracks aligned with ``bboxes``."""
+        self._expire(now)
+        assigned: List[Optional[Track]] = [None] * len(bboxes)
+        if bboxes and self.tracks:
+            iou = self.iou_matrix(np.asarray(bboxes, dtype=np.float32),
+                                  np.asarray([t.bbox for t in self.tracks], dtype=np.float32))
+            taken = set()
+            for flat in np.argsort(-iou, axis=None):
+                d, t = divmod(int(flat), iou.shape[1])
+                if iou[d, t] < self.iou:
+                    break
+                if assigned[d] is None and t not in taken:
+                    assigned[d] = self.tracks[t]
+                    taken.add(t)
+        for i, bbox in enumerate(bboxes):
+            track = assigned[i]
+            if track is None:
+                track = Track(next(self._ids), bbox, now)
+                self.tracks.append(track)
+                METRICS.inc("tracks_started")
+            track.bbox = bbox
+            track.last_seen = now
+            track.just_committed = False
+            assigned[i] = track
+        METRICS.set_gauge("tracks_live", len(self.tracks))
+        return assigned
+
+    def needs_match(self, track: Track, now: float) -> bool:
+        return track.identity is None or now - track.verified_at >= self.reverify_sec
+
+    def vote(self, track: Track, name: str, sim: float, now: float):
+        """Record one match result ("" = unknown) for ``track``."""
+        if track.identity is not None:
+            if name == track.identity:
+                track.verified_at, track.sim = now, sim
+                track.dissent.clear()
+                return
+            if not name:
+                return  # one poor frame; keep matching until it is confirmed again
+            track.dissent[name] = track.dissent.get(name, 0) + 1
+            if sum(track.dissent.values()) < self.votes:
+                return
+            METRICS.inc("tracks_reverify_failed")
+            dissent = dict(track.dissent)
+            track.reset_identity()
+            track.votes.update(dissent)
+            n = track.votes[name]
+        else:
+            n = track.votes[name] = track.votes.get(name, 0) + 1
+            if not name:
+                return
+        if n >= self.votes and all(n > v for other, v in track.votes.items() if other and other != name):
+            track.identity = name
+            track.sim = sim
+            track.verified_at = now
+            track.just_committed = True
+            METRICS.inc("tracks_committed")
+            prev = self._recent.pop(name, None) or next(
+                (t for t in self.tracks if t is not track and t.identity == name), None)
+            if name in track.released:
+                track.allowed, track.status = track.released.pop(name)
+            elif prev is not None:
+                track.allowed, track.status = prev.allowed, prev.status
+
+    def _expire(self, now: float):
+        live = []
+        for t in self.tracks:
+            if now - t.last_seen <= self.max_age_sec:
+                live.append(t)
+            elif t.identity is not None:
+                self._recent[t.identity] = t
+        self.tracks = live
+        for name in [n for n, t in self._recent.items() if now - t.last_seen > self.forget_sec]:
+            del self._recent[name]
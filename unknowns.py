@@ -0,0 +1,175 @@
+# unknowns.py
+import copy
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from config import UNKNOWN_DIR, UNKNOWN_CLUSTER_SIM, UNKNOWN_MAX_CLUSTERS, UNKNOWN_SAMPLES
+from metrics import METRICS
+
+
+class UnknownCluster:
+    """Faces of one (probable) unregistered person seen while scanning."""
+
+    def __init__(self, uid: str, now: float):
+        self.uid = uid
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.embs: List[np.ndarray] = []    # up to UNKNOWN_SAMPLES, best detection scores
+        self.scores: List[float] = []
+        self.crops: List[Path] = []         # aligned crops on disk, same order as embs
+        self.centroid: Optional[np.ndarray] = None  # set on snapshots (see UnknownClusters.clusters)
+
+
+class UnknownClusters:
+    """Bounded online (leader) clustering of unrecognized faces.
+
+    Centroids live in a preallocated ``[max_clusters, 512]`` matrix, so
+    assigning a face is one matrix-vector product whatever the number of
+    clusters. A face joins the most similar cluster if the cosine is at least
+    ``threshold`` (running-mean centroid), else starts a new one; when full,
+    the oldest single-sighting cluster (else the least recently seen one) is
+    evicted. Each cluster keeps its ``samples`` best-scored faces; their crops
+    are written to ``out_dir`` by a background thread. Thread-safe: the
+    scanner adds, the UI lists and enrolls.
+    """
+
+    def __init__(self, out_dir: Path = UNKNOWN_DIR, threshold: float = UNKNOWN_CLUSTER_SIM,
+                 max_clusters: int = UNKNOWN_MAX_CLUSTERS, samples: int = UNKNOWN_SAMPLES):
+        self.out_dir = Path(out_dir)
+        self.threshold = threshold
+        self.samples = samples
+        self.centroids = np.zeros((max_clusters, 512), dtype=np.float32)
+        self._sums = np.zeros((max_clusters, 512), dtype=np.float32)
+        self.slots: List[Optional[UnknownCluster]] = [None] * max_clusters
+        self._last_seen = np.full(max_clusters, -np.inf)  # -inf marks a free slot
+        self._counts = np.zeros(max_clusters, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unknowns-writer")
+        self._seq = 0
+        # Crops of a previous session cannot be matched to any cluster any more
+        self._writer.submit(shutil.rmtree, self.out_dir, True)
+
+    def __len__(self) -> int:
+        return int(np.isfinite(self._last_seen).sum())
+
+    def add(self, emb: np.ndarray, crop: np.ndarray, det_score: float, now: Optional[float] = None) -> str:
+        """Assign one L2-normalized embedding (+ its aligned crop); return the cluster uid."""
+        now = time.time() if now is None else now
+        with self._lock:
+            sims = self.centroids @ emb
+            sims[~np.isfinite(self._last_seen)] = -1.0
+            i = int(np.argmax(sims))
+            if sims[i] < self.threshold:
+                i = self._new_slot(now)
+            c = self.slots[i]
+            c.count += 1
+            self._counts[i] = c.count
+            c.last_seen = self._last_seen[i] = now
+            self._sums[i] += emb
+            self.centroids[i] = self._sums[i] / (np.linalg.norm(self._sums[i]) + 1e-8)
+            self._keep_sample(c, emb, crop, det_score)
+            METRICS.inc("unknown_faces")
+            METRICS.set_gauge("unknown_clusters", len(self))
+            return c.uid
+
+    def _new_slot(self, now: float) -> int:
+        free = np.flatnonzero(~np.isfinite(self._last_seen))
+        if free.size:
+            i = int(free[0])
+        else:
+            # Oldest one-off face first (mostly noise), otherwise the least recently seen cluster
+            singles = np.where(self._counts == 1, self._last_seen, np.inf)
+            i = int(np.argmin(singles)) if np.isfinite(singles).any() else int(np.argmin(self._last_seen))
+            self._drop(i)
+            METRICS.inc("unknown_clusters_evicted")
+        self._seq += 1
+        self.slots[i] = UnknownCluster(f"{time.strftime('%Y%m%d_%H%M%S')}_{self._seq}", now)
+        self._sums[i] = 0.0
+        return i
+
+    def _keep_sample(self, c: UnknownCluster, emb: np.ndarray, crop: np.ndarray, det_score: float):
+        if len(c.embs) < self.samples:
+            k = len(c.embs)
+            c.embs.append(emb.copy())
+            c.scores.append(det_score)
+            c.crops.append(self.out_dir / c.uid / f"{c.uid}_{k}.jpg")
+        else:
+            k = int(np.argmin(c.scores))
+            if det_score <= c.scores[k]:
+                return
+            c.embs[k], c.scores[k] = emb.copy(), det_score
+        self._writer.submit(_write_crop, c.crops[k], crop.copy())
+
+    def _drop(self, i: int):
+        c = self.slots[i]
+        self.slots[i] = None
+        self._last_seen[i] = -np.inf
+        self._counts[i] = 0
+        self.centroids[i] = 0.0
+        if c is not None:
+            self._writer.submit(shutil.rmtree, self.out_dir / c.uid, True)
+
+    def clusters(self, min_count: int = 1) -> List[UnknownCluster]:
+        """Snapshots of the live clusters, most frequently seen first. Safe to
+        keep on another thread: the scanner keeps updating the originals."""
+        with self._lock:
+            live = [self._snapshot(i) for i, c in enumerate(self.slots) if c is not None and c.count >= min_count]
+        return sorted(live, key=lambda c: (-c.count, -c.last_seen))
+
+    def _snapshot(self, i: int) -> UnknownCluster:
+        c = copy.copy(self.slots[i])
+        c.embs, c.scores, c.crops = list(c.embs), list(c.scores), list(c.crops)
+        c.centroid = self.centroids[i].copy()
+        return c
+
+    def flush(self):
+        """Wait until queued crop writes / deletions are on disk."""
+        self._writer.submit(lambda: None).result()
+
+    def enroll(self, uid: str, person: str, registry) -> int:
+        """Register cluster ``uid`` as ``person`` (its kept embeddings + crops) and
+        drop it. Return the number of samples added."""
+        from registry import FaceSample
+        with self._lock:
+            i = next((k for k, c in enumerate(self.slots) if c is not None and c.uid == uid), None)
+            if i is None:
+                raise KeyError(f"unknown cluster {uid}")
+            c = self.slots[i]
+            self.slots[i] = None
+            self._last_seen[i] = -np.inf
+            self._counts[i] = 0
+            self.centroids[i] = 0.0
+        self.flush()
+        faces = []
+        embs = []
+        for emb, path, score in zip(c.embs, c.crops, c.scores):
+            crop = cv2.imread(str(path))
+            if crop is not None:
+                faces.append(FaceSample(crop, det_score=score))
+                embs.append(emb)
+        if embs:
+            registry.add_samples(person, np.stack(embs), faces)
+        self._writer.submit(shutil.rmtree, self.out_dir / c.uid, True)
+        METRICS.set_gauge("unknown_clusters", len(self))
+        print(f"UNKNOWN: enrolled cluster {uid} ({c.count} sightings) as {person} with {len(embs)} samples")
+        return len(embs)
+
+    def discard(self, uid: str):
+        with self._lock:
+            for i, c in enumerate(self.slots):
+                if c is not None and c.uid == uid:
+                    self._drop(i)
+        METRICS.set_gauge("unknown_clusters", len(self))
+
+
+def _write_crop(path: Path, crop: np.ndarray):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(path), crop)
@@ -21,3 +21,20 @@ class CooldownKeeper:
 def cosine_similarity(a, b):
     # expects L2-normalized vectors for speed
     return float((a * b).sum())
+
+class LatestSlot:
+    """Single-value mailbox between threads: one writer overwrites, readers see
+    only the newest item. Relies on atomic attribute assignment, so no lock is
+    taken on either side."""
+    def __init__(self):
+        self._item = (0, None)
+
+    def put(self, value):
+        self._item = (self._item[0] + 1, value)
+
+    def get(self, after_seq: int = 0):
+        """Return (seq, value) if newer than ``after_seq``, else (after_seq, None)."""
+        item = self._item
+        if item[0] > after_seq:
+            return item
+        return after_seq, None